@@ -2,12 +2,13 @@
 User context configuration endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from app.core.security import get_current_user_id
 from app.models.schemas import (
     ContextBuildRequest, 
     ContextResponse, 
     ContextSuggestionsResponse,
+    ParsedResumeData,
     PredefinedTagsResponse
 )
 from app.models.predefined_tags import (
@@ -18,7 +19,6 @@ from app.models.predefined_tags import (
     COMMON_LOCATIONS
 )
 from app.services.context_service import ContextService
-from app.services.ai_service import AIService
 from app.services.resume_service import ResumeService
 import logging
 
@@ -29,18 +29,20 @@ router = APIRouter()
 @router.post("/build", response_model=ContextResponse)
 async def build_context(
     request: ContextBuildRequest,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id)
 ):
     """
     Build or update user context profile
     Automatically includes user's resume data for email generation
+    Returns as soon as the profile is saved; AI refinement suggestions are
+    added to it in the background (context_suggestions is None until then)
     """
     try:
         logger.info(f"User {user_id} building context")
         
         context_service = ContextService()
         resume_service = ResumeService()
-        ai_service = AIService()
         
         # Get user's resume data to include with context
         try:
@@ -56,14 +58,14 @@ async def build_context(
             logger.warning(f"Could not fetch resume data: {e}")
             context_data = request.dict()
         
-        # Refine context with AI (optional enhancement)
-        refined_context = await ai_service.refine_context(context_data)
-        
         # Save to database
-        context = await context_service.save_context(user_id, refined_context)
+        context = await context_service.save_context(user_id, context_data)
         
-        return ContextResponse(**context)
+        # Refine context with AI after responding (optional enhancement)
+        background_tasks.add_task(context_service.refresh_context_suggestions, user_id, context)
         
+        return ContextResponse(**context)
+    
     except Exception as e:
         logger.error(f"Context build error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -80,7 +82,7 @@ async def get_context(user_id: str = Depends(get_current_user_id)):
             raise HTTPException(status_code=404, detail="Context not found")
         
         return ContextResponse(**context)
-        
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -119,12 +121,13 @@ async def get_predefined_tags():
 async def get_context_suggestions(user_id: str = Depends(get_current_user_id)):
     """
     Get AI-generated context suggestions based on user's parsed resume
+    Suggestions are stored on the resume when it is parsed; they are only
+    generated here for resumes parsed before that
     """
     try:
         logger.info(f"User {user_id} requesting context suggestions")
         
         resume_service = ResumeService()
-        ai_service = AIService()
         
         # Get user's most recent resume
         resume = await resume_service.get_current_resume(user_id)
@@ -138,13 +141,18 @@ async def get_context_suggestions(user_id: str = Depends(get_current_user_id)):
                 detail="Resume has not been parsed yet. Please parse your resume first."
             )
         
-        # Generate suggestions using AI
-        from app.models.schemas import ParsedResumeData
-        parsed_data = ParsedResumeData(**resume['parsed_data'])
-        suggestions = await ai_service.generate_context_suggestions(parsed_data)
+        if resume.get('context_suggestions'):
+            return ContextSuggestionsResponse(**resume['context_suggestions'])
         
-        return ContextSuggestionsResponse(**suggestions)
+        # Not stored yet (older parse, or still being generated after a file parse)
+        suggestions = await resume_service.refresh_context_suggestions(
+            resume['id'],
+            user_id,
+            ParsedResumeData(**resume['parsed_data'])
+        )
         
+        return ContextSuggestionsResponse(**suggestions)
+    
     except HTTPException:
         raise
     except Exception as e:
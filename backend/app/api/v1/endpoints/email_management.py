@@ -2,11 +2,21 @@
 Email Management API endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
 from app.core.security import get_current_user_id
 from app.models.schemas import (
     EmailGenerateRequest,
+    EmailVariantsGenerateRequest,
+    EmailBulkGenerateRequest,
+    EmailBulkGenerateResponse,
+    EmailBatchGenerateRequest,
+    EmailBatchSubmitResponse,
+    EmailBatchJobResponse,
     EmailResponse,
+    EmailClustersResponse,
     EmailUpdateStatusRequest,
     EmailUpdateContentRequest,
     ChatMessageRequest,
@@ -15,13 +25,19 @@ from app.models.schemas import (
 )
 from app.services.email_management_service import EmailManagementService
 from app.services.chatbot_service import ChatbotService
-from typing import List, Optional
+from typing import Any, List, Optional
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
 @router.post("/generate", response_model=EmailResponse)
 async def generate_email(
     request: EmailGenerateRequest,
@@ -47,12 +63,183 @@ async def generate_email(
         )
         
         return EmailResponse(**email)
-        
+    
     except Exception as e:
         logger.error(f"Generate email error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate/variants", response_model=List[EmailResponse])
+async def generate_email_variants(
+    request: EmailVariantsGenerateRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Generate several alternative emails for one company in a single AI call
+    """
+    try:
+        if request.variants > settings.EMAIL_MAX_VARIANTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many variants. Maximum is {settings.EMAIL_MAX_VARIANTS} per request."
+            )
+        
+        logger.info(f"Generating {request.variants} email variants for {request.company_name}")
+        
+        service = EmailManagementService()
+        emails = await service.generate_email_variants(
+            user_id=user_id,
+            company_name=request.company_name,
+            company_website=request.company_website,
+            company_location=request.company_location,
+            position_title=request.position_title,
+            job_type=request.job_type,
+            salary_range=request.salary_range,
+            keywords=request.keywords,
+            custom_prompt=request.custom_prompt,
+            variants=request.variants
+        )
+        
+        return [EmailResponse(**email) for email in emails]
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Generate email variants error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_email_stream(
+    request: EmailGenerateRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Generate a personalized email using AI, streamed as Server-Sent Events
+    Emits `subject` and `body` deltas, then `done` with the stored email (or `error`)
+    """
+    logger.info(f"Streaming email for {request.company_name}")
+    
+    service = EmailManagementService()
+    
+    async def event_stream():
+        async for event in service.generate_email_stream(
+            user_id=user_id,
+            company_name=request.company_name,
+            company_website=request.company_website,
+            company_location=request.company_location,
+            position_title=request.position_title,
+            job_type=request.job_type,
+            salary_range=request.salary_range,
+            keywords=request.keywords,
+            custom_prompt=request.custom_prompt
+        ):
+            yield _sse_event(event["event"], event["data"])
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/generate/bulk", response_model=EmailBulkGenerateResponse)
+async def generate_emails_bulk(
+    request: EmailBulkGenerateRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Generate personalized emails for a list of companies
+    Runs generations concurrently and reports the outcome per company
+    """
+    try:
+        if len(request.companies) > settings.EMAIL_BULK_MAX_COMPANIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many companies. Maximum is {settings.EMAIL_BULK_MAX_COMPANIES} per request."
+            )
+        
+        logger.info(f"Bulk generating emails for {len(request.companies)} companies")
+        
+        service = EmailManagementService()
+        result = await service.generate_emails_bulk(
+            user_id=user_id,
+            companies=[company.dict() for company in request.companies],
+            concurrency=request.concurrency
+        )
+        
+        return EmailBulkGenerateResponse(
+            emails=[EmailResponse(**email) for email in result["emails"]],
+            results=result["results"],
+            total=result["total"],
+            succeeded=result["succeeded"],
+            failed=result["failed"]
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk generate emails error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/batch", response_model=EmailBatchSubmitResponse, status_code=202)
+async def generate_emails_batch(
+    request: EmailBatchGenerateRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Generate emails for a list of companies as one offline batch job
+    Returns once the job is submitted and stored; its emails are collected by
+    the background sweep or when GET /generate/batch/{id} finds it finished
+    """
+    try:
+        if len(request.companies) > settings.EMAIL_BULK_MAX_COMPANIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many companies. Maximum is {settings.EMAIL_BULK_MAX_COMPANIES} per request."
+            )
+        
+        companies = [company.dict() for company in request.companies]
+        
+        service = EmailManagementService()
+        job = await service.submit_emails_batch(user_id=user_id, companies=companies)
+        
+        return EmailBatchSubmitResponse(**job)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch generate emails error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/generate/batch/{batch_id}", response_model=EmailBatchJobResponse)
+async def get_emails_batch(
+    batch_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Get a batch job's status
+    A running job is checked with Gemini and its emails stored if it has finished
+    """
+    try:
+        service = EmailManagementService()
+        job = await service.get_emails_batch(user_id, batch_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Batch job not found")
+        
+        job = await service.collect_emails_batch(job)
+        
+        return EmailBatchJobResponse(**job)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get batch job error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/list", response_model=List[EmailResponse])
 async def get_emails(
     status: Optional[str] = None,
@@ -66,12 +253,37 @@ async def get_emails(
         emails = await service.get_emails(user_id=user_id, status=status)
         
         return [EmailResponse(**email) for email in emails]
-        
+    
     except Exception as e:
         logger.error(f"Get emails error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/clusters", response_model=EmailClustersResponse)
+async def cluster_similar_emails(
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    status: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Group near-duplicate drafts so redundant ones can be reviewed together
+    threshold defaults to EMAIL_DUPLICATE_THRESHOLD
+    """
+    try:
+        service = EmailManagementService()
+        result = await service.cluster_similar_emails(
+            user_id=user_id,
+            threshold=threshold,
+            status=status
+        )
+        
+        return EmailClustersResponse(**result)
+    
+    except Exception as e:
+        logger.error(f"Cluster emails error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{email_id}", response_model=EmailResponse)
 async def get_email(
     email_id: str,
@@ -85,7 +297,7 @@ async def get_email(
         email = await service.get_email(user_id=user_id, email_id=email_id)
         
         return EmailResponse(**email)
-        
+    
     except Exception as e:
         logger.error(f"Get email error: {e}", exc_info=True)
         raise HTTPException(status_code=404, detail="Email not found")
@@ -109,7 +321,7 @@ async def update_email_status(
         )
         
         return EmailResponse(**email)
-        
+    
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -138,7 +350,7 @@ async def update_email_content(
         )
         
         return EmailResponse(**email)
-        
+    
     except Exception as e:
         logger.error(f"Update email content error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -157,7 +369,7 @@ async def delete_email(
         await service.delete_email(user_id=user_id, email_id=email_id)
         
         return {"success": True, "message": "Email deleted"}
-        
+    
     except Exception as e:
         logger.error(f"Delete email error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -167,17 +379,19 @@ async def delete_email(
 async def chat_with_email(
     email_id: str,
     request: ChatMessageRequest,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id)
 ):
     """
     Chat with AI about an email (for review and editing)
+    Only the newest messages are loaded; older ones are in the email's chat summary
     """
     try:
         chatbot_service = ChatbotService()
         email_service = EmailManagementService()
         
-        # Get chat history
-        chat_history = await email_service.get_chat_history(
+        # Get recent chat history
+        chat_history = await email_service.get_chat_tail(
             user_id=user_id,
             email_id=email_id
         )
@@ -190,30 +404,83 @@ async def chat_with_email(
             chat_history=chat_history
         )
         
+        # Fold older messages into the summary after responding
+        background_tasks.add_task(chatbot_service.compact_history, user_id, email_id)
+        
         return ChatMessageResponse(**response)
+    
+    except Exception as e:
+        logger.error(f"Chat error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/{email_id}/chat/stream")
+async def chat_with_email_stream(
+    email_id: str,
+    request: ChatMessageRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Chat with AI about an email, streaming the reply as Server-Sent Events
+    Emits `delta` events with reply text, then `done` (or `error`)
+    """
+    try:
+        chatbot_service = ChatbotService()
+        email_service = EmailManagementService()
         
+        # Get recent chat history
+        chat_history = await email_service.get_chat_tail(
+            user_id=user_id,
+            email_id=email_id
+        )
+    
     except Exception as e:
         logger.error(f"Chat error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        async for event in chatbot_service.chat_stream(
+            user_id=user_id,
+            email_id=email_id,
+            user_message=request.message,
+            chat_history=chat_history
+        ):
+            yield _sse_event(event["event"], event["data"])
+    
+    # Runs once the stream has finished and the turn is saved
+    background_tasks.add_task(chatbot_service.compact_history, user_id, email_id)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/{email_id}/chat/history")
 async def get_chat_history(
     email_id: str,
+    limit: int = Query(settings.CHAT_HISTORY_PAGE_SIZE, ge=1, le=200),
+    offset: int = Query(0, ge=0),
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Get chat history for an email
+    Get chat history for an email, a page at a time
+    Returns the newest `limit` messages after skipping `offset`, oldest first;
+    pass offset + limit as the next offset to page further back
     """
     try:
         service = EmailManagementService()
         history = await service.get_chat_history(
             user_id=user_id,
-            email_id=email_id
+            email_id=email_id,
+            limit=limit,
+            offset=offset
         )
         
-        return {"messages": history}
-        
+        return {"messages": history, "has_more": len(history) == limit}
+    
     except Exception as e:
         logger.error(f"Get chat history error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -223,6 +490,7 @@ async def get_chat_history(
 async def apply_quick_action(
     email_id: str,
     request: QuickActionRequest,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id)
 ):
     """
@@ -236,8 +504,11 @@ async def apply_quick_action(
             action=request.action
         )
         
-        return result
+        # Quick actions add chat turns too
+        background_tasks.add_task(chatbot_service.compact_history, user_id, email_id)
         
+        return result
+    
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
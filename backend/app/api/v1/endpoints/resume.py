@@ -2,7 +2,7 @@
 Resume upload and parsing endpoints
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from app.core.security import get_current_user_id
 from app.models.schemas import ResumeUploadResponse, ResumeParseResponse
@@ -60,7 +60,7 @@ async def upload_resume(
         result = await resume_service.upload_resume(user_id, file)
         
         return ResumeUploadResponse(**result)
-        
+    
     except Exception as e:
         logger.error(f"Resume upload error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -69,11 +69,14 @@ async def upload_resume(
 @router.post("/parse/{resume_id}", response_model=ResumeParseResponse)
 async def parse_resume(
     resume_id: str,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id)
 ):
     """
     Parse uploaded resume using AI
     Extracts skills, experience, education, etc.
+    Context suggestions come from the same LLM call when the resume has text;
+    for file-only resumes they are generated in the background after the response
     """
     try:
         logger.info(f"User {user_id} parsing resume: {resume_id}")
@@ -84,11 +87,12 @@ async def parse_resume(
         
         # Get resume text (preferred) or file content
         resume_text = None
+        suggestions = None
         try:
             resume_text = await resume_service.get_resume_text(resume_id, user_id)
             if resume_text:
-                # Parse text directly
-                parsed_data = await ai_service.parse_resume_text(resume_text)
+                # Parse text and suggest context in one call
+                parsed_data, suggestions = await ai_service.parse_resume_with_suggestions(resume_text)
             else:
                 # Fallback to file parsing if no text (e.g. image PDF)
                 file_content, mime_type = await resume_service.get_resume_file_content(resume_id, user_id)
@@ -99,7 +103,11 @@ async def parse_resume(
             parsed_data = await ai_service.parse_resume_file(file_content, mime_type)
         
         # Update database
-        await resume_service.save_parsed_data(resume_id, user_id, parsed_data)
+        await resume_service.save_parsed_data(resume_id, user_id, parsed_data, context_suggestions=suggestions)
+        
+        # Start suggestions as soon as the parse is stored, so /context/suggestions finds them
+        if suggestions is None:
+            background_tasks.add_task(resume_service.refresh_context_suggestions, resume_id, user_id, parsed_data)
         
         # Also update context table with new resume data
         try:
@@ -116,11 +124,12 @@ async def parse_resume(
         return ResumeParseResponse(
             resume_id=resume_id,
             parsed_data=parsed_data,
+            context_suggestions=suggestions,
             is_upload_completed=True,
             is_parse_completed=True,
             message="Resume parsed successfully"
         )
-        
+    
     except Exception as e:
         logger.error(f"Resume parsing error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
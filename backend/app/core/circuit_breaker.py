@@ -0,0 +1,168 @@
+"""
+Circuit breakers for Gemini models and API keys
+Stops sending calls to a model or key that keeps failing, so requests fail in
+milliseconds (or reroute) instead of each waiting out its own timeout.
+After a cool-down a single probe call decides whether the circuit closes again
+"""
+
+from google.genai import errors
+from app.core.config import settings
+from app.core.gemini_client import KEY_SLOTS, get_api_key
+from typing import Dict
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that mean the key itself is unusable (invalid, forbidden, quota exhausted)
+KEY_ERROR_CODES = {401, 403, 429}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model or key whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the probe when half-open)"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < settings.GEMINI_BREAKER_RESET_TIMEOUT:
+                return False
+            self.state = HALF_OPEN
+            logger.info(f"Circuit {self.name} half-open, probing")
+        if self.state == HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def release(self):
+        """Give back a claimed probe without an outcome (e.g. cancelled call)"""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= settings.GEMINI_BREAKER_FAILURE_THRESHOLD:
+            if self.state != OPEN:
+                logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, round(self.opened_at + settings.GEMINI_BREAKER_RESET_TIMEOUT - time.monotonic(), 1))
+        return {"state": self.state, "failures": self.failures, "retry_in": retry_in}
+
+
+class CircuitBreakerRegistry:
+    """Breakers per model and per API key"""
+
+    def __init__(self):
+        self._models: Dict[str, CircuitBreaker] = {}
+        self._keys: Dict[str, CircuitBreaker] = {}
+
+    def model(self, model: str) -> CircuitBreaker:
+        if model not in self._models:
+            self._models[model] = CircuitBreaker(model)
+        return self._models[model]
+
+    def key(self, api_key: str) -> CircuitBreaker:
+        if api_key not in self._keys:
+            self._keys[api_key] = CircuitBreaker(f"key ...{api_key[-4:]}")
+        return self._keys[api_key]
+
+    def route_slot(self, slot: str) -> str:
+        """
+        Key slot to use for a call: the requested slot, or another slot with a
+        different key when the requested key's circuit is open
+        """
+        breaker = self._keys.get(get_api_key(slot))
+        if breaker is None or breaker.state == CLOSED:
+            return slot
+        for other in KEY_SLOTS:
+            other_key = get_api_key(other)
+            if other_key and other_key != get_api_key(slot) and self.key(other_key).state == CLOSED:
+                logger.info(f"Rerouting {slot} call to the {other} key (circuit open)")
+                return other
+        return slot
+
+    def check(self, api_key: str, model: str):
+        """
+        Claim permission for a call on a key and model
+
+        Raises:
+            CircuitOpenError: If either circuit is open
+        """
+        model_breaker = self.model(model)
+        if not model_breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {model}")
+        key_breaker = self.key(api_key)
+        if not key_breaker.allow():
+            model_breaker.release()
+            raise CircuitOpenError(f"Circuit open for API {key_breaker.name}")
+
+    def record_success(self, api_key: str, model: str):
+        self.model(model).record_success()
+        self.key(api_key).record_success()
+
+    def record_failure(self, api_key: str, model: str, error: BaseException):
+        """Charge a failed call to the key or the model depending on the error"""
+        if isinstance(error, errors.ClientError) and error.code in KEY_ERROR_CODES:
+            self.key(api_key).record_failure()
+            self.model(model).release()
+        elif isinstance(error, errors.ClientError):
+            # Bad request: neither the key nor the model is at fault
+            self.key(api_key).release()
+            self.model(model).release()
+        else:
+            # Timeouts, 5xx and transport errors count against the model
+            self.model(model).record_failure()
+            self.key(api_key).release()
+
+    def release(self, api_key: str, model: str):
+        self.model(model).release()
+        self.key(api_key).release()
+
+    def snapshot(self) -> dict:
+        """Breaker states for the health endpoint; keys are labelled by slot, never exposed"""
+        keys = {}
+        for api_key, breaker in self._keys.items():
+            slots = [slot for slot in KEY_SLOTS if get_api_key(slot) == api_key]
+            keys[",".join(slots) or breaker.name] = breaker.snapshot()
+        return {
+            "models": {model: breaker.snapshot() for model, breaker in self._models.items()},
+            "keys": keys,
+        }
+
+    def any_open(self) -> bool:
+        return any(
+            breaker.state != CLOSED
+            for breaker in [*self._models.values(), *self._keys.values()]
+        )
+
+
+# Process-wide breakers shared by all AIService instances
+circuit_breakers = CircuitBreakerRegistry()
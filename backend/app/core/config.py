@@ -4,7 +4,7 @@ Uses pydantic-settings for environment variable management
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -26,6 +26,8 @@ class Settings(BaseSettings):
     SUPABASE_SERVICE_ROLE_KEY: str
     SUPABASE_JWT_SECRET: str
     DATABASE_URL: str
+    SUPABASE_POSTGREST_TIMEOUT: float = 30.0  # Seconds per PostgREST request
+    SUPABASE_STORAGE_TIMEOUT: int = 60  # Seconds per storage request (resume uploads/downloads)
     
     # AI & Gemini
     GOOGLE_API_KEY: str
@@ -38,6 +40,108 @@ class Settings(BaseSettings):
     GEMINI_MODEL_CHATBOT: str = "models/gemini-2.5-pro"  # Conversation & review
     GEMINI_TEMPERATURE: float = 0.7
     
+    # LLM Backend
+    LLM_BACKEND: str = "gemini"  # "gemini" or "fake" (local replies for load tests and benchmarks)
+    FAKE_LLM_SEED: int = 0  # Seeds latency, error and reply sampling so runs are reproducible
+    FAKE_LLM_LATENCY: float = 0.8  # Seconds; median call latency
+    FAKE_LLM_MODEL_LATENCY: Dict[str, float] = {}  # Per-model median override, e.g. {"models/gemini-2.5-pro": 3.0}
+    FAKE_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # "fixed", "uniform", "normal" or "lognormal"
+    FAKE_LLM_LATENCY_SPREAD: float = 0.5  # Relative spread (sigma for lognormal)
+    FAKE_LLM_ERROR_RATE: float = 0.0  # Share of calls failing with HTTP 503
+    FAKE_LLM_RATE_LIMIT_RATE: float = 0.0  # Share of calls failing with HTTP 429
+    FAKE_LLM_COMPLETION_TOKENS: int = 200  # Approximate length of free-text replies
+    FAKE_LLM_ARRAY_ITEMS: int = 2  # Items generated for each array in a response schema
+    FAKE_LLM_STREAM_CHUNKS: int = 10  # Chunks per streamed reply
+    FAKE_LLM_STREAM_CHUNK_DELAY: float = 0.05  # Seconds between streamed chunks
+    
+    # Gemini Model Routing
+    GEMINI_ROUTER_ENABLED: bool = True
+    GEMINI_MODEL_CASCADE: List[str] = [  # Cheapest/fastest first; each role escalates up to its configured model
+        "models/gemini-2.0-flash",
+        "models/gemini-2.5-flash",
+        "models/gemini-2.5-pro",
+    ]
+    GEMINI_ROUTER_WINDOW: int = 100  # Calls per model kept for p50/p95 and error rate
+    GEMINI_ROUTER_MAX_ERROR_RATE: float = 0.5  # Models above this are tried last
+    GEMINI_ROUTER_TIMEOUT_FACTOR: float = 2.0  # Attempt timeout = p95 * factor
+    GEMINI_ROUTER_MIN_TIMEOUT: float = 5.0  # Seconds
+    GEMINI_ROUTER_MAX_TIMEOUT: float = 60.0  # Seconds; also used before stats exist
+    GEMINI_ROUTER_LATENCY_TARGET: float = 15.0  # Seconds; p50 a model must keep to stay in cascade order
+    GEMINI_ROUTER_LATENCY_TARGETS: Dict[str, float] = {  # Per-operation p50 targets (operation names from llm_operation)
+        "chat": 4.0,
+        "chat_completion": 4.0,
+        "quick_action": 4.0,
+        "generate_email": 8.0,
+        "generate_email_stream": 8.0,
+        "chat_completion_stream": 4.0,
+        "generate_email_variants": 10.0,
+    }
+    
+    # Gemini Request Hedging (interactive chat and quick actions)
+    GEMINI_HEDGE_ENABLED: bool = False  # Opt-in: duplicate slow calls after the p90 latency
+    GEMINI_HEDGE_PERCENTILE: float = 0.9  # Hedge once a call outlives this latency percentile
+    GEMINI_HEDGE_MIN_DELAY: float = 0.5  # Seconds; never hedge earlier than this
+    GEMINI_HEDGE_MAX_RATIO: float = 0.1  # Max hedges per primary call (0.1 = 10% extra calls)
+    GEMINI_HEDGE_BURST: float = 5.0  # Hedge credits that can accumulate while idle
+    
+    # Gemini Circuit Breakers (per model and per API key)
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before a circuit opens
+    GEMINI_BREAKER_RESET_TIMEOUT: float = 30.0  # Seconds open before a single probe call is allowed
+    
+    # Gemini Quotas (per API key and model)
+    GEMINI_RPM_LIMIT: int = 15
+    GEMINI_TPM_LIMIT: int = 1000000
+    GEMINI_MODEL_RATE_LIMITS: Dict[str, Dict[str, int]] = {}  # e.g. {"models/gemini-2.5-pro": {"rpm": 5, "tpm": 250000}}
+    GEMINI_OUTPUT_TOKEN_RESERVE: int = 1024  # Tokens reserved per call for the response
+    GEMINI_QUEUE_TIMEOUT: float = 120.0  # Max seconds a call waits for quota
+    GEMINI_MAX_RETRIES: int = 3  # Retries after HTTP 429
+    GEMINI_RETRY_BASE_DELAY: float = 2.0  # Seconds, doubled per retry
+    
+    # LLM Metrics
+    GEMINI_MODEL_PRICES: Dict[str, Dict[str, float]] = {  # USD per 1M tokens, for cost estimates
+        "models/gemini-2.0-flash": {"input": 0.10, "output": 0.40},
+        "models/gemini-2.5-flash": {"input": 0.30, "output": 2.50},
+        "models/gemini-2.5-pro": {"input": 1.25, "output": 10.00},
+    }
+    LLM_USAGE_FLUSH_INTERVAL: float = 60.0  # Seconds between writes of per-user daily totals
+    
+    # AI Caching
+    RESUME_PARSE_CACHE_SIZE: int = 256  # In-process LRU entries in front of resume_parse_cache
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = True  # Explicit context caching of candidate profiles
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = 1024  # Gemini's minimum cacheable size; smaller prefixes go inline
+    GEMINI_CONTEXT_CACHE_TTL: int = 3600  # Seconds
+    QUICK_ACTION_CACHE_SIZE: int = 1024  # Quick-action rewrites kept in-process (LRU)
+    QUICK_ACTION_CACHE_SIMILARITY: float = 0.95  # Min MinHash similarity for a near-identical email to reuse a rewrite; above 1.0 disables
+    
+    # Prompt Token Budgets
+    TOKEN_BUDGET_RESUME_PARSE: int = 6000  # Resume text sent for parsing
+    TOKEN_BUDGET_EMAIL_RESUME: int = 3000  # Resume text in the cached candidate prefix of email prompts
+    TOKEN_BUDGET_CHAT_EMAIL: int = 1500  # Email body quoted in chat prompts
+    TOKEN_BUDGET_CHAT_HISTORY: int = 1500  # Chat history quoted in chat prompts
+    TOKEN_BUDGET_CHAT_SUMMARY: int = 400  # Running summary of older chat messages
+    
+    # Chat History Compaction
+    CHAT_RECENT_MESSAGES: int = 6  # Newest messages kept verbatim; older ones are summarized
+    CHAT_SUMMARY_EVERY_TURNS: int = 3  # Turns (user + assistant) beyond the recent ones before the summary is updated
+    CHAT_HISTORY_PAGE_SIZE: int = 50  # Default page of GET /emails/{id}/chat/history
+    
+    # Bulk Email Generation
+    EMAIL_BULK_CONCURRENCY: int = 8  # Default concurrent LLM calls per bulk request
+    EMAIL_BULK_MAX_CONCURRENCY: int = 32
+    EMAIL_BULK_MAX_COMPANIES: int = 500
+    EMAIL_MAX_VARIANTS: int = 5  # Drafts per company from one generate call
+    
+    # Near-Duplicate Drafts
+    EMAIL_DUPLICATE_THRESHOLD: float = 0.8  # MinHash similarity at which a draft is flagged / clustered
+    EMAIL_DUPLICATE_LSH_BANDS: int = 16  # Bands of the 64-value signature; more bands find less similar pairs
+    EMAIL_DUPLICATE_MAX_CANDIDATES: int = 1000  # Existing drafts fetched per duplicate check
+    
+    # Offline Batch Generation
+    GEMINI_BATCH_BACKEND: str = "gemini"  # "gemini" or "fake" (canned replies for local runs); LLM_BACKEND="fake" implies fake
+    GEMINI_BATCH_POLL_INTERVAL: float = 30.0  # Seconds between job status checks
+    GEMINI_BATCH_MAX_WAIT: float = 86400.0  # Seconds; batch jobs complete within 24h
+    GEMINI_BATCH_SWEEP_ENABLED: bool = True  # Collect finished jobs in the background (also resumes them after a restart)
+    
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     
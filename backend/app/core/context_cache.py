@@ -0,0 +1,84 @@
+"""
+Gemini context cache registry
+Maps stable prompt prefixes (e.g. a candidate profile) to Gemini cached contents
+so repeated generations only send their per-request delta
+"""
+
+from google.genai import types
+from app.core.config import settings
+from app.core.gemini_client import get_api_key, get_gemini_client
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ContextCacheRegistry:
+    """Tracks cached contents per (API key, model, prefix fingerprint)"""
+
+    # Don't hand out a cache that is about to expire mid-request
+    EXPIRY_MARGIN_SECONDS = 30
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
+        self._locks: Dict[Tuple[str, str, str], asyncio.Lock] = {}
+
+    @staticmethod
+    def fingerprint(prefix: str) -> str:
+        """Content hash of a prefix; any context or resume change yields a new cache"""
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: Tuple[str, str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and entry[1] - self.EXPIRY_MARGIN_SECONDS > time.monotonic():
+            return entry[0]
+        return None
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            self._entries.pop(key, None)
+            self._locks.pop(key, None)
+
+    async def get_or_create(self, slot: str, model: str, prefix: str) -> Optional[str]:
+        """
+        Get the cached content name for a prefix, creating it on first use
+        Returns None if the cache cannot be created, so callers send the prefix inline
+        """
+        key = (get_api_key(slot), model, self.fingerprint(prefix))
+        name = self._lookup(key)
+        if name:
+            return name
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another request may have created it while we waited
+            name = self._lookup(key)
+            if name:
+                return name
+
+            try:
+                ttl = settings.GEMINI_CONTEXT_CACHE_TTL
+                cached = await get_gemini_client(slot).aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=prefix,
+                        ttl=f"{ttl}s",
+                        display_name="agentm-candidate-profile"
+                    )
+                )
+            except Exception as e:
+                logger.warning(f"Context cache creation failed, sending prefix inline: {e}")
+                return None
+
+            self._purge_expired()
+            self._entries[key] = (cached.name, time.monotonic() + ttl)
+            logger.info(f"Created Gemini context cache {cached.name} for {model}")
+            return cached.name
+
+
+# Process-wide registry shared by all AIService instances
+context_cache = ContextCacheRegistry()
@@ -0,0 +1,160 @@
+"""
+Offline batch generation for Gemini
+Submits many generate requests as one batch job (lower cost, separate quota
+from interactive calls) and collects the responses in request order
+"""
+
+from app.core.config import settings
+from app.core.gemini_client import get_gemini_client
+from typing import Callable, List, Optional, Union
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SUCCEEDED_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+BATCH_FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+class BatchJobFailed(Exception):
+    """Raised when a batch job ends without results"""
+
+
+class GeminiBatchBackend:
+    """Batch jobs on the Gemini API with inline requests"""
+
+    def __init__(self, slot: str = "generator"):
+        self.slot = slot
+
+    async def submit(self, model: str, requests: List[dict], display_name: str) -> str:
+        """
+        Submit a batch job
+
+        Args:
+            model: Model to run every request on
+            requests: Inline requests, each {"contents": ..., "config": {...}}
+            display_name: Job name shown in the Gemini console
+
+        Returns:
+            Batch job name used for polling
+        """
+        job = await get_gemini_client(self.slot).aio.batches.create(
+            model=model,
+            src=requests,
+            config={"display_name": display_name}
+        )
+        logger.info(f"Submitted Gemini batch job {job.name} with {len(requests)} requests")
+        return job.name
+
+    async def poll(self, job_name: str) -> Optional[List[dict]]:
+        """
+        Check a batch job
+
+        Args:
+            job_name: Name returned by submit()
+
+        Returns:
+            None while the job is running, otherwise one {"text", "error"} dict
+            per request, in request order
+
+        Raises:
+            BatchJobFailed: If the job failed, was cancelled or expired
+        """
+        job = await get_gemini_client(self.slot).aio.batches.get(name=job_name)
+        state = getattr(job.state, "name", str(job.state))
+
+        if state in BATCH_FAILED_STATES:
+            raise BatchJobFailed(f"Batch job {job_name} ended in {state}: {job.error}")
+        if state not in BATCH_SUCCEEDED_STATES:
+            return None
+
+        results = []
+        for item in job.dest.inlined_responses or []:
+            if item.error or item.response is None:
+                results.append({"text": None, "error": str(item.error or "No response")})
+            else:
+                results.append({"text": item.response.text, "error": None})
+        return results
+
+
+class FakeBatchBackend:
+    """
+    Local stand-in for the batch API that replays canned results
+    Records submitted jobs so tests can inspect the requests
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Union[List[Union[str, Exception]], Callable[[int, dict], str]]] = None,
+        polls_until_done: int = 1,
+        fail: bool = False
+    ):
+        """
+        Args:
+            responses: Reply text (or an Exception for a failed item) per request,
+                or a callable (index, request) -> text. Defaults to a canned email
+            polls_until_done: Polls reporting "running" before results are ready
+            fail: End every job in JOB_STATE_FAILED
+        """
+        self.responses = responses
+        self.polls_until_done = polls_until_done
+        self.fail = fail
+        self.jobs: dict = {}
+
+    @staticmethod
+    def _canned_reply(index: int, request: dict) -> str:
+        return json.dumps({
+            "subject": f"Canned subject {index + 1}",
+            "body": f"Canned body {index + 1}"
+        })
+
+    async def submit(self, model: str, requests: List[dict], display_name: str) -> str:
+        job_name = f"batches/fake-{len(self.jobs) + 1}"
+        self.jobs[job_name] = {"model": model, "requests": requests, "polls": 0}
+        return job_name
+
+    async def poll(self, job_name: str) -> Optional[List[dict]]:
+        if job_name not in self.jobs:
+            # Jobs only live in memory, so they are gone after a restart
+            raise BatchJobFailed(f"Batch job {job_name} not found")
+        job = self.jobs[job_name]
+        job["polls"] += 1
+        if job["polls"] < self.polls_until_done:
+            return None
+        if self.fail:
+            raise BatchJobFailed(f"Batch job {job_name} ended in JOB_STATE_FAILED")
+
+        results = []
+        for index, request in enumerate(job["requests"]):
+            if self.responses is None:
+                reply = self._canned_reply(index, request)
+            elif callable(self.responses):
+                reply = self.responses(index, request)
+            else:
+                reply = self.responses[index]
+
+            if isinstance(reply, Exception):
+                results.append({"text": None, "error": str(reply)})
+            else:
+                results.append({"text": reply, "error": None})
+        return results
+
+
+_fake_batch_backend: Optional[FakeBatchBackend] = None
+
+
+def get_batch_backend():
+    """
+    Batch backend selected by GEMINI_BATCH_BACKEND ("gemini" or "fake")
+    Always the fake when LLM_BACKEND is "fake", so offline runs never reach Gemini;
+    the fake is shared process-wide so jobs can be collected by any service instance
+    """
+    global _fake_batch_backend
+    if settings.GEMINI_BATCH_BACKEND == "fake" or settings.LLM_BACKEND == "fake":
+        if _fake_batch_backend is None:
+            _fake_batch_backend = FakeBatchBackend()
+        return _fake_batch_backend
+    if settings.GEMINI_BATCH_BACKEND != "gemini":
+        raise ValueError(f"Unknown batch backend '{settings.GEMINI_BATCH_BACKEND}'. Must be 'gemini' or 'fake'")
+    return GeminiBatchBackend()
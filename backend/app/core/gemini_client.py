@@ -0,0 +1,54 @@
+"""
+Gemini client pool
+Keeps one long-lived google-genai client per API key slot (PARSER/GENERATOR/CHATBOT)
+"""
+
+from google import genai
+from app.core.config import settings
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Key slots configured in settings; each falls back to GOOGLE_API_KEY
+KEY_SLOTS = ("parser", "generator", "chatbot")
+
+
+def get_api_key(slot: str) -> str:
+    """Resolve the API key for a key slot"""
+    slot_keys = {
+        "parser": settings.GOOGLE_API_KEY_PARSER,
+        "generator": settings.GOOGLE_API_KEY_GENERATOR,
+        "chatbot": settings.GOOGLE_API_KEY_CHATBOT,
+    }
+    if slot not in slot_keys:
+        raise ValueError(f"Unknown key slot '{slot}'. Must be one of: {list(KEY_SLOTS)}")
+    return slot_keys[slot] or settings.GOOGLE_API_KEY
+
+
+class GeminiClientPool:
+    """Singleton pool of Gemini clients, keyed by API key"""
+
+    _clients: Dict[str, genai.Client] = {}
+
+    @classmethod
+    def get_client(cls, api_key: str) -> genai.Client:
+        """Get or create the client for an API key"""
+        client = cls._clients.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            cls._clients[api_key] = client
+            logger.info(f"✅ Gemini client initialized ({len(cls._clients)} in pool)")
+        return client
+
+    @classmethod
+    def clear(cls):
+        """Drop all pooled clients (used in tests)"""
+        cls._clients.clear()
+
+
+# Convenience function for getting the client of a key slot
+def get_gemini_client(slot: str) -> genai.Client:
+    """Get the pooled Gemini client for a key slot"""
+    return GeminiClientPool.get_client(get_api_key(slot))
@@ -0,0 +1,51 @@
+"""
+Hedged request budget
+Caps hedged (duplicate) Gemini calls to a configured share of primary calls,
+so tail-latency hedging can never multiply load during an incident
+"""
+
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeBudget:
+    """
+    Credit bucket for hedges: every primary call earns GEMINI_HEDGE_MAX_RATIO
+    credits (up to GEMINI_HEDGE_BURST) and every hedge spends one
+    """
+
+    def __init__(self):
+        self.credits = 0.0
+        self.primary_calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record_request(self):
+        self.primary_calls += 1
+        self.credits = min(settings.GEMINI_HEDGE_BURST, self.credits + settings.GEMINI_HEDGE_MAX_RATIO)
+
+    def try_acquire(self) -> bool:
+        """Spend one credit for a hedge; False once the budget is used up"""
+        if self.credits < 1:
+            return False
+        self.credits -= 1
+        self.hedges += 1
+        return True
+
+    def record_win(self):
+        """The hedge finished before the primary call"""
+        self.hedge_wins += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "primary_calls": self.primary_calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "credits": round(self.credits, 2),
+        }
+
+
+# Process-wide budget shared by all AIService instances
+hedge_budget = HedgeBudget()
@@ -0,0 +1,247 @@
+"""
+LLM backends for AIService
+GeminiBackend calls the Gemini API; FakeLLMBackend answers locally with
+schema-valid replies, configurable latency, error rates and token counts, so
+the full API can be load-tested and benchmarked without credentials or quota
+"""
+
+from google.genai import errors, types
+from app.core.config import settings
+from app.core.gemini_client import get_gemini_client
+from app.core.rate_limiter import estimate_tokens
+from typing import Any, AsyncIterator, Callable, Optional
+import asyncio
+import httpx
+import json
+import logging
+import math
+import random
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+FILLER_SENTENCE = "This is a placeholder reply from the local fake LLM backend."
+
+
+class GeminiBackend:
+    """
+    Gemini API through the pooled client of each key slot
+
+    Backends implement:
+        generate(slot, model, contents, config) -> GenerateContentResponse
+        generate_stream(slot, model, contents, config) -> async iterator of responses
+        supports_context_cache: whether explicit context caches can be created
+    """
+
+    supports_context_cache = True
+
+    async def generate(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> types.GenerateContentResponse:
+        return await get_gemini_client(slot).aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config
+        )
+
+    async def generate_stream(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        return await get_gemini_client(slot).aio.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=config
+        )
+
+
+def api_error(code: int, message: str) -> errors.APIError:
+    """Build a ClientError/ServerError like the SDK raises for an HTTP error"""
+    error_class = errors.ClientError if code < 500 else errors.ServerError
+    body = {"error": {"code": code, "message": message, "status": "FAKE"}}
+    try:
+        return error_class(code, body, None)
+    except TypeError:
+        # Older SDKs take the HTTP response instead of its JSON
+        return error_class(code, httpx.Response(code, json=body))
+
+
+class FakeLLMBackend:
+    """
+    Local stand-in for Gemini
+
+    JSON requests get a reply generated from the response schema (strings are
+    templated from field names); text requests get filler sized to the configured
+    completion token count. Latency, errors and token counts come from the
+    FAKE_LLM_* settings and a seeded RNG, so runs are reproducible
+    """
+
+    supports_context_cache = False
+
+    def __init__(
+        self,
+        responses: Optional[Callable[[str, Any, Optional[types.GenerateContentConfig]], str]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            responses: Optional callable (model, contents, config) -> reply text,
+                overriding the generated replies
+            seed: RNG seed; defaults to FAKE_LLM_SEED
+        """
+        self.responses = responses
+        self.random = random.Random(settings.FAKE_LLM_SEED if seed is None else seed)
+        self.calls = 0
+
+    def sample_latency(self, model: str) -> float:
+        """Seconds for one call, drawn from FAKE_LLM_LATENCY_DISTRIBUTION"""
+        median = settings.FAKE_LLM_MODEL_LATENCY.get(model, settings.FAKE_LLM_LATENCY)
+        spread = settings.FAKE_LLM_LATENCY_SPREAD
+        distribution = settings.FAKE_LLM_LATENCY_DISTRIBUTION
+
+        if distribution == "fixed":
+            return median
+        if distribution == "uniform":
+            return max(0.0, self.random.uniform(median * (1 - spread), median * (1 + spread)))
+        if distribution == "normal":
+            return max(0.0, self.random.gauss(median, median * spread))
+        if distribution == "lognormal":
+            return self.random.lognormvariate(math.log(median), spread) if median > 0 else 0.0
+        raise ValueError(f"Unknown latency distribution '{distribution}'. Must be one of: {list(LATENCY_DISTRIBUTIONS)}")
+
+    def _maybe_fail(self):
+        """Raise a 429 or 503 at the configured rates"""
+        roll = self.random.random()
+        if roll < settings.FAKE_LLM_RATE_LIMIT_RATE:
+            raise api_error(429, "Fake quota exceeded")
+        if roll < settings.FAKE_LLM_RATE_LIMIT_RATE + settings.FAKE_LLM_ERROR_RATE:
+            raise api_error(503, "Fake model overloaded")
+
+    def _reply_text(self, model: str, contents: Any, config: Optional[types.GenerateContentConfig]) -> str:
+        if self.responses is not None:
+            return self.responses(model, contents, config)
+
+        schema = config.response_schema if config else None
+        if schema is not None:
+            if isinstance(schema, dict):
+                schema = types.Schema.model_validate(schema)
+            return json.dumps(self._from_schema(schema, "value"))
+        if config and config.response_mime_type == "application/json":
+            return json.dumps({"reply": self._filler()})
+        return f"Fake reply from {model}\n\n{self._filler()}"
+
+    def _filler(self) -> str:
+        """Text of roughly FAKE_LLM_COMPLETION_TOKENS tokens (~4 characters per token)"""
+        target_chars = settings.FAKE_LLM_COMPLETION_TOKENS * 4
+        repeats = max(1, target_chars // (len(FILLER_SENTENCE) + 1))
+        return " ".join([FILLER_SENTENCE] * repeats)
+
+    def _from_schema(self, schema: types.Schema, name: str, index: int = 0) -> Any:
+        """A value satisfying a Gemini schema; strings are templated from the field name"""
+        if schema.any_of:
+            return self._from_schema(schema.any_of[0], name, index)
+        if schema.enum:
+            return schema.enum[0]
+
+        schema_type = getattr(schema.type, "value", schema.type)
+        if schema_type == "OBJECT":
+            return {
+                prop: self._from_schema(prop_schema, prop, index)
+                for prop, prop_schema in (schema.properties or {}).items()
+            }
+        if schema_type == "ARRAY":
+            items = schema.items or types.Schema(type="STRING")
+            return [
+                self._from_schema(items, name, item)
+                for item in range(settings.FAKE_LLM_ARRAY_ITEMS)
+            ]
+        if schema_type == "INTEGER":
+            return index + 1
+        if schema_type == "NUMBER":
+            return float(index + 1)
+        if schema_type == "BOOLEAN":
+            return True
+        return f"Fake {name} {index + 1}"
+
+    @staticmethod
+    def _usage(contents: Any, text: str) -> types.GenerateContentResponseUsageMetadata:
+        prompt_tokens = estimate_tokens(contents)
+        completion_tokens = estimate_tokens(text)
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=completion_tokens,
+            total_token_count=prompt_tokens + completion_tokens
+        )
+
+    @staticmethod
+    def _response(
+        text: str,
+        usage: Optional[types.GenerateContentResponseUsageMetadata]
+    ) -> types.GenerateContentResponse:
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text=text)]),
+                finish_reason="STOP"
+            )],
+            usage_metadata=usage
+        )
+
+    async def generate(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> types.GenerateContentResponse:
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency(model))
+        self._maybe_fail()
+        text = self._reply_text(model, contents, config)
+        return self._response(text, self._usage(contents, text))
+
+    async def generate_stream(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        """
+        Stream the reply in FAKE_LLM_STREAM_CHUNKS pieces; the first arrives after
+        the sampled latency, the rest FAKE_LLM_STREAM_CHUNK_DELAY apart
+        """
+        self.calls += 1
+        latency = self.sample_latency(model)
+        self._maybe_fail()
+        text = self._reply_text(model, contents, config)
+        size = max(1, math.ceil(len(text) / settings.FAKE_LLM_STREAM_CHUNKS))
+        chunks = [text[start:start + size] for start in range(0, len(text), size)]
+
+        async def stream():
+            await asyncio.sleep(latency)
+            for index, chunk in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(settings.FAKE_LLM_STREAM_CHUNK_DELAY)
+                # Like Gemini, usage is reported with the final chunk
+                last = index == len(chunks) - 1
+                yield self._response(chunk, self._usage(contents, text) if last else None)
+
+        return stream()
+
+
+def get_llm_backend():
+    """LLM backend selected by LLM_BACKEND ("gemini" or "fake")"""
+    if settings.LLM_BACKEND == "fake":
+        return FakeLLMBackend()
+    if settings.LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM backend '{settings.LLM_BACKEND}'. Must be 'gemini' or 'fake'")
+    return GeminiBackend()
@@ -0,0 +1,279 @@
+"""
+LLM call instrumentation
+Every Gemini call is recorded with its model, key slot, token counts, time to
+first token, latency, retries and outcome. Calls are aggregated in-process into
+fixed-bucket histograms per operation and model, served by the /metrics endpoint
+together with the tokens saved by prompt budgeting
+"""
+
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.core.rate_limiter import RateLimitTimeout
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from google.genai import errors
+from typing import Callable, Dict, List, Optional
+import asyncio
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0]
+
+OUTCOME_OK = "ok"
+OUTCOME_RATE_LIMITED = "rate_limited"
+OUTCOME_CLIENT_ERROR = "client_error"
+OUTCOME_SERVER_ERROR = "server_error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CIRCUIT_OPEN = "circuit_open"
+OUTCOME_CANCELLED = "cancelled"
+OUTCOME_ERROR = "error"
+
+# Operation (public AIService method) and user the current call is made for
+current_operation: ContextVar[str] = ContextVar("llm_operation", default="unknown")
+current_user: ContextVar[Optional[str]] = ContextVar("llm_user", default=None)
+
+
+def set_llm_user(user_id: Optional[str]):
+    """Attribute LLM calls made by the current request to a user"""
+    current_user.set(user_id)
+
+
+def llm_operation(name: str) -> Callable:
+    """
+    Label Gemini calls made inside an async method with an operation name
+    Nested operations keep the outermost label
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if current_operation.get() != "unknown":
+                return await func(*args, **kwargs)
+            token = current_operation.set(name)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                current_operation.reset(token)
+        return wrapper
+    return decorator
+
+
+def classify_outcome(error: BaseException) -> str:
+    """Map an exception raised by a Gemini call to an outcome label"""
+    if isinstance(error, CircuitOpenError):
+        return OUTCOME_CIRCUIT_OPEN
+    if isinstance(error, RateLimitTimeout):
+        return OUTCOME_RATE_LIMITED
+    if isinstance(error, errors.ClientError):
+        return OUTCOME_RATE_LIMITED if error.code == 429 else OUTCOME_CLIENT_ERROR
+    if isinstance(error, errors.ServerError):
+        return OUTCOME_SERVER_ERROR
+    if isinstance(error, asyncio.TimeoutError):
+        return OUTCOME_TIMEOUT
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return OUTCOME_CANCELLED
+    return OUTCOME_ERROR
+
+
+@dataclass
+class LLMCall:
+    """One Gemini call (including its 429 retries)"""
+    slot: str
+    model: str
+    latency: float
+    outcome: str = OUTCOME_OK
+    retries: int = 0
+    ttft: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    operation: str = "unknown"
+    user_id: Optional[str] = None
+
+    @classmethod
+    def from_usage(cls, usage, **fields) -> "LLMCall":
+        """Build a call record, reading token counts from response usage_metadata"""
+        call = cls(**fields)
+        if usage is not None:
+            call.prompt_tokens = usage.prompt_token_count or 0
+            call.completion_tokens = usage.candidates_token_count or 0
+            call.cached_tokens = usage.cached_content_token_count or 0
+        if "operation" not in fields:
+            call.operation = current_operation.get()
+        call.user_id = current_user.get()
+        return call
+
+    @property
+    def cost(self) -> float:
+        """Estimated USD cost from GEMINI_MODEL_PRICES (per 1M tokens)"""
+        prices = settings.GEMINI_MODEL_PRICES.get(self.model)
+        if not prices:
+            return 0.0
+        return (
+            self.prompt_tokens * prices.get("input", 0.0)
+            + self.completion_tokens * prices.get("output", 0.0)
+        ) / 1_000_000
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are bucket upper bounds"""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class OperationStats:
+    """Aggregates for one (operation, model) pair"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.ttft = Histogram()
+        self.outcomes: Dict[str, int] = {}
+        self.slots: Dict[str, int] = {}
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+
+    def record(self, call: LLMCall):
+        self.latency.observe(call.latency)
+        if call.ttft is not None:
+            self.ttft.observe(call.ttft)
+        self.outcomes[call.outcome] = self.outcomes.get(call.outcome, 0) + 1
+        self.slots[call.slot] = self.slots.get(call.slot, 0) + 1
+        self.retries += call.retries
+        self.prompt_tokens += call.prompt_tokens
+        self.completion_tokens += call.completion_tokens
+        self.cached_tokens += call.cached_tokens
+        self.cost += call.cost
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.latency.count,
+            "outcomes": dict(self.outcomes),
+            "slots": dict(self.slots),
+            "retries": self.retries,
+            "tokens": {
+                "prompt": self.prompt_tokens,
+                "completion": self.completion_tokens,
+                "cached": self.cached_tokens,
+            },
+            "cost_usd": round(self.cost, 6),
+            "latency": self.latency.snapshot(),
+            "ttft": self.ttft.snapshot(),
+        }
+
+
+class BudgetStats:
+    """Prompt budgeting totals for one (operation, text) pair"""
+
+    def __init__(self):
+        self.fits = 0
+        self.original_tokens = 0
+        self.final_tokens = 0
+
+    def record(self, original_tokens: int, final_tokens: int):
+        self.fits += 1
+        self.original_tokens += original_tokens
+        self.final_tokens += final_tokens
+
+    def snapshot(self) -> dict:
+        return {
+            "fits": self.fits,
+            "original_tokens": self.original_tokens,
+            "final_tokens": self.final_tokens,
+            "saved_tokens": self.original_tokens - self.final_tokens,
+        }
+
+
+class LLMMetrics:
+    """In-process aggregation of LLM calls, plus listeners (e.g. per-user usage totals)"""
+
+    def __init__(self):
+        self._stats: Dict[tuple, OperationStats] = {}
+        self._budgets: Dict[tuple, BudgetStats] = {}
+        self._listeners: List[Callable[[LLMCall], None]] = []
+
+    def add_listener(self, listener: Callable[[LLMCall], None]):
+        """Call listener with every recorded call; adding the same listener twice has no effect"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[LLMCall], None]):
+        """Stop calling listener (on shutdown)"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def record(self, call: LLMCall):
+        key = (call.operation, call.model)
+        if key not in self._stats:
+            self._stats[key] = OperationStats()
+        self._stats[key].record(call)
+
+        for listener in self._listeners:
+            try:
+                listener(call)
+            except Exception as e:
+                logger.warning(f"LLM metrics listener failed: {e}")
+
+    def record_budget(self, text: str, original_tokens: int, final_tokens: int):
+        """Record a text fitted to a prompt budget, under the current operation"""
+        key = (current_operation.get(), text)
+        if key not in self._budgets:
+            self._budgets[key] = BudgetStats()
+        self._budgets[key].record(original_tokens, final_tokens)
+
+    def snapshot(self) -> dict:
+        """Stats grouped by operation, then model; budget savings by operation, then text"""
+        operations: Dict[str, dict] = {}
+        for (operation, model), stats in sorted(self._stats.items()):
+            operations.setdefault(operation, {})[model] = stats.snapshot()
+        budgets: Dict[str, dict] = {}
+        for (operation, text), stats in sorted(self._budgets.items()):
+            budgets.setdefault(operation, {})[text] = stats.snapshot()
+        return {"operations": operations, "budgets": budgets}
+
+    def reset(self):
+        self._stats.clear()
+        self._budgets.clear()
+
+
+# Process-wide metrics shared by all AIService instances
+llm_metrics = LLMMetrics()
@@ -0,0 +1,156 @@
+"""
+Latency-aware model router for Gemini
+Orders candidate models cheapest/fastest first, moves models whose live p50
+misses the operation's latency target behind those that meet it, demotes
+models with a high recent error rate, and derives per-attempt timeouts from
+observed p95 latency
+"""
+
+from app.core.config import settings
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Minimum samples before live stats override the static cascade order
+MIN_SAMPLES = 5
+
+
+class ModelStats:
+    """Rolling latency and outcome window for one model"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile of successful calls (None without data)"""
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * (len(latencies) - 1) + 0.5))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def is_healthy(self) -> bool:
+        if len(self.samples) < MIN_SAMPLES:
+            return True
+        p50 = self.percentile(0.5)
+        return (
+            self.error_rate <= settings.GEMINI_ROUTER_MAX_ERROR_RATE
+            and (p50 is None or p50 < settings.GEMINI_ROUTER_MAX_TIMEOUT)
+        )
+
+
+class ModelRouter:
+    """Chooses which models to try, in order, for a role"""
+
+    def __init__(self):
+        self._stats: Dict[str, ModelStats] = {}
+
+    def stats(self, model: str) -> ModelStats:
+        if model not in self._stats:
+            self._stats[model] = ModelStats(settings.GEMINI_ROUTER_WINDOW)
+        return self._stats[model]
+
+    @staticmethod
+    def role_model(role: str) -> str:
+        """Strongest model configured for a role"""
+        role_models = {
+            "parser": settings.GEMINI_MODEL_PARSER,
+            "generator": settings.GEMINI_MODEL_GENERATOR,
+            "chatbot": settings.GEMINI_MODEL_CHATBOT,
+        }
+        if role not in role_models:
+            raise ValueError(f"Unknown model role '{role}'. Must be one of: {list(role_models)}")
+        return role_models[role]
+
+    @staticmethod
+    def latency_target(operation: Optional[str]) -> float:
+        """p50 latency (seconds) an operation's models should keep"""
+        return settings.GEMINI_ROUTER_LATENCY_TARGETS.get(operation, settings.GEMINI_ROUTER_LATENCY_TARGET)
+
+    def candidates(self, role: str, operation: Optional[str] = None) -> List[str]:
+        """
+        Models to try for a role: the cascade up to the role's configured model
+        Healthy models whose live p50 meets the operation's latency target come
+        first, cheapest first (models without enough samples count as meeting
+        it); then healthy models missing it, fastest p50 first; then unhealthy ones
+        """
+        ceiling = self.role_model(role)
+        cascade = settings.GEMINI_MODEL_CASCADE
+        if not settings.GEMINI_ROUTER_ENABLED or ceiling not in cascade:
+            return [ceiling]
+
+        tiers = cascade[:cascade.index(ceiling) + 1]
+        target = self.latency_target(operation)
+        on_target, slow, unhealthy = [], [], []
+        for model in tiers:
+            stats = self.stats(model)
+            p50 = stats.percentile(0.5) if len(stats.samples) >= MIN_SAMPLES else None
+            if not stats.is_healthy():
+                unhealthy.append(model)
+            elif p50 is None or p50 <= target:
+                on_target.append(model)
+            else:
+                slow.append((p50, model))
+        return on_target + [model for _, model in sorted(slow)] + unhealthy
+
+    def timeout(self, model: str) -> float:
+        """Per-attempt timeout from the model's observed p95 latency"""
+        stats = self.stats(model)
+        p95 = stats.percentile(0.95) if len(stats.samples) >= MIN_SAMPLES else None
+        if p95 is None:
+            return settings.GEMINI_ROUTER_MAX_TIMEOUT
+        return min(
+            settings.GEMINI_ROUTER_MAX_TIMEOUT,
+            max(settings.GEMINI_ROUTER_MIN_TIMEOUT, p95 * settings.GEMINI_ROUTER_TIMEOUT_FACTOR)
+        )
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call (None until enough samples exist)"""
+        stats = self.stats(model)
+        if len(stats.samples) < MIN_SAMPLES:
+            return None
+        latency = stats.percentile(settings.GEMINI_HEDGE_PERCENTILE)
+        if latency is None:
+            return None
+        return max(settings.GEMINI_HEDGE_MIN_DELAY, latency)
+
+    def fastest(self, models: List[str]) -> str:
+        """Healthy model with the lowest observed p50 (first model without data)"""
+        measured = [
+            (self.stats(model).percentile(0.5), index, model)
+            for index, model in enumerate(models)
+            if len(self.stats(model).samples) >= MIN_SAMPLES and self.stats(model).is_healthy()
+        ]
+        measured = [entry for entry in measured if entry[0] is not None]
+        return min(measured)[2] if measured else models[0]
+
+    def record(self, model: str, latency: float, ok: bool):
+        self.stats(model).record(latency, ok)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current per-model stats"""
+        return {
+            model: {
+                "samples": len(stats.samples),
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+                "error_rate": round(stats.error_rate, 3),
+                "healthy": stats.is_healthy(),
+            }
+            for model, stats in self._stats.items()
+        }
+
+
+# Process-wide router shared by all AIService instances
+model_router = ModelRouter()
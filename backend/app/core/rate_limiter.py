@@ -0,0 +1,154 @@
+"""
+Quota-aware scheduler for Gemini calls
+Token buckets for requests (RPM) and tokens (TPM) per API key and model,
+with a priority queue so interactive calls go ahead of batch generation
+"""
+
+from app.core.config import settings
+from typing import Dict, List, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call waited longer than GEMINI_QUEUE_TIMEOUT for quota"""
+
+
+class TokenBucket:
+    """Continuously refilling token bucket"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        """Take tokens; a negative amount refunds them"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - min(amount, self.capacity))
+
+
+class _Lane:
+    """Quota state and wait queue for one (API key, model) pair"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.blocked_until = 0.0
+        self.waiters: List[Tuple[int, int]] = []
+        self.condition = asyncio.Condition()
+
+    def wait_time(self, tokens: int) -> float:
+        return max(
+            self.blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+
+
+class QuotaScheduler:
+    """Shared scheduler that queues Gemini calls until quota is available"""
+
+    def __init__(self):
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+        self._sequence = itertools.count()
+
+    def _lane(self, api_key: str, model: str) -> _Lane:
+        key = (api_key, model)
+        lane = self._lanes.get(key)
+        if lane is None:
+            limits = settings.GEMINI_MODEL_RATE_LIMITS.get(model, {})
+            lane = _Lane(
+                rpm=limits.get("rpm", settings.GEMINI_RPM_LIMIT),
+                tpm=limits.get("tpm", settings.GEMINI_TPM_LIMIT),
+            )
+            self._lanes[key] = lane
+        return lane
+
+    async def acquire(self, api_key: str, model: str, tokens: int, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Wait until one request and `tokens` tokens are available for the key and model
+        Waiters are served in priority order, then in arrival order
+        """
+        lane = self._lane(api_key, model)
+        entry = (priority, next(self._sequence))
+        deadline = time.monotonic() + settings.GEMINI_QUEUE_TIMEOUT
+
+        async with lane.condition:
+            heapq.heappush(lane.waiters, entry)
+            try:
+                while True:
+                    delay = None
+                    if lane.waiters[0] == entry:
+                        delay = lane.wait_time(tokens)
+                        if delay <= 0:
+                            heapq.heappop(lane.waiters)
+                            lane.requests.consume(1)
+                            lane.tokens.consume(tokens)
+                            lane.condition.notify_all()
+                            return
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RateLimitTimeout(f"Timed out waiting for {model} quota")
+                    try:
+                        await asyncio.wait_for(
+                            lane.condition.wait(),
+                            timeout=min(delay, remaining) if delay is not None else remaining
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in lane.waiters:
+                    lane.waiters.remove(entry)
+                    heapq.heapify(lane.waiters)
+                    lane.condition.notify_all()
+                raise
+
+    def record_usage(self, api_key: str, model: str, reserved_tokens: int, actual_tokens: int):
+        """Reconcile the token reservation with the tokens the call actually used"""
+        self._lane(api_key, model).tokens.consume(actual_tokens - reserved_tokens)
+
+    def backoff(self, api_key: str, model: str, seconds: float):
+        """Pause a lane after the API reported quota exhaustion (HTTP 429)"""
+        lane = self._lane(api_key, model)
+        lane.blocked_until = max(lane.blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Gemini quota exhausted for {model}; pausing lane for {seconds:.1f}s")
+
+
+def estimate_tokens(contents) -> int:
+    """Rough token estimate (~4 characters per token) used to reserve TPM quota"""
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents)
+    # Inline files (PDF/DOCX parts) are billed per page; reserve a flat amount
+    return 1000
+
+
+# Process-wide scheduler shared by all AIService instances
+quota_scheduler = QuotaScheduler()
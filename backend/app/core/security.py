@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 import os
 
 from app.core.config import settings
+from app.core.llm_metrics import set_llm_user
 
 # HTTP Bearer token security
 security = HTTPBearer()
@@ -39,13 +40,16 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(securi
         )
 
 
-def get_current_user_id(token_payload: dict = Security(verify_jwt_token)) -> str:
+async def get_current_user_id(token_payload: dict = Security(verify_jwt_token)) -> str:
     """
     Extract user ID from verified JWT token
+    Async so the LLM usage attribution it sets is visible to the endpoint
+    (sync dependencies run in a threadpool with a copied context)
     """
     user_id = token_payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
+    set_llm_user(user_id)
     return user_id
 
 
@@ -1,8 +1,11 @@
 """
 Supabase database client singleton
+Uses the async client, so PostgREST round-trips never block the event loop;
+all services share one instance and with it one HTTP/2 connection pool, over
+which concurrent queries are multiplexed
 """
 
-from supabase import create_client, Client
+from supabase import AsyncClient, AsyncClientOptions
 from app.core.config import settings
 import logging
 
@@ -10,33 +13,53 @@ logger = logging.getLogger(__name__)
 
 
 class SupabaseClient:
-    """Singleton Supabase client"""
+    """Singleton async Supabase client"""
     
-    _instance: Client = None
+    _instance: AsyncClient = None
     
     @classmethod
-    def get_client(cls) -> Client:
+    def get_client(cls) -> AsyncClient:
         """Get or create Supabase client instance"""
         if cls._instance is None:
             try:
-                cls._instance = create_client(
+                # The service role key needs no session lookup, so the client
+                # can be built synchronously; its HTTP/2 sessions open lazily
+                # on the running event loop
+                cls._instance = AsyncClient(
                     settings.SUPABASE_URL,
-                    settings.SUPABASE_SERVICE_ROLE_KEY
+                    settings.SUPABASE_SERVICE_ROLE_KEY,
+                    AsyncClientOptions(
+                        postgrest_client_timeout=settings.SUPABASE_POSTGREST_TIMEOUT,
+                        storage_client_timeout=settings.SUPABASE_STORAGE_TIMEOUT
+                    )
                 )
                 logger.info("✅ Supabase client initialized")
             except Exception as e:
                 logger.error(f"❌ Failed to initialize Supabase client: {e}")
                 raise
         return cls._instance
+    
+    @classmethod
+    async def close(cls):
+        """Close the client's connection pools (on shutdown)"""
+        if cls._instance is None:
+            return
+        client, cls._instance = cls._instance, None
+        try:
+            await client.postgrest.aclose()
+            await client.storage.session.aclose()
+            logger.info("Supabase connections closed")
+        except Exception as e:
+            logger.warning(f"Failed to close Supabase connections: {e}")
 
 
 # Convenience function for getting the client
-def get_supabase_client() -> Client:
+def get_supabase_client() -> AsyncClient:
     """Get Supabase client instance"""
     return SupabaseClient.get_client()
 
 
 # Convenience function
-def get_supabase() -> Client:
+def get_supabase() -> AsyncClient:
     """Get Supabase client"""
     return SupabaseClient.get_client()
@@ -18,6 +18,7 @@ PURPOSE_OPTIONS = [
 # Common tech job roles
 COMMON_TECH_ROLES = [
     "Software Engineer",
+    "Software Developer",
     "Frontend Developer",
     "Backend Developer",
     "Full Stack Developer",
@@ -26,6 +27,7 @@ COMMON_TECH_ROLES = [
     "Machine Learning Engineer",
     "Product Manager",
     "UI/UX Designer",
+    "Product Designer",
     "QA Engineer",
     "Mobile Developer",
     "Cloud Architect",
@@ -108,3 +110,47 @@ COMMON_LOCATIONS = [
     "North America",
     "Asia Pacific"
 ]
+
+# Alternate spellings and abbreviations of the tags above, mapped to the tag
+# by the tag matcher (matching is case-insensitive unless noted there)
+TAG_ALIASES = {
+    # Roles
+    "Software Developer": ["Software Development Engineer"],
+    "Frontend Developer": ["Front-end Developer", "Front End Developer", "Frontend Engineer", "Front-end Engineer"],
+    "Backend Developer": ["Back-end Developer", "Back End Developer", "Backend Engineer", "Back-end Engineer"],
+    "Full Stack Developer": ["Full-stack Developer", "Fullstack Developer", "Full Stack Engineer", "Full-stack Engineer"],
+    "Machine Learning Engineer": ["ML Engineer", "AI Engineer"],
+    "UI/UX Designer": ["UX Designer", "UI Designer"],
+    "QA Engineer": ["Quality Assurance Engineer", "Test Engineer", "SDET"],
+    "Mobile Developer": ["iOS Developer", "Android Developer", "Mobile Engineer"],
+    "Site Reliability Engineer": ["SRE"],
+    "Security Engineer": ["Application Security Engineer", "Cybersecurity Engineer"],
+    # Industries
+    "FinTech": ["Financial Technology", "Fin-Tech"],
+    "E-commerce": ["Ecommerce", "E commerce", "Online Retail"],
+    "Healthcare Tech": ["HealthTech", "Health Tech", "Digital Health"],
+    "EdTech": ["Education Technology", "Ed-Tech"],
+    "Cloud Computing": ["Cloud Infrastructure"],
+    "Artificial Intelligence": ["AI", "Generative AI", "GenAI"],
+    "Cybersecurity": ["Cyber Security", "Information Security", "InfoSec"],
+    "SaaS": ["Software as a Service", "B2B SaaS"],
+    "IoT": ["Internet of Things"],
+    "Data Analytics": ["Business Intelligence"],
+    # Keywords
+    "JavaScript": ["JS", "ECMAScript"],
+    "React": ["React.js", "ReactJS"],
+    "Node.js": ["NodeJS"],
+    "Go": ["Golang"],
+    "Kubernetes": ["K8s"],
+    "AWS": ["Amazon Web Services"],
+    "Azure": ["Microsoft Azure"],
+    "GCP": ["Google Cloud", "Google Cloud Platform"],
+    "PostgreSQL": ["Postgres"],
+    "MongoDB": ["Mongo"],
+    "Microservices": ["Microservice", "Micro-services"],
+    "REST API": ["REST APIs", "RESTful", "RESTful API"],
+    "CI/CD": ["Continuous Integration", "Continuous Delivery", "Continuous Deployment"],
+    "Agile": ["Scrum", "Kanban"],
+    "Machine Learning": ["ML"],
+    "Deep Learning": ["Neural Networks"],
+}
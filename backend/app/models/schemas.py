@@ -3,7 +3,7 @@ Pydantic models for API requests and responses
 """
 
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -29,10 +29,19 @@ class ParsedResumeData(BaseModel):
     achievements: List[str]
 
 
+class ContextSuggestionsResponse(BaseModel):
+    """AI-generated context suggestions"""
+    suggested_roles: List[str] = []
+    suggested_industries: List[str] = []
+    suggested_keywords: List[str] = []
+    suggested_geography: List[str] = []
+
+
 class ResumeParseResponse(BaseModel):
     """Response after resume parsing"""
     resume_id: str
     parsed_data: ParsedResumeData
+    context_suggestions: Optional[ContextSuggestionsResponse] = None  # None while still being generated
     is_upload_completed: bool = True
     is_parse_completed: bool = True
     message: str
@@ -65,18 +74,11 @@ class ContextResponse(BaseModel):
     geography: List[str]
     resume_extracted_text: Optional[str] = None
     resume_parsed_data: Optional[dict] = None
+    context_suggestions: Optional[ContextSuggestionsResponse] = None  # None while still being refined
     created_at: datetime
     updated_at: datetime
 
 
-class ContextSuggestionsResponse(BaseModel):
-    """AI-generated context suggestions"""
-    suggested_roles: List[str] = []
-    suggested_industries: List[str] = []
-    suggested_keywords: List[str] = []
-    suggested_geography: List[str] = []
-
-
 class PredefinedTagsResponse(BaseModel):
     """Predefined tags for context setup (no AI needed)"""
     purposes: List[str]
@@ -144,6 +146,34 @@ class EmailGenerateRequest(BaseModel):
     custom_prompt: Optional[str] = None
 
 
+class GeneratedEmail(BaseModel):
+    """Email draft returned by the AI (structured output schema)"""
+    subject: str = Field(..., min_length=1)
+    body: str = Field(..., min_length=1)
+
+
+class GeneratedEmailVariants(BaseModel):
+    """Several alternative drafts returned by the AI in one reply"""
+    variants: List[GeneratedEmail]
+
+
+class EmailEdit(BaseModel):
+    """One span edit of an email returned by the AI (structured output schema)"""
+    field: Literal["subject", "body"] = "body"
+    find: str = Field(..., min_length=1, description="Exact text to change, occurring once in the field")
+    replace: str = Field("", description="Replacement text; empty to delete")
+
+
+class EmailEdits(BaseModel):
+    """Span edits of an email returned by the AI; empty when nothing needs to change"""
+    edits: List[EmailEdit] = []
+
+
+class EmailVariantsGenerateRequest(EmailGenerateRequest):
+    """Request to generate several alternative AI emails for one company"""
+    variants: int = Field(3, ge=1)  # Capped at EMAIL_MAX_VARIANTS
+
+
 class EmailResponse(BaseModel):
     """AI Email response"""
     id: str
@@ -160,10 +190,82 @@ class EmailResponse(BaseModel):
     job_type: Optional[str]
     salary_range: Optional[str]
     status: str
+    duplicate_of: Optional[str] = None  # Earlier draft this one nearly duplicates
+    duplicate_similarity: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
 
+class EmailBulkGenerateRequest(BaseModel):
+    """Request to generate AI emails for many companies"""
+    companies: List[EmailGenerateRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)  # Defaults to EMAIL_BULK_CONCURRENCY
+
+
+class EmailBulkItemResult(BaseModel):
+    """Per-company outcome of a bulk generation"""
+    index: int
+    company_name: str
+    status: str  # generated, failed
+    email_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EmailBulkGenerateResponse(BaseModel):
+    """Bulk email generation response"""
+    emails: List[EmailResponse]
+    results: List[EmailBulkItemResult]
+    total: int
+    succeeded: int
+    failed: int
+
+
+class EmailBatchGenerateRequest(BaseModel):
+    """Request to generate AI emails for many companies as an offline batch job"""
+    companies: List[EmailGenerateRequest] = Field(..., min_length=1)
+
+
+class EmailBatchSubmitResponse(BaseModel):
+    """Submitted batch job; emails appear with status 'new' once it completes"""
+    id: str  # Poll GET /emails/generate/batch/{id} for progress
+    job_name: str
+    model: str
+    total: int
+    status: str
+
+
+class EmailBatchJobResponse(EmailBatchSubmitResponse):
+    """Batch job status, with per-company results once completed"""
+    succeeded: Optional[int] = None
+    failed: Optional[int] = None
+    results: Optional[List[dict]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class EmailClusterMember(BaseModel):
+    """Draft within a cluster of near-duplicates"""
+    id: str
+    company_name: Optional[str]
+    subject: str
+    status: str
+
+
+class EmailCluster(BaseModel):
+    """Group of near-duplicate drafts"""
+    emails: List[EmailClusterMember]
+    min_similarity: float  # Weakest link holding the cluster together
+
+
+class EmailClustersResponse(BaseModel):
+    """Near-duplicate clusters of a user's drafts"""
+    clusters: List[EmailCluster]
+    total_emails: int
+    clustered_emails: int
+    threshold: float
+
+
 class EmailUpdateStatusRequest(BaseModel):
     """Request to update email status"""
     status: str
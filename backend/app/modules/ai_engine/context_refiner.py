@@ -7,6 +7,7 @@ from typing import Dict, Any, List
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
+from app.modules.ai_engine.structured_output import extract_json
 
 logger = logging.getLogger(__name__)
 
@@ -69,15 +70,7 @@ class ContextRefiner:
                 "exp_level": context.get("experience_level", "Not specified")
             })
             
-            content = response.content
-            
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            import json
-            return json.loads(content)
+            return extract_json(response.content)
             
         except Exception as e:
             logger.error(f"Error suggesting improvements: {e}", exc_info=True)
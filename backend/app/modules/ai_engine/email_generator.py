@@ -7,6 +7,8 @@ from typing import Dict, Any, Optional
 import logging
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
+from app.models.schemas import GeneratedEmail
+from app.modules.ai_engine.structured_output import parse_model
 
 logger = logging.getLogger(__name__)
 
@@ -92,20 +94,12 @@ class EmailGenerator:
                 "company_summary": company_summary
             })
             
-            content = response.content
-            
-            # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            import json
-            result = json.loads(content)
+            # Tolerant parse; raises if subject or body is missing
+            result = parse_model(response.content, GeneratedEmail)
             
             return {
-                "subject": result.get("subject", ""),
-                "body": result.get("body", "")
+                "subject": result.subject,
+                "body": result.body
             }
             
         except Exception as e:
@@ -166,19 +160,12 @@ class EmailGenerator:
                 "context_str": context_str
             })
             
-            content = response.content
-            
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            import json
-            result = json.loads(content)
+            # Tolerant parse; raises if subject or body is missing
+            result = parse_model(response.content, GeneratedEmail)
             
             return {
-                "subject": result.get("subject", ""),
-                "body": result.get("body", "")
+                "subject": result.subject,
+                "body": result.body
             }
             
         except Exception as e:
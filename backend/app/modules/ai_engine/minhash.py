@@ -0,0 +1,164 @@
+"""
+MinHash - cheap similarity fingerprints for near-duplicate text
+Word shingles are hashed into fixed-size MinHash signatures whose agreement
+estimates Jaccard similarity; an LSH index finds similar signatures without
+comparing against every stored one
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+import hashlib
+import random
+import re
+
+NUM_PERM = 64
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Word shingles of a text
+
+    Case, punctuation and whitespace are ignored, so texts differing only in
+    those produce the same set
+
+    Args:
+        text: Text to shingle
+        size: Words per shingle
+
+    Returns:
+        Set of shingles (the whole text as one shingle if it is shorter than size)
+    """
+    words = WORD_PATTERN.findall((text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[index:index + size]) for index in range(len(words) - size + 1)}
+
+
+def _hash_shingle(shingle: str) -> int:
+    """Stable 32-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed family of permutations"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        generator = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [
+            (generator.randint(1, MERSENNE_PRIME - 1), generator.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, text: str, size: int = 3) -> Tuple[int, ...]:
+        """
+        MinHash signature of a text
+
+        Args:
+            text: Text to fingerprint
+            size: Words per shingle
+
+        Returns:
+            Tuple of num_perm integers; equal positions estimate Jaccard similarity
+        """
+        hashes = [_hash_shingle(shingle) for shingle in shingles(text, size)]
+        if not hashes:
+            return (MAX_HASH,) * self.num_perm
+        return tuple(
+            min(((a * value + b) % MERSENNE_PRIME) & MAX_HASH for value in hashes)
+            for a, b in self._perms
+        )
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    if not first or len(first) != len(second):
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def band_keys(signature: Tuple[int, ...], bands: int) -> List[str]:
+    """
+    Stable string keys of a signature's LSH bands, for storing in a database
+    Two signatures share a key only if that whole band matches
+    """
+    rows = len(signature) // bands
+    return [
+        f"{band}:" + hashlib.blake2b(
+            repr(signature[band * rows:(band + 1) * rows]).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        for band in range(bands)
+    ]
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures
+
+    Signatures are split into bands; two signatures become candidates when any
+    band matches exactly. More rows per band raise the similarity needed to be
+    found (roughly (1 / bands) ** (1 / rows))
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[Tuple[int, ...], Set[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, ...]]:
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        """Index a signature under a key (replacing any previous one)"""
+        self.remove(key)
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def candidates(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        """Keys sharing at least one band with the signature"""
+        found: Set[Hashable] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            found |= self._buckets[band].get(band_key, set())
+        return found
+
+    def query(self, signature: Tuple[int, ...], threshold: float) -> List[Tuple[Hashable, float]]:
+        """
+        Indexed keys whose estimated similarity reaches threshold
+
+        Returns:
+            (key, similarity) pairs, most similar first
+        """
+        matches = []
+        for key in self.candidates(signature):
+            score = similarity(signature, self._signatures[key])
+            if score >= threshold:
+                matches.append((key, score))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def signature(self, key: Hashable) -> Optional[Tuple[int, ...]]:
+        return self._signatures.get(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def __len__(self) -> int:
+        return len(self._signatures)
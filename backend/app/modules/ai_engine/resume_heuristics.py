@@ -0,0 +1,145 @@
+"""
+Resume Heuristics - local extraction of resume fields without an LLM
+Contact details, profile links, years of experience and known skills/roles
+are found with compiled regexes and the tag matcher; only the name is settled
+locally, the rest is merged with or checked by the LLM
+"""
+
+from app.modules.ai_engine.tag_matcher import get_tag_matcher
+from typing import Any, Dict, Optional
+import re
+
+# Fields that need no LLM once found locally. Found links are only a subset;
+# vocabulary hits for skills and job titles can be everyday words and a stated
+# "N years of experience" may be a requirement rather than the candidate's own,
+# so those are passed to the LLM as hints to confirm or reject
+SETTLED_FIELDS = ("name",)
+
+# Lines near the top that are headings rather than the candidate's name
+HEADING_WORDS = {
+    "resume", "résumé", "curriculum", "vitae", "cv", "profile", "summary",
+    "contact", "experience", "education", "skills", "objective"
+}
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[a-zA-Z]{2,}")
+PHONE_PATTERN = re.compile(r"(?<![\w+])(\+?\d[\d\s().-]{7,}\d)(?!\w)")
+LINKEDIN_PATTERN = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/(?:in|pub)/[\w%-]+/?", re.IGNORECASE)
+GITHUB_PATTERN = re.compile(r"(?:https?://)?(?:www\.)?github\.com/[\w-]+/?", re.IGNORECASE)
+URL_PATTERN = re.compile(r"(?:https?://|www\.)[^\s<>()\"',;]+", re.IGNORECASE)
+EXPERIENCE_PATTERN = re.compile(
+    r"(\d{1,2})\+?\s*(?:years?|yrs?)\.?\s+(?:of\s+)?(?:professional\s+|industry\s+|work\s+|hands-on\s+)?experience",
+    re.IGNORECASE
+)
+NAME_WORD_PATTERN = re.compile(r"[A-Z][A-Za-z'’-]*\.?|[A-Z]\.")
+
+
+def _with_scheme(url: str) -> str:
+    url = url.rstrip("/.")
+    return url if url.lower().startswith(("http://", "https://")) else f"https://{url}"
+
+
+def _phone_digits(match: re.Match) -> Optional[str]:
+    digits = re.sub(r"[^\d+]", "", match.group(1))
+    # Date ranges like "2019 - 2023" also look like digit runs
+    if 10 <= len(digits.lstrip("+")) <= 15 and not re.fullmatch(r"(?:19|20)\d\d\s*[-–]\s*(?:19|20)\d\d", match.group(1).strip()):
+        return digits
+    return None
+
+
+def _is_contact_line(line: str) -> bool:
+    """Whether a line holds an email address, phone number or profile link"""
+    if EMAIL_PATTERN.search(line) or URL_PATTERN.search(line):
+        return True
+    if LINKEDIN_PATTERN.search(line) or GITHUB_PATTERN.search(line):
+        return True
+    return any(_phone_digits(match) for match in PHONE_PATTERN.finditer(line))
+
+
+def extract_links(text: str) -> Dict[str, str]:
+    """
+    Profile and contact links in resume text
+
+    Returns:
+        Dict keyed by platform ("Email", "Phone", "LinkedIn", "GitHub", "Website")
+    """
+    links: Dict[str, str] = {}
+
+    email = EMAIL_PATTERN.search(text)
+    if email:
+        links["Email"] = f"mailto:{email.group(0)}"
+
+    for match in PHONE_PATTERN.finditer(text):
+        digits = _phone_digits(match)
+        if digits:
+            links["Phone"] = f"tel:{digits}"
+            break
+
+    linkedin = LINKEDIN_PATTERN.search(text)
+    if linkedin:
+        links["LinkedIn"] = _with_scheme(linkedin.group(0))
+
+    github = GITHUB_PATTERN.search(text)
+    if github:
+        links["GitHub"] = _with_scheme(github.group(0))
+
+    for match in URL_PATTERN.finditer(text):
+        url = match.group(0)
+        if "linkedin.com" in url.lower() or "github.com" in url.lower():
+            continue
+        links["Website"] = _with_scheme(url)
+        break
+
+    return links
+
+
+def extract_name(text: str, max_lines: int = 5) -> Optional[str]:
+    """
+    Candidate name from the lines above the contact details
+    A line qualifies when it is two to four capitalized words and is neither a
+    heading nor a known role, skill or industry; without contact details near
+    the top the name is left to the LLM
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()][:max_lines]
+    contact = next((index for index, line in enumerate(lines) if _is_contact_line(line)), None)
+    if contact is None:
+        return None
+
+    for line in lines[:contact]:
+        words = line.split()
+        if not 2 <= len(words) <= 4:
+            continue
+        if any(word.lower().strip(".:") in HEADING_WORDS for word in words):
+            continue
+        if any(get_tag_matcher().tags(line).values()) or not all(NAME_WORD_PATTERN.fullmatch(word) for word in words):
+            continue
+        return line.title() if line.isupper() else line
+    return None
+
+
+def extract_experience_years(text: str) -> Optional[int]:
+    """Largest "N years of experience" stated in the text"""
+    years = [int(match.group(1)) for match in EXPERIENCE_PATTERN.finditer(text)]
+    return max(years) if years else None
+
+
+def extract_resume_fields(text: str) -> Dict[str, Any]:
+    """
+    Resume fields that can be found without an LLM
+
+    Args:
+        text: Extracted resume text
+
+    Returns:
+        ParsedResumeData fields that were found (missing ones are left out)
+    """
+    text = text or ""
+    tags = get_tag_matcher().tags(text)
+    fields: Dict[str, Any] = {
+        "name": extract_name(text),
+        "links": extract_links(text),
+        "experience_years": extract_experience_years(text),
+        "skills": tags["keywords"],
+        "job_titles": tags["roles"]
+    }
+    return {name: value for name, value in fields.items() if value}
+
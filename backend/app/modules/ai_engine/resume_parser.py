@@ -9,7 +9,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
-import json
+from app.modules.ai_engine.structured_output import extract_json, parse_model
 
 logger = logging.getLogger(__name__)
 
@@ -101,17 +101,8 @@ class ResumeParser:
                 "format_instructions": self.parser.get_format_instructions()
             })
             
-            # Parse the response
-            content = response.content
-            
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            # Parse with Pydantic
-            parsed = self.parser.parse(content)
+            # Tolerant parse; broken optional fields fall back to defaults
+            parsed = parse_model(response.content, ParsedResume)
             
             return parsed.dict()
             
@@ -138,15 +129,7 @@ class ResumeParser:
             chain = prompt | self.llm
             response = chain.invoke({"text": resume_text})
             
-            content = response.content
-            
-            # Extract JSON array
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            skills = json.loads(content)
+            skills = extract_json(response.content)
             return skills if isinstance(skills, list) else []
             
         except Exception as e:
@@ -0,0 +1,85 @@
+"""
+Span Edits - apply small find/replace edits returned by the LLM
+Instead of regenerating a whole email, the model lists the spans to change;
+they are located, checked and applied locally, and the applied list doubles
+as a diff of the change
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+
+class EditConflict(ValueError):
+    """Raised when an edit cannot be applied unambiguously"""
+
+
+def locate_edits(texts: Dict[str, str], edits: Iterable[dict]) -> List[dict]:
+    """
+    Resolve edits to positions in the original texts
+
+    Args:
+        texts: Original text per field
+        edits: {"field", "find", "replace"} dicts; find must occur exactly once
+
+    Returns:
+        {"field", "start", "end", "original", "replacement"} per edit, by field
+        and position
+
+    Raises:
+        EditConflict: If a field is unknown, a find text is missing or occurs
+            more than once, or two edits overlap
+    """
+    located = []
+    for edit in edits:
+        field = edit.get("field") or "body"
+        find = edit.get("find") or ""
+        if field not in texts:
+            raise EditConflict(f"Unknown field '{field}'")
+        if not find:
+            raise EditConflict("Edit has no text to find")
+
+        text = texts[field]
+        start = text.find(find)
+        if start < 0:
+            raise EditConflict(f"Text to edit not found in {field}: {find!r}")
+        if text.find(find, start + 1) >= 0:
+            raise EditConflict(f"Text to edit occurs more than once in {field}: {find!r}")
+
+        replacement = edit.get("replace") or ""
+        if replacement != find:
+            located.append({
+                "field": field,
+                "start": start,
+                "end": start + len(find),
+                "original": find,
+                "replacement": replacement
+            })
+
+    located.sort(key=lambda edit: (edit["field"], edit["start"]))
+    for previous, current in zip(located, located[1:]):
+        if previous["field"] == current["field"] and current["start"] < previous["end"]:
+            raise EditConflict(f"Edits overlap in {current['field']}: {previous['original']!r} and {current['original']!r}")
+    return located
+
+
+def apply_edits(texts: Dict[str, str], edits: Iterable[dict]) -> Tuple[Dict[str, str], List[dict]]:
+    """
+    Apply edits to the original texts
+
+    Args:
+        texts: Original text per field
+        edits: {"field", "find", "replace"} dicts
+
+    Returns:
+        Updated texts and the applied edits (see locate_edits), whose offsets
+        refer to the original texts
+
+    Raises:
+        EditConflict: If the edits cannot be applied unambiguously
+    """
+    located = locate_edits(texts, edits)
+    updated = dict(texts)
+    # Right to left, so earlier offsets stay valid
+    for edit in reversed(located):
+        text = updated[edit["field"]]
+        updated[edit["field"]] = text[:edit["start"]] + edit["replacement"] + text[edit["end"]:]
+    return updated, located
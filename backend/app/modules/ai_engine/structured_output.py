@@ -0,0 +1,301 @@
+"""
+Structured Output - schema-enforced JSON replies with tolerant parsing
+Derives Gemini response schemas from Pydantic models, salvages malformed or
+truncated JSON, and validates field by field so only broken fields need repair
+"""
+
+from typing import Any, Dict, List, Optional, Type, Union, get_args, get_origin
+from pydantic import BaseModel, ValidationError
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPES = {
+    "string": "STRING",
+    "integer": "INTEGER",
+    "number": "NUMBER",
+    "boolean": "BOOLEAN",
+}
+
+# Free-form dicts can't be expressed in Gemini schemas; they travel as pair lists
+PAIR_LIST_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"key": {"type": "STRING"}, "value": {"type": "STRING"}},
+        "required": ["key", "value"],
+    },
+}
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+MAX_SALVAGE_ATTEMPTS = 50
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a reply holds no usable JSON or required fields stay invalid"""
+
+
+def response_schema(model: Type[BaseModel]) -> dict:
+    """
+    Build a Gemini response schema from a Pydantic model
+
+    Args:
+        model: Pydantic model describing the expected reply
+
+    Returns:
+        Schema dict accepted by GenerateContentConfig.response_schema
+    """
+    schema = model.model_json_schema()
+    return _convert_schema(schema, schema.get("$defs", {}))
+
+
+def _convert_schema(node: dict, defs: dict) -> dict:
+    if "$ref" in node:
+        node = {**defs[node["$ref"].split("/")[-1]], **{k: v for k, v in node.items() if k != "$ref"}}
+
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        if len(options) == 1:
+            converted = _convert_schema(options[0], defs)
+        else:
+            converted = {"any_of": [_convert_schema(option, defs) for option in options]}
+        if len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+    else:
+        node_type = node.get("type")
+        if node_type == "object" and node.get("properties"):
+            properties = node["properties"]
+            converted = {
+                "type": "OBJECT",
+                "properties": {name: _convert_schema(prop, defs) for name, prop in properties.items()},
+                "property_ordering": list(properties),
+            }
+            if node.get("required"):
+                converted["required"] = list(node["required"])
+        elif node_type == "object":
+            converted = dict(PAIR_LIST_SCHEMA)
+        elif node_type == "array":
+            converted = {"type": "ARRAY", "items": _convert_schema(node.get("items", {"type": "string"}), defs)}
+        else:
+            converted = {"type": JSON_TYPES.get(node_type, "STRING")}
+            if "enum" in node:
+                converted["enum"] = [str(value) for value in node["enum"]]
+
+    if node.get("description"):
+        converted["description"] = node["description"]
+    return converted
+
+
+def extract_json(text: str) -> Any:
+    """
+    Pull a JSON value out of a model reply
+
+    Handles markdown fences, prose around the JSON, trailing commas and
+    replies cut off mid-object (keeping every complete field)
+
+    Args:
+        text: Raw reply text
+
+    Returns:
+        Parsed JSON value
+
+    Raises:
+        StructuredOutputError: If no JSON can be recovered
+    """
+    fenced = FENCE_PATTERN.search(text or "")
+    candidate = fenced.group(1) if fenced else (text or "")
+    starts = [index for index in (candidate.find("{"), candidate.find("[")) if index >= 0]
+    if not starts:
+        raise StructuredOutputError("Reply contains no JSON")
+    candidate = candidate[min(starts):].strip()
+
+    decoder = json.JSONDecoder()
+    for attempt in (candidate, TRAILING_COMMA_PATTERN.sub(r"\1", candidate)):
+        try:
+            return decoder.raw_decode(attempt)[0]
+        except json.JSONDecodeError:
+            continue
+
+    salvaged = _salvage_truncated(TRAILING_COMMA_PATTERN.sub(r"\1", candidate))
+    if salvaged is None:
+        raise StructuredOutputError("Reply JSON could not be recovered")
+    logger.info("Recovered truncated JSON reply")
+    return salvaged
+
+
+def _close_json(fragment: str) -> str:
+    """Close an open string and any open objects/arrays at the end of a fragment"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in fragment:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    closed = fragment + ('"' if in_string else "")
+    closed = closed.rstrip().rstrip(",")
+    if closed.endswith(":"):
+        closed += " null"
+    return closed + "".join(reversed(stack))
+
+
+def _salvage_truncated(candidate: str) -> Optional[Any]:
+    """Drop the trailing partial value one element at a time until the JSON closes"""
+    fragment = candidate
+    for _ in range(MAX_SALVAGE_ATTEMPTS):
+        try:
+            return json.loads(_close_json(fragment))
+        except json.JSONDecodeError:
+            cut = fragment.rfind(",")
+            if cut <= 0:
+                return None
+            fragment = fragment[:cut]
+    return None
+
+
+def _is_mapping(annotation: Any) -> bool:
+    """Whether a field annotation is a dict, possibly wrapped in Optional"""
+    if annotation is dict or get_origin(annotation) is dict:
+        return True
+    if get_origin(annotation) is Union:
+        return any(_is_mapping(arg) for arg in get_args(annotation))
+    return False
+
+
+def _fold_pairs(value: Any, mapping: bool = False) -> Any:
+    """
+    Turn a [{"key": ..., "value": ...}] list back into a dict
+    An empty list only becomes {} for dict fields, since it is also a valid list value
+    """
+    if not isinstance(value, list):
+        return value
+    if not value:
+        return {} if mapping else value
+    if all(isinstance(item, dict) and set(item) == {"key", "value"} for item in value):
+        return {item["key"]: item["value"] for item in value}
+    return value
+
+
+class StructuredResult:
+    """Reply validated field by field"""
+
+    def __init__(self, model: Type[BaseModel], data: Dict[str, Any], errors: Dict[str, str]):
+        self.model = model
+        self.data = data
+        self.errors = errors
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors
+
+    def required_errors(self) -> List[str]:
+        """Broken fields that have no default to fall back on"""
+        return [name for name in self.errors if self.model.model_fields[name].is_required()]
+
+    def build(self) -> BaseModel:
+        """
+        Build the model, using defaults for broken optional fields
+
+        Raises:
+            StructuredOutputError: If a required field is still broken
+        """
+        missing = self.required_errors()
+        if missing:
+            raise StructuredOutputError(
+                "Invalid fields: " + ", ".join(f"{name} ({self.errors[name]})" for name in missing)
+            )
+        return self.model(**self.data)
+
+
+def validate_fields(data: Any, model: Type[BaseModel]) -> StructuredResult:
+    """
+    Validate parsed JSON against a model, collecting errors per field
+
+    Args:
+        data: Parsed JSON value
+        model: Expected model
+
+    Returns:
+        StructuredResult with valid field values and per-field errors
+    """
+    if not isinstance(data, dict):
+        raise StructuredOutputError(f"Expected a JSON object, got {type(data).__name__}")
+
+    data = {
+        name: _fold_pairs(value, name in model.model_fields and _is_mapping(model.model_fields[name].annotation))
+        for name, value in data.items()
+    }
+    errors: Dict[str, str] = {}
+    try:
+        model.model_validate(data)
+    except ValidationError as e:
+        for error in e.errors():
+            name = error["loc"][0] if error["loc"] else None
+            if name in model.model_fields and name not in errors:
+                errors[name] = error["msg"]
+
+    valid = {
+        name: data[name]
+        for name in model.model_fields
+        if name in data and name not in errors
+    }
+    return StructuredResult(model, valid, errors)
+
+
+def parse_structured(text: str, model: Type[BaseModel]) -> StructuredResult:
+    """
+    Parse a reply into per-field results
+
+    Args:
+        text: Raw reply text
+        model: Expected model
+
+    Returns:
+        StructuredResult (check .errors for fields needing repair)
+
+    Raises:
+        StructuredOutputError: If the reply holds no usable JSON object
+    """
+    return validate_fields(extract_json(text), model)
+
+
+def parse_model(text: str, model: Type[BaseModel]) -> BaseModel:
+    """
+    Parse a reply straight into a model, defaulting broken optional fields
+
+    Raises:
+        StructuredOutputError: If required fields are missing or invalid
+    """
+    return parse_structured(text, model).build()
+
+
+def repair_prompt(result: StructuredResult) -> str:
+    """
+    Follow-up instruction asking only for the broken fields
+
+    Args:
+        result: Partially valid result
+
+    Returns:
+        Prompt text appended to the original request
+    """
+    problems = "\n".join(f"- {name}: {error}" for name, error in result.errors.items())
+    return (
+        "\n\nYour previous JSON reply had missing or invalid values for these fields:\n"
+        f"{problems}\n"
+        "Return a JSON object containing only these fields with corrected values."
+    )
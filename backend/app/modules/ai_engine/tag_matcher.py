@@ -0,0 +1,238 @@
+"""
+Tag Matcher - zero-LLM tagging of free text with the predefined tags
+An Aho-Corasick automaton over every tag and alias finds all of them in one
+linear pass over resumes, job descriptions or scraped pages; matches are
+normalized to their canonical tag and reported with character offsets
+"""
+
+from app.models.predefined_tags import (
+    COMMON_TECH_INDUSTRIES,
+    COMMON_TECH_KEYWORDS,
+    COMMON_TECH_ROLES,
+    TAG_ALIASES
+)
+from app.core.cache import LRUCache
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Tags and aliases that are also everyday words ("go", "rust", "agile");
+# these match only in this exact case
+CASE_SENSITIVE_TERMS = {
+    "Go", "Rust", "React", "Agile", "Mongo", "AI", "ML", "JS", "SRE"
+}
+
+# Characters that continue a term, so a match next to them is part of a longer word
+TERM_CHARACTERS = "_+#"
+
+# Characters that join words ("Go-to", "file.go"); a match they join to a
+# letter or digit is part of a longer word
+JOINING_CHARACTERS = ".-"
+
+# Extended matchers kept per base matcher, keyed by their extra vocabulary
+EXTENDED_MATCHER_CACHE_SIZE = 32
+
+
+@dataclass(frozen=True)
+class TagMatch:
+    """A tag found in text"""
+    tag: str  # Canonical tag
+    category: str  # "roles", "industries" or "keywords"
+    start: int
+    end: int
+    text: str  # As written in the text
+
+
+class AhoCorasick:
+    """Finds every occurrence of many patterns in one pass over the text"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        # Breadth-first, so every fail target is complete before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Occurrences of the patterns in text
+
+        Yields:
+            (start, end, pattern index) for every occurrence, overlapping ones included
+        """
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                yield position + 1 - len(self.patterns[index]), position + 1, index
+
+
+def _lowercase(text: str) -> str:
+    """Lowercased text with the same length, so offsets carry over to the original"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+def _continues_word(char: str) -> bool:
+    return char.isalnum() or char in TERM_CHARACTERS
+
+
+def _on_boundary(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] is a whole term ("Java" is not one inside "JavaScript")"""
+    if start > 0:
+        if _continues_word(text[start - 1]) or text[start - 1] == ".":
+            return False
+        if text[start - 1] == "-" and start > 1 and text[start - 2].isalnum():
+            return False
+    if end < len(text):
+        if _continues_word(text[end]):
+            return False
+        if text[end] in JOINING_CHARACTERS and end + 1 < len(text) and text[end + 1].isalnum():
+            return False
+    return True
+
+
+class TagMatcher:
+    """
+    Multi-pattern tagger normalizing aliases to canonical tags
+
+    Matching ignores case (except for CASE_SENSITIVE_TERMS) and only accepts
+    whole terms. Within a category the leftmost-longest match wins, so
+    "Machine Learning Engineer" is one role, but it still yields the keyword
+    "Machine Learning" since categories are resolved separately
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, Iterable[str]],
+        aliases: Optional[Dict[str, Iterable[str]]] = None
+    ):
+        """
+        Args:
+            vocabulary: Canonical tags per category
+            aliases: Alternate spellings per canonical tag
+        """
+        self.vocabulary = {category: list(tags) for category, tags in vocabulary.items()}
+        self.aliases = {tag: list(terms) for tag, terms in (aliases or {}).items()}
+
+        patterns: List[str] = []
+        self._entries: List[Tuple[str, str, Optional[str]]] = []
+        seen = set()
+        for category, tags in self.vocabulary.items():
+            for tag in tags:
+                for term in [tag, *self.aliases.get(tag, [])]:
+                    key = (category, term.lower())
+                    if not term.strip() or key in seen:
+                        continue
+                    seen.add(key)
+                    patterns.append(term.lower())
+                    self._entries.append((category, tag, term if term in CASE_SENSITIVE_TERMS else None))
+        self._automaton = AhoCorasick(patterns)
+        self._extended = LRUCache(maxsize=EXTENDED_MATCHER_CACHE_SIZE)
+
+    def with_vocabulary(self, vocabulary: Dict[str, Iterable[str]]) -> "TagMatcher":
+        """
+        New matcher that also knows extra tags (e.g. a user's own keywords)
+        Built once per distinct vocabulary and reused for later calls
+
+        Args:
+            vocabulary: Extra canonical tags per category
+        """
+        key = frozenset((category, frozenset(tags)) for category, tags in vocabulary.items())
+        matcher = self._extended.get(key)
+        if matcher is not None:
+            return matcher
+
+        merged = {category: list(tags) for category, tags in self.vocabulary.items()}
+        for category, tags in vocabulary.items():
+            known = {tag.lower() for tag in merged.setdefault(category, [])}
+            merged[category].extend(tag for tag in tags if tag and tag.lower() not in known)
+        matcher = TagMatcher(merged, self.aliases)
+        self._extended.set(key, matcher)
+        return matcher
+
+    def find(self, text: str) -> List[TagMatch]:
+        """
+        Tags in text, in order of appearance
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Non-overlapping matches per category, with offsets into text
+        """
+        text = text or ""
+        by_category: Dict[str, List[Tuple[int, int, str]]] = {}
+        for start, end, index in self._automaton.iter(_lowercase(text)):
+            category, tag, exact = self._entries[index]
+            if exact is not None and text[start:end] != exact:
+                continue
+            if _on_boundary(text, start, end):
+                by_category.setdefault(category, []).append((start, end, tag))
+
+        matches = []
+        for category, found in by_category.items():
+            last_end = 0
+            for start, end, tag in sorted(found, key=lambda item: (item[0], item[0] - item[1])):
+                if start >= last_end:
+                    matches.append(TagMatch(tag, category, start, end, text[start:end]))
+                    last_end = end
+        return sorted(matches, key=lambda match: (match.start, match.category))
+
+    def tags(self, text: str) -> Dict[str, List[str]]:
+        """
+        Canonical tags found in text per category, in order of first appearance
+        Every category of the vocabulary is present, possibly empty
+        """
+        found: Dict[str, List[str]] = {category: [] for category in self.vocabulary}
+        for match in self.find(text):
+            if match.tag not in found[match.category]:
+                found[match.category].append(match.tag)
+        return found
+
+
+_tag_matcher: Optional[TagMatcher] = None
+
+
+def get_tag_matcher() -> TagMatcher:
+    """
+    Process-wide matcher over the predefined roles, industries and keywords
+    Built on first use (warmed at startup) and shared by all callers
+    """
+    global _tag_matcher
+    if _tag_matcher is None:
+        _tag_matcher = TagMatcher(
+            {
+                "roles": COMMON_TECH_ROLES,
+                "industries": COMMON_TECH_INDUSTRIES,
+                "keywords": COMMON_TECH_KEYWORDS
+            },
+            TAG_ALIASES
+        )
+    return _tag_matcher
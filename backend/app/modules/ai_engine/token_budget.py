@@ -0,0 +1,276 @@
+"""
+Token Budget - prompt size control before LLM calls
+Counts tokens, strips resume boilerplate and trims text to a per-endpoint budget;
+tokens saved are reported to the LLM metrics
+"""
+
+from app.core.llm_metrics import llm_metrics
+from typing import List, Optional
+from collections import Counter
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_failed = False
+
+# Lines that carry no information for the model
+PAGE_NUMBER_PATTERN = re.compile(r"^\s*(page\s*)?\d+\s*(of|/)\s*\d+\s*$|^\s*page\s+\d+\s*$", re.IGNORECASE)
+BOILERPLATE_PATTERN = re.compile(
+    r"^\s*(curriculum vitae|resume|r[ée]sum[ée]|references (are )?available (up)?on request\.?)\s*$",
+    re.IGNORECASE
+)
+TRUNCATION_MARKER = "\n[...]\n"
+
+# Page separator in extracted resume text (see ResumeService._extract_pdf_text)
+PAGE_BREAK = "\f"
+# Running headers/footers: short lines among the first/last few lines of a page
+RUNNING_LINE_MAX_LENGTH = 80
+RUNNING_LINE_EDGE = 3
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; fall back to estimates if it is unavailable"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"tiktoken unavailable, using character-based token estimates: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text
+
+    Uses tiktoken's cl100k_base as a close proxy for Gemini's tokenizer,
+    or ~4 characters per token when the encoding cannot be loaded
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Token count
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapse duplicate whitespace while keeping paragraph breaks
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Text with single spaces and at most one blank line between paragraphs
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[ \t\f\v ]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.split()).lower()
+
+
+def _split_pages(text: str) -> List[List[str]]:
+    """
+    Lines of text per page
+    A page ends at a form feed or at a page-number line (which is dropped)
+    """
+    pages: List[List[str]] = [[]]
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        for index, part in enumerate(line.split(PAGE_BREAK)):
+            if index and pages[-1]:
+                pages.append([])
+            if PAGE_NUMBER_PATTERN.match(part):
+                if pages[-1]:
+                    pages.append([])
+                continue
+            pages[-1].append(part)
+    return [page for page in pages if any(line.strip() for line in page)]
+
+
+def _page_edges(page: List[str]) -> set:
+    """Keys of the short lines at the top and bottom of a page"""
+    lines = [
+        _line_key(line) for line in page
+        if line.strip() and not BOILERPLATE_PATTERN.match(line)
+    ]
+    edges = lines[:RUNNING_LINE_EDGE] + lines[-RUNNING_LINE_EDGE:]
+    return {key for key in edges if len(key) <= RUNNING_LINE_MAX_LENGTH}
+
+
+def clean_resume_text(text: str) -> str:
+    """
+    Remove resume boilerplate before it reaches a prompt
+
+    Drops page numbers, "Curriculum Vitae"/"References available on request"
+    lines and running headers/footers: short lines found at the top or bottom
+    of at least two pages are kept only where they first appear. Repeated
+    lines in the body of a page (a second job title, a repeated bullet) are
+    content and always kept. Whitespace is normalized
+
+    Args:
+        text: Extracted resume text
+
+    Returns:
+        Cleaned text
+    """
+    pages = _split_pages(text)
+    edges = [_page_edges(page) for page in pages]
+    page_counts = Counter(key for page_edges in edges for key in page_edges)
+    running = {key for key, count in page_counts.items() if count > 1}
+
+    seen = set()
+    kept: List[str] = []
+    for page, page_edges in zip(pages, edges):
+        for line in page:
+            key = _line_key(line)
+            if key and BOILERPLATE_PATTERN.match(line):
+                continue
+            if key in running and key in page_edges:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        kept.append("")
+
+    return normalize_whitespace("\n".join(kept))
+
+
+def _cut_to_tokens(text: str, max_tokens: int, from_end: bool = False) -> str:
+    """Beginning (or end) of a single line within max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    while max_tokens > 0:
+        if encoding is None:
+            chars = (max_tokens - 1) * 4  # count_tokens estimates len // 4 + 1
+            cut = text[-chars:] if from_end else text[:chars]
+        else:
+            tokens = encoding.encode(text, disallowed_special=())
+            cut = encoding.decode(tokens[-max_tokens:] if from_end else tokens[:max_tokens])
+        # Decoding can merge tokens differently at the cut; shrink until it fits
+        excess = count_tokens(cut) - max_tokens
+        if excess <= 0:
+            return cut
+        max_tokens -= excess
+    return ""
+
+
+def truncate_to_budget(text: str, max_tokens: int, head_ratio: float = 0.7) -> str:
+    """
+    Trim text to a token budget, on line boundaries where possible
+
+    Keeps the beginning (contact details, summary, recent roles) and the end
+    (skills and education usually close a resume), dropping the middle. A line
+    too long to keep whole (e.g. text extracted without line breaks) is cut
+    mid-line, so the result still fills the budget
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+        head_ratio: Share of the budget kept from the beginning
+
+    Returns:
+        Text within the budget
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.split("\n")
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER)
+    head_budget = int(budget * head_ratio)
+
+    head: List[str] = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line + "\n")
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+    head_used = used
+
+    tail: List[str] = []
+    for line in reversed(lines[len(head):]):
+        cost = count_tokens(line + "\n")
+        if used + cost > budget:
+            break
+        tail.insert(0, line)
+        used += cost
+
+    # Fill what is left with the start of the first dropped line (up to the
+    # head's share) and the end of the last one; these are different parts
+    # even when they are the same line, since it did not fit whole
+    dropped = lines[len(head):len(lines) - len(tail)]
+    if dropped:
+        remaining = budget - used
+        prefix = _cut_to_tokens(dropped[0], min(remaining, head_budget - head_used) - 1)
+        if prefix:
+            head.append(prefix)
+            remaining -= count_tokens(prefix + "\n")
+        suffix = _cut_to_tokens(dropped[-1], remaining - 1, from_end=True)
+        if suffix:
+            tail.insert(0, suffix)
+
+    return "\n".join(head) + TRUNCATION_MARKER + "\n".join(tail)
+
+
+class BudgetResult:
+    """Text fitted to a budget, with token accounting"""
+
+    def __init__(self, text: str, original_tokens: int, final_tokens: int):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.final_tokens = final_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.final_tokens
+
+
+def apply_budget(
+    text: str,
+    max_tokens: int,
+    resume: bool = False,
+    label: Optional[str] = None
+) -> BudgetResult:
+    """
+    Clean text and fit it to a token budget
+
+    Args:
+        text: Text going into a prompt
+        max_tokens: Token budget for this text
+        resume: Also strip resume boilerplate (headers, page numbers)
+        label: Name of the text, used when logging and recording the savings
+
+    Returns:
+        BudgetResult with the fitted text and tokens saved
+    """
+    original_tokens = count_tokens(text)
+    cleaned = clean_resume_text(text) if resume else normalize_whitespace(text)
+    fitted = truncate_to_budget(cleaned, max_tokens)
+    result = BudgetResult(fitted, original_tokens, count_tokens(fitted))
+    llm_metrics.record_budget(label or "text", result.original_tokens, result.final_tokens)
+
+    if result.saved_tokens > 0:
+        logger.info(
+            f"Token budget{f' ({label})' if label else ''}: "
+            f"{result.original_tokens} -> {result.final_tokens} tokens "
+            f"(saved {result.saved_tokens})"
+        )
+    return result
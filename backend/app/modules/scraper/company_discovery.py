@@ -3,6 +3,7 @@ Company Discovery - Find companies matching user criteria
 Uses search engines and directories
 """
 
+from app.modules.ai_engine.tag_matcher import get_tag_matcher
 from typing import Dict, Any, List, Optional
 import logging
 
@@ -46,7 +47,7 @@ class CompanyDiscovery:
             industry: Industry filter
             location: Location filter
             max_results: Maximum results to return
-            
+        
         Returns:
             List of discovered companies
         """
@@ -68,7 +69,7 @@ class CompanyDiscovery:
         Args:
             domain_keywords: Domain/industry keywords
             target_roles: Target job roles
-            
+        
         Returns:
             List of relevant companies
         """
@@ -92,13 +93,36 @@ class CompanyDiscovery:
             min_size: Minimum company size
             max_size: Maximum company size
             industries: Industry filters
-            
+        
         Returns:
             Filtered list of companies
         """
         filtered = companies
         
-        # Apply filters
+        # Industries are matched on canonical tags, so "Ecommerce" in a company
+        # description matches a filter of "E-commerce"
+        if industries:
+            matcher = get_tag_matcher().with_vocabulary({"industries": industries})
+            wanted = set(matcher.tags(", ".join(industries))["industries"])
+            filtered = [
+                company for company in filtered
+                if wanted & set(matcher.tags(self._company_text(company))["industries"])
+            ]
+        
+        # Size filters
         # Phase 2 implementation
         
         return filtered
+    
+    @staticmethod
+    def _company_text(company: Dict[str, Any]) -> str:
+        """Text describing a company, for tagging"""
+        fields = ("name", "industry", "description", "keywords")
+        parts = []
+        for field in fields:
+            value = company.get(field)
+            if isinstance(value, list):
+                parts.extend(str(item) for item in value)
+            elif value:
+                parts.append(str(value))
+        return "\n".join(parts)
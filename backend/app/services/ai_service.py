@@ -3,85 +3,625 @@ AI Service - handles all AI/LLM operations
 Uses Google Gemini via google-genai SDK
 """
 
-from google import genai
 from google.genai import types
+from google.genai import errors
+from app.core.circuit_breaker import CircuitOpenError, circuit_breakers
 from app.core.config import settings
-from app.models.schemas import ParsedResumeData
+from app.core.context_cache import context_cache
+from app.core.gemini_client import get_api_key
+from app.core.llm_backend import get_llm_backend
+from app.core.hedging import hedge_budget
+from app.core.llm_metrics import OUTCOME_OK, LLMCall, classify_outcome, current_operation, llm_metrics, llm_operation
+from app.core.model_router import model_router
+from app.core.rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RateLimitTimeout,
+    estimate_tokens,
+    quota_scheduler
+)
+from app.models.schemas import (
+    ParsedResumeData,
+    ContextSuggestionsResponse,
+    GeneratedEmail,
+    GeneratedEmailVariants
+)
+from app.modules.ai_engine.structured_output import (
+    StructuredResult,
+    extract_json,
+    parse_structured,
+    repair_prompt,
+    response_schema
+)
+from app.modules.ai_engine.resume_heuristics import SETTLED_FIELDS, extract_resume_fields
+from app.modules.ai_engine.tag_matcher import get_tag_matcher
+from app.modules.ai_engine.token_budget import apply_budget
+from app.services.parse_cache_service import ParseCacheService
+from pydantic import BaseModel, create_model
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple, Type
+import asyncio
 import logging
 import json
+import time
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the resume parsing prompt changes to invalidate cached parses
+RESUME_PARSE_PROMPT_VERSION = "5"
+
+# Example JSON and rule per resume field, so the prompt names only the requested fields
+RESUME_FIELD_PROMPTS = {
+    "name": ('"name": "Candidate Name"', "- Extract the candidate's full name"),
+    "links": (
+        '"links": {"LinkedIn": "url", "GitHub": "url", "Portfolio": "url"}',
+        "- Extract all profile links as key-value pairs where key is the platform name "
+        "(LinkedIn, GitHub, Portfolio, Website, etc.) and value is the URL"
+    ),
+    "skills": ('"skills": ["skill1", "skill2", ...]', "- Extract all technical and soft skills mentioned"),
+    "experience_years": ('"experience_years": <number or null>', "- Calculate total years of experience if possible"),
+    "education": ('"education": ["degree1", "degree2", ...]', "- List all degrees and certifications"),
+    "job_titles": ('"job_titles": ["title1", "title2", ...]', "- List all job titles held"),
+    "achievements": ('"achievements": ["achievement1", "achievement2", ...]', "- Extract key achievements and accomplishments")
+}
+
+# Example JSON and rule per context suggestion, appended when parsing and suggesting in one call
+CONTEXT_SUGGESTION_PROMPTS = {
+    "suggested_roles": (
+        '"suggested_roles": ["role1", "role2", ...]',
+        "- suggested_roles: 5-7 relevant job titles the person should target (be specific, considering their background)"
+    ),
+    "suggested_industries": (
+        '"suggested_industries": ["industry1", "industry2", ...]',
+        "- suggested_industries: 4-6 industries that match their profile"
+    ),
+    "suggested_keywords": (
+        '"suggested_keywords": ["keyword1", "keyword2", ...]',
+        "- suggested_keywords: 8-12 important keywords for their job search (skills, technologies, methodologies)"
+    ),
+    "suggested_geography": (
+        '"suggested_geography": ["location1", "location2", ...]',
+        "- suggested_geography: 3-5 locations/regions that typically have opportunities in their field (can include \"Remote\")"
+    )
+}
+
 
 class AIService:
     """Service for AI operations"""
     
     def __init__(self):
-        pass
+        self.backend = get_llm_backend()
+        self._parse_cache = None
+    
+    @property
+    def parse_cache(self) -> ParseCacheService:
+        """Resume parse cache, created on first use"""
+        if self._parse_cache is None:
+            self._parse_cache = ParseCacheService()
+        return self._parse_cache
+    
+    async def _generate(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: types.GenerateContentConfig = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> types.GenerateContentResponse:
+        """
+        Run a generation on the LLM backend with the key of a slot
+        Waits for RPM/TPM quota in the shared scheduler and retries on HTTP 429
+        instead of failing, so bursts are queued rather than dropped
+        timeout bounds each API call (not the time spent waiting for quota)
+        Fails fast with CircuitOpenError while the model's or key's circuit is open
+        Every call is recorded in llm_metrics (tokens, latency, retries, outcome)
+        """
+        api_key = get_api_key(slot)
+        reserved_tokens = estimate_tokens(contents) + settings.GEMINI_OUTPUT_TOKEN_RESERVE
+        started = time.monotonic()
+        retries = 0
+        outcome = OUTCOME_OK
+        response = None
+        
+        try:
+            for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+                circuit_breakers.check(api_key, model)
+                try:
+                    await quota_scheduler.acquire(api_key, model, reserved_tokens, priority)
+                    response = await asyncio.wait_for(
+                        self.backend.generate(slot, model, contents, config),
+                        timeout=timeout
+                    )
+                except errors.ClientError as e:
+                    if e.code == 429 and attempt < settings.GEMINI_MAX_RETRIES:
+                        circuit_breakers.release(api_key, model)
+                        delay = settings.GEMINI_RETRY_BASE_DELAY * (2 ** attempt)
+                        quota_scheduler.backoff(api_key, model, delay)
+                        retries += 1
+                        continue
+                    circuit_breakers.record_failure(api_key, model, e)
+                    raise
+                except RateLimitTimeout:
+                    # Local queueing, not a fault of the model or key
+                    circuit_breakers.release(api_key, model)
+                    raise
+                except Exception as e:
+                    circuit_breakers.record_failure(api_key, model, e)
+                    raise
+                except BaseException:
+                    circuit_breakers.release(api_key, model)
+                    raise
+                
+                circuit_breakers.record_success(api_key, model)
+                usage = response.usage_metadata
+                if usage and usage.total_token_count:
+                    quota_scheduler.record_usage(api_key, model, reserved_tokens, usage.total_token_count)
+                return response
+        except BaseException as e:
+            outcome = classify_outcome(e)
+            raise
+        finally:
+            llm_metrics.record(LLMCall.from_usage(
+                response.usage_metadata if response is not None else None,
+                slot=slot,
+                model=model,
+                latency=time.monotonic() - started,
+                outcome=outcome,
+                retries=retries
+            ))
+    
+    async def _generate_routed(
+        self,
+        slot: str,
+        role: str,
+        contents: Any,
+        config: types.GenerateContentConfig,
+        validate: Callable[[str], Any],
+        priority: int = PRIORITY_INTERACTIVE,
+        cached_prefix: Optional[str] = None,
+        hedge: bool = False
+    ) -> Any:
+        """
+        Run a generation through the model router
+        Tries the role's models cheapest first and escalates to the next model on
+        timeout, API error or output that fails `validate`; returns the validated result
+        cached_prefix is prepended to contents, or served from a context cache when large
+        hedge=True duplicates a slow first attempt (see _attempt_hedged)
+        """
+        last_error = None
+        candidates = model_router.candidates(role, current_operation.get())
+        
+        for index, model in enumerate(candidates):
+            try:
+                if hedge and index == 0 and settings.GEMINI_HEDGE_ENABLED:
+                    return await self._attempt_hedged(
+                        slot, role, model, candidates, contents, config, validate, priority, cached_prefix
+                    )
+                return await self._attempt(
+                    slot, model, contents, config, validate, priority, cached_prefix
+                )
+            except Exception as e:
+                logger.warning(f"{model} failed for {role} ({type(e).__name__}: {e}), escalating")
+                last_error = e
+        
+        raise last_error
     
-    def _get_client(self, api_key: str) -> genai.Client:
-        """Helper to get Gemini Client with specific key"""
-        return genai.Client(api_key=api_key)
+    async def _attempt(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: types.GenerateContentConfig,
+        validate: Callable[[str], Any],
+        priority: int,
+        cached_prefix: Optional[str]
+    ) -> Any:
+        """
+        One validated generation on one model, recorded in the router stats
+        Moves to another key slot while the requested key's circuit is open
+        """
+        slot = circuit_breakers.route_slot(slot)
+        attempt_contents, attempt_config = contents, config
+        if cached_prefix is not None:
+            attempt_contents, attempt_config = await self._apply_context_cache(
+                slot, model, cached_prefix, contents, config
+            )
+        
+        started = time.monotonic()
+        try:
+            response = await self._generate(
+                slot=slot,
+                model=model,
+                contents=attempt_contents,
+                config=attempt_config,
+                priority=priority,
+                timeout=model_router.timeout(model)
+            )
+            result = validate(response.text or "")
+        except CircuitOpenError:
+            # Skipped without calling the model; not a latency sample
+            raise
+        except Exception:
+            model_router.record(model, time.monotonic() - started, ok=False)
+            raise
+        
+        model_router.record(model, time.monotonic() - started, ok=True)
+        return result
     
+    async def _attempt_hedged(
+        self,
+        slot: str,
+        role: str,
+        model: str,
+        candidates: list,
+        contents: Any,
+        config: types.GenerateContentConfig,
+        validate: Callable[[str], Any],
+        priority: int,
+        cached_prefix: Optional[str]
+    ) -> Any:
+        """
+        Attempt with request hedging for latency-critical calls
+        If the call is still running after the model's p90 latency, an identical
+        request goes to the fastest candidate model; the first valid reply wins
+        and the other call is cancelled. Hedges are capped by the hedge budget
+        """
+        hedge_budget.record_request()
+        primary = asyncio.ensure_future(
+            self._attempt(slot, model, contents, config, validate, priority, cached_prefix)
+        )
+        tasks = [primary]
+        
+        try:
+            delay = model_router.hedge_delay(model)
+            if delay is None:
+                return await primary
+            
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not hedge_budget.try_acquire():
+                return await primary
+            
+            hedge_model = model_router.fastest(candidates)
+            logger.info(f"Hedging {role} call: {model} exceeded {delay:.2f}s, duplicating on {hedge_model}")
+            hedge = asyncio.ensure_future(
+                self._attempt(slot, hedge_model, contents, config, validate, priority, cached_prefix)
+            )
+            tasks.append(hedge)
+            
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            hedge_budget.record_win()
+                        return task.result()
+            
+            raise primary.exception()
+        
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _generate_structured(
+        self,
+        slot: str,
+        role: str,
+        contents: Any,
+        schema: Type[BaseModel],
+        config: Optional[types.GenerateContentConfig] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        cached_prefix: Optional[str] = None,
+        hedge: bool = False
+    ) -> BaseModel:
+        """
+        Run a routed generation constrained to a Pydantic model's schema
+        Replies are parsed tolerantly; fields that are still missing or invalid
+        are fixed with a small follow-up call instead of regenerating everything
+        """
+        config = (config or types.GenerateContentConfig()).model_copy(update={
+            "response_mime_type": "application/json",
+            "response_schema": types.Schema.model_validate(response_schema(schema))
+        })
+        
+        result = await self._generate_routed(
+            slot=slot,
+            role=role,
+            contents=contents,
+            config=config,
+            validate=lambda text: parse_structured(text, schema),
+            priority=priority,
+            cached_prefix=cached_prefix,
+            hedge=hedge
+        )
+        
+        if not result.complete:
+            logger.warning(f"{schema.__name__} reply has broken fields {list(result.errors)}, repairing")
+            try:
+                repaired = await self._repair_fields(
+                    slot=slot,
+                    role=role,
+                    contents=contents,
+                    result=result,
+                    config=config,
+                    priority=priority,
+                    cached_prefix=cached_prefix
+                )
+                result.data.update(repaired)
+                result.errors = {name: error for name, error in result.errors.items() if name not in repaired}
+            except Exception as e:
+                logger.warning(f"{schema.__name__} repair failed: {e}")
+        
+        return result.build()
+    
+    async def _repair_fields(
+        self,
+        slot: str,
+        role: str,
+        contents: Any,
+        result: StructuredResult,
+        config: types.GenerateContentConfig,
+        priority: int,
+        cached_prefix: Optional[str]
+    ) -> dict:
+        """
+        Ask again for only the broken fields of a structured reply
+        """
+        repair_schema = create_model(
+            f"{result.model.__name__}Repair",
+            **{name: (result.model.model_fields[name].annotation, result.model.model_fields[name])
+               for name in result.errors}
+        )
+        instruction = repair_prompt(result)
+        repair_contents = contents + instruction if isinstance(contents, str) else [*contents, instruction]
+        
+        repaired = await self._generate_routed(
+            slot=slot,
+            role=role,
+            contents=repair_contents,
+            config=config.model_copy(update={
+                "response_schema": types.Schema.model_validate(response_schema(repair_schema))
+            }),
+            validate=lambda text: parse_structured(text, repair_schema).build(),
+            priority=priority,
+            cached_prefix=cached_prefix
+        )
+        return repaired.model_dump()
+    
+    async def _apply_context_cache(
+        self,
+        slot: str,
+        model: str,
+        prefix: str,
+        contents: str,
+        config: types.GenerateContentConfig
+    ) -> tuple:
+        """
+        Serve a stable prompt prefix from an explicit context cache when it is large
+        enough; smaller prefixes are sent inline and still benefit from Gemini's
+        implicit prefix caching
+        """
+        if (
+            settings.GEMINI_CONTEXT_CACHE_ENABLED
+            and self.backend.supports_context_cache
+            and estimate_tokens(prefix) >= settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+        ):
+            cached_content = await context_cache.get_or_create(slot=slot, model=model, prefix=prefix)
+            if cached_content:
+                return contents, config.model_copy(update={"cached_content": cached_content})
+        
+        return prefix + contents, config
+    
+    async def _generate_stream(
+        self,
+        slot: str,
+        model: str,
+        contents: Any,
+        config: types.GenerateContentConfig = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        operation: str = "stream"
+    ) -> AsyncIterator[str]:
+        """
+        Stream a generation from the LLM backend with the key of a slot, yielding text chunks
+        Quota is reserved up front; HTTP 429 is retried only before the first chunk
+        Recorded in llm_metrics under `operation` with the time to first chunk as TTFT
+        """
+        slot = circuit_breakers.route_slot(slot)
+        api_key = get_api_key(slot)
+        reserved_tokens = estimate_tokens(contents) + settings.GEMINI_OUTPUT_TOKEN_RESERVE
+        began = time.monotonic()
+        first_chunk_at = None
+        retries = 0
+        outcome = OUTCOME_OK
+        usage = None
+        
+        try:
+            for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+                circuit_breakers.check(api_key, model)
+                usage = None
+                started = False
+                try:
+                    await quota_scheduler.acquire(api_key, model, reserved_tokens, priority)
+                    stream = await self.backend.generate_stream(slot, model, contents, config)
+                    
+                    async for chunk in stream:
+                        usage = chunk.usage_metadata or usage
+                        if chunk.text:
+                            if not started:
+                                first_chunk_at = time.monotonic()
+                            started = True
+                            yield chunk.text
+                except errors.ClientError as e:
+                    if e.code == 429 and attempt < settings.GEMINI_MAX_RETRIES and not started:
+                        circuit_breakers.release(api_key, model)
+                        delay = settings.GEMINI_RETRY_BASE_DELAY * (2 ** attempt)
+                        quota_scheduler.backoff(api_key, model, delay)
+                        retries += 1
+                        continue
+                    circuit_breakers.record_failure(api_key, model, e)
+                    raise
+                except RateLimitTimeout:
+                    circuit_breakers.release(api_key, model)
+                    raise
+                except Exception as e:
+                    circuit_breakers.record_failure(api_key, model, e)
+                    raise
+                except BaseException:
+                    circuit_breakers.release(api_key, model)
+                    raise
+                
+                circuit_breakers.record_success(api_key, model)
+                if usage and usage.total_token_count:
+                    quota_scheduler.record_usage(api_key, model, reserved_tokens, usage.total_token_count)
+                return
+        except BaseException as e:
+            outcome = classify_outcome(e)
+            raise
+        finally:
+            llm_metrics.record(LLMCall.from_usage(
+                usage,
+                slot=slot,
+                model=model,
+                latency=time.monotonic() - began,
+                operation=operation,
+                ttft=first_chunk_at - began if first_chunk_at is not None else None,
+                outcome=outcome,
+                retries=retries
+            ))
+    
+    @llm_operation("parse_resume")
     async def parse_resume_text(self, resume_text: str) -> ParsedResumeData:
         """
         Parse resume text using Gemini (Text-based)
         Uses the google.genai.Client() format for guaranteed JSON response
+        Fields found by the local regex/vocabulary pass are left out of the prompt;
+        if the LLM call fails those fields are still returned
+        Results are cached by hash of text, model and prompt version
+        """
+        parsed_data, _ = await self._parse_resume_text(resume_text, with_suggestions=False)
+        return parsed_data
+    
+    @llm_operation("parse_resume_with_suggestions")
+    async def parse_resume_with_suggestions(self, resume_text: str) -> Tuple[ParsedResumeData, Optional[dict]]:
+        """
+        Parse resume text and suggest job search context in one structured call
+        Saves onboarding the second round-trip of generate_context_suggestions
+        
+        Returns:
+            Parsed data and suggestions (ContextSuggestionsResponse fields); None
+            for the suggestions only if parsing failed altogether
+        """
+        return await self._parse_resume_text(resume_text, with_suggestions=True)
+    
+    async def _parse_resume_text(
+        self,
+        resume_text: str,
+        with_suggestions: bool
+    ) -> Tuple[ParsedResumeData, Optional[dict]]:
+        """
+        Helper to parse resume text, optionally asking for context suggestions in the same call
         """
         try:
-            logger.info("Parsing resume text with Gemini...")
+            prompt_version = RESUME_PARSE_PROMPT_VERSION + ("+suggestions" if with_suggestions else "")
+            cache_key = ParseCacheService.make_key(
+                resume_text,
+                settings.GEMINI_MODEL_GENERATOR,
+                prompt_version
+            )
+            cached = await self.parse_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Resume parse cache hit")
+                cached = dict(cached)
+                suggestions = cached.pop("context_suggestions", None)
+                return ParsedResumeData(**cached), suggestions
             
-            # Use GENERATOR key for parsing as per user requirement
-            api_key = settings.GOOGLE_API_KEY_GENERATOR or settings.GOOGLE_API_KEY
-            client = genai.Client(api_key=api_key)
+            # A name above the contact details needs no LLM; other local finds are hints
+            local_fields = extract_resume_fields(resume_text)
+            requested = [
+                name for name in ParsedResumeData.model_fields
+                if not (name in SETTLED_FIELDS and name in local_fields)
+            ]
+            logger.info(f"Parsing resume text with Gemini for {requested} ({sorted(local_fields)} found locally)")
+            
+            # Strip boilerplate and trim to budget; the cache key stays on the raw text
+            budgeted = apply_budget(
+                resume_text,
+                settings.TOKEN_BUDGET_RESUME_PARSE,
+                resume=True,
+                label="resume parse"
+            )
             
+            field_prompts = [RESUME_FIELD_PROMPTS[name][0] for name in requested]
+            field_rules = [self._resume_field_rule(name, local_fields.get(name)) for name in requested]
+            schema_fields = {
+                name: (ParsedResumeData.model_fields[name].annotation, ParsedResumeData.model_fields[name])
+                for name in requested
+            }
+            if with_suggestions:
+                field_prompts += [example for example, _ in CONTEXT_SUGGESTION_PROMPTS.values()]
+                field_rules += [rule for _, rule in CONTEXT_SUGGESTION_PROMPTS.values()]
+                schema_fields.update({
+                    name: (field.annotation, field)
+                    for name, field in ContextSuggestionsResponse.model_fields.items()
+                })
+            
+            examples = ",\n                ".join(field_prompts)
+            rules = "\n            ".join(field_rules)
             prompt = f"""
             You are an expert resume parser. Analyze the following resume text and extract structured information.
             
             Resume Text:
-            {resume_text}
+            {budgeted.text}
             
             Extract and return the following information in JSON format:
             {{
-                "name": "Candidate Name",
-                "links": {{"LinkedIn": "url", "GitHub": "url", "Portfolio": "url"}},
-                "skills": ["skill1", "skill2", ...],
-                "experience_years": <number or null>,
-                "education": ["degree1", "degree2", ...],
-                "job_titles": ["title1", "title2", ...],
-                "achievements": ["achievement1", "achievement2", ...]
+                {examples}
             }}
             
             Rules:
-            - Extract the candidate's full name
-            - Extract all profile links as key-value pairs where key is the platform name (LinkedIn, GitHub, Portfolio, Website, etc.) and value is the URL
-            - Extract all technical and soft skills mentioned
-            - Calculate total years of experience if possible
-            - List all degrees and certifications
-            - List all job titles held
-            - Extract key achievements and accomplishments
+            {rules}
             - Return only valid JSON
-            - For links, use platform names as keys (e.g., "LinkedIn", "GitHub", "Portfolio", "Website")
             """
             
-            # Use the guaranteed response format with GENERATOR model
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL_GENERATOR, 
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.3  # Lower temperature for more consistent parsing
-                )
-            )
+            # Ask only for the fields the local pass could not settle
+            partial_schema = create_model("ParsedResumeDataPartial", **schema_fields)
             
-            # Parse JSON response
-            content = response.text
-            parsed = json.loads(content)
+            # Use the guaranteed response format with GENERATOR key and models
+            # (GENERATOR key for parsing as per user requirement)
+            try:
+                extracted = (await self._generate_structured(
+                    slot="generator",
+                    role="generator",
+                    contents=prompt,
+                    schema=partial_schema,
+                    config=types.GenerateContentConfig(
+                        temperature=0.3  # Lower temperature for more consistent parsing
+                    )
+                )).model_dump()
+            except Exception as e:
+                logger.error(f"AI resume text parsing error, returning local fields only: {e}", exc_info=True)
+                parsed_data = self._merge_resume_fields(local_fields, {})
+                return parsed_data, self._local_context_suggestions(parsed_data) if with_suggestions else None
             
-            logger.info(f"Successfully parsed resume for: {parsed.get('name', 'Unknown')}")
+            suggestions = None
+            if with_suggestions:
+                suggestions = {name: extracted.pop(name) for name in ContextSuggestionsResponse.model_fields}
+            parsed_data = self._merge_resume_fields(local_fields, extracted)
+            logger.info(f"Successfully parsed resume for: {parsed_data.name or 'Unknown'}")
             
-            return ParsedResumeData(**parsed)
+            cached_data = parsed_data.model_dump()
+            if with_suggestions:
+                cached_data["context_suggestions"] = suggestions
+            await self.parse_cache.set(
+                cache_key,
+                model=settings.GEMINI_MODEL_GENERATOR,
+                prompt_version=prompt_version,
+                parsed_data=cached_data
+            )
             
+            return parsed_data, suggestions
+        
         except Exception as e:
             logger.error(f"AI resume text parsing error: {e}", exc_info=True)
             # Return default structure on error
@@ -93,8 +633,56 @@ class AIService:
                 education=[],
                 job_titles=[],
                 achievements=[]
+            ), None
+    
+    @staticmethod
+    def _resume_field_rule(name: str, found: Any) -> str:
+        """
+        Helper to word the parsing rule for a field, passing on what was found locally
+        Links are merged with the local ones; skills, job titles and experience
+        are only hints the LLM has to confirm or reject
+        """
+        rule = RESUME_FIELD_PROMPTS[name][1]
+        if isinstance(found, dict) and found:
+            rule += f" other than these, which were already found: {', '.join(found)}"
+        elif isinstance(found, list) and found:
+            rule += (
+                f" (a keyword scan suggested: {', '.join(found)}; keep only those the resume"
+                " really shows for the candidate and add any it missed)"
             )
-
+        elif found:
+            rule += (
+                f" (a phrase scan suggested {found}; use it only if it describes the candidate's"
+                " own experience rather than a requirement)"
+            )
+        return rule
+    
+    @staticmethod
+    def _merge_resume_fields(local_fields: dict, extracted: dict) -> ParsedResumeData:
+        """
+        Helper to combine locally found fields with those extracted by the LLM
+        Local values win for settled fields and are merged into links; for the
+        other fields the LLM's answer wins, and local values only stand in for
+        fields the LLM did not return (e.g. when the call failed)
+        """
+        merged = {
+            "name": None,
+            "links": {},
+            "skills": [],
+            "experience_years": None,
+            "education": [],
+            "job_titles": [],
+            "achievements": [],
+            **extracted
+        }
+        for name, value in local_fields.items():
+            if name in SETTLED_FIELDS or name not in extracted:
+                merged[name] = value
+            elif isinstance(value, dict):
+                merged[name] = {**(merged.get(name) or {}), **value}
+        return ParsedResumeData(**merged)
+    
+    @llm_operation("parse_resume_file")
     async def parse_resume_file(self, file_content: bytes, mime_type: str) -> ParsedResumeData:
         """
         Parse resume file using Gemini (Native File Support)
@@ -103,10 +691,6 @@ class AIService:
         try:
             logger.info("Parsing resume file with Gemini PARSER model...")
             
-            # Use PARSER Key for file extraction (multimodal capability)
-            api_key = settings.GOOGLE_API_KEY_PARSER or settings.GOOGLE_API_KEY
-            client = genai.Client(api_key=api_key)
-            
             prompt = """
             Analyze the attached resume document and extract structured information.
             
@@ -133,8 +717,10 @@ class AIService:
             - For links, use platform names as keys (e.g., "LinkedIn", "GitHub", "Portfolio", "Website")
             """
             
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL_PARSER,
+            # Use PARSER key for file extraction (multimodal capability)
+            return await self._generate_structured(
+                slot="parser",
+                role="parser",
                 contents=[
                     types.Part.from_bytes(
                         data=file_content,
@@ -142,17 +728,9 @@ class AIService:
                     ),
                     prompt
                 ],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+                schema=ParsedResumeData
             )
-            
-            # Parse JSON response
-            content = response.text
-            parsed = json.loads(content)
-            
-            return ParsedResumeData(**parsed)
-            
+        
         except Exception as e:
             logger.error(f"AI resume parsing error: {e}", exc_info=True)
             # Return default structure on error
@@ -165,54 +743,62 @@ class AIService:
                 job_titles=[],
                 achievements=[]
             )
-
+    
+    @llm_operation("refine_context")
     async def refine_context(self, context_data: dict) -> dict:
         """
-        Refine user context with AI suggestions
-        CHATBOT model provides conversational analysis
+        Suggest roles, industries and keywords related to a saved context
+        CHATBOT model provides conversational analysis; runs in the background
+        after the context is saved, and drops items the context already has
         """
         try:
             logger.info("Refining context with AI CHATBOT model...")
             
-            # Use CHATBOT Key for conversation and analysis
-            api_key = settings.GOOGLE_API_KEY_CHATBOT or settings.GOOGLE_API_KEY
-            client = genai.Client(api_key=api_key)
-            
             prompt = f"""
             Analyze the following user context and provide refinements:
             
-            Target Roles: {', '.join(context_data.get('target_roles', []))}
-            Industries: {', '.join(context_data.get('preferred_industries', []))}
-            Keywords: {', '.join(context_data.get('keywords', []))}
+            Target Roles: {', '.join(context_data.get('target_roles') or [])}
+            Industries: {', '.join(context_data.get('preferred_industries') or [])}
+            Keywords: {', '.join(context_data.get('keywords') or [])}
+            Geography: {', '.join(context_data.get('geography') or [])}
             
             Suggest:
             1. Related job titles to target
             2. Related industries
             3. Additional keywords to include
+            4. Related locations
             
-            Return as JSON with keys: suggested_roles, suggested_industries, suggested_keywords
+            Return as JSON with keys: suggested_roles, suggested_industries, suggested_keywords, suggested_geography
             """
             
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL_CHATBOT,
+            # Use CHATBOT key for conversation and analysis
+            suggestions = await self._generate_structured(
+                slot="chatbot",
+                role="chatbot",
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+                schema=ContextSuggestionsResponse,
+                priority=PRIORITY_BATCH  # Nobody waits on it; never delays interactive calls
             )
             
-            # For now, just return original context with suggestions logged or merged
-            # The current implementation just returned context_data, so we keep it simple
-            # but we could merge suggestions if the frontend supported it.
-            # For now, let's just log it to prove it works
-            logger.info(f"Refinement suggestions: {response.text}")
-            
-            return context_data
+            chosen = {
+                "suggested_roles": context_data.get('target_roles'),
+                "suggested_industries": context_data.get('preferred_industries'),
+                "suggested_keywords": context_data.get('keywords'),
+                "suggested_geography": context_data.get('geography')
+            }
+            refined = {}
+            for name, values in suggestions.model_dump().items():
+                known = {item.lower() for item in chosen[name] or []}
+                refined[name] = [item for item in values if item.lower() not in known]
             
+            logger.info(f"Refinement suggestions: {refined}")
+            return refined
+        
         except Exception as e:
             logger.error(f"AI context refinement error: {e}", exc_info=True)
-            return context_data
+            raise
     
+    @llm_operation("context_suggestions")
     async def generate_context_suggestions(self, parsed_resume: ParsedResumeData) -> dict:
         """
         Generate context suggestions based on parsed resume data
@@ -221,10 +807,6 @@ class AIService:
         try:
             logger.info("Generating context suggestions with GENERATOR model...")
             
-            # Use GENERATOR Key for text generation
-            api_key = settings.GOOGLE_API_KEY_GENERATOR or settings.GOOGLE_API_KEY
-            client = genai.Client(api_key=api_key)
-            
             # Build resume context for the prompt
             skills_str = ', '.join(parsed_resume.skills) if parsed_resume.skills else 'None provided'
             job_titles_str = ', '.join(parsed_resume.job_titles) if parsed_resume.job_titles else 'None provided'
@@ -255,60 +837,273 @@ class AIService:
             }}
             """
             
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL_CHATBOT,
+            # Use GENERATOR key and models for text generation
+            suggestions = (await self._generate_structured(
+                slot="generator",
+                role="generator",
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    temperature=0.7
-                )
-            )
-            
-            # Parse JSON response
-            content = response.text
-            suggestions = json.loads(content)
+                schema=ContextSuggestionsResponse,
+                config=types.GenerateContentConfig(temperature=0.7)
+            )).model_dump()
             
             logger.info(f"Generated suggestions: {suggestions}")
             return suggestions
-            
+        
         except Exception as e:
             logger.error(f"AI context suggestions error: {e}", exc_info=True)
-            # Return empty suggestions on error
-            return {
-                "suggested_roles": [],
-                "suggested_industries": [],
-                "suggested_keywords": [],
-                "suggested_geography": []
-            }
+            # Fall back to the predefined tags found in the resume
+            return self._local_context_suggestions(parsed_resume)
     
+    @staticmethod
+    def _local_context_suggestions(parsed_resume: ParsedResumeData) -> dict:
+        """
+        Helper to suggest roles, industries and keywords without the LLM
+        Tags the resume's skills and job titles with the predefined tags
+        """
+        tags = get_tag_matcher().tags("\n".join([*parsed_resume.skills, *parsed_resume.job_titles]))
+        return {
+            "suggested_roles": tags["roles"],
+            "suggested_industries": tags["industries"],
+            "suggested_keywords": tags["keywords"],
+            "suggested_geography": []
+        }
+    
+    @llm_operation("generate_email")
     async def generate_email(
         self,
         company_name: str,
         company_description: str,
         user_context: dict,
-        resume_data: dict
+        resume_data: dict,
+        fallback_on_error: bool = True,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> dict:
         """
         Generate personalized email for a company
         GENERATOR model creates compelling outreach emails
+        With fallback_on_error=False, errors are raised instead of returning a placeholder
         """
         try:
             logger.info(f"Generating email for {company_name} with GENERATOR model...")
             
-            # Use GENERATOR Key for email generation
-            api_key = settings.GOOGLE_API_KEY_GENERATOR or settings.GOOGLE_API_KEY
-            client = genai.Client(api_key=api_key)
+            # Candidate profile first (stable across companies), company delta last
+            prefix = self._build_candidate_prefix(
+                user_context=user_context,
+                resume_data=resume_data,
+                output_format='Return as JSON: {"subject": "...", "body": "..."}'
+            )
             
-            prompt = f"""
-            Generate a personalized outreach email.
+            # Use GENERATOR key for email generation
+            email = await self._generate_structured(
+                slot="generator",
+                role="generator",
+                contents=self._build_company_section(company_name, company_description),
+                schema=GeneratedEmail,
+                priority=priority,
+                cached_prefix=prefix
+            )
             
-            Company: {company_name}
-            About: {company_description}
+            return email.model_dump()
+        
+        except Exception as e:
+            logger.error(f"AI email generation error: {e}", exc_info=True)
+            if not fallback_on_error:
+                raise
+            return {
+                "subject": f"Inquiry about opportunities at {company_name}",
+                "body": "Email generation failed. Please write manually."
+            }
+    
+    @llm_operation("generate_email_variants")
+    async def generate_email_variants(
+        self,
+        company_name: str,
+        company_description: str,
+        user_context: dict,
+        resume_data: dict,
+        count: int
+    ) -> list:
+        """
+        Generate several distinct emails for one company in a single call
+        Returns up to `count` variants; raises if none are usable
+        """
+        try:
+            logger.info(f"Generating {count} email variants for {company_name} with GENERATOR model...")
+            
+            prefix = self._build_candidate_prefix(
+                user_context=user_context,
+                resume_data=resume_data,
+                output_format=(
+                    f'Write {count} distinct variants, each with its own angle, subject line and opening. '
+                    'Return as JSON: {"variants": [{"subject": "...", "body": "..."}, ...]}'
+                )
+            )
+            
+            # Use GENERATOR key for email generation
+            return await self._generate_routed(
+                slot="generator",
+                role="generator",
+                contents=self._build_company_section(company_name, company_description),
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=types.Schema.model_validate(response_schema(GeneratedEmailVariants)),
+                    temperature=0.9  # Higher temperature for more varied drafts
+                ),
+                validate=lambda text: self._validate_email_variants(text, count),
+                cached_prefix=prefix
+            )
+        
+        except Exception as e:
+            logger.error(f"AI email variants generation error: {e}", exc_info=True)
+            raise
+    
+    async def generate_email_stream(
+        self,
+        company_name: str,
+        company_description: str,
+        user_context: dict,
+        resume_data: dict
+    ) -> AsyncIterator[str]:
+        """
+        Stream a personalized email for a company as raw text chunks
+        The first line is "Subject: ...", followed by a blank line and the body
+        """
+        logger.info(f"Streaming email for {company_name} with GENERATOR model...")
+        
+        prompt = self._build_email_prompt(
+            company_name=company_name,
+            company_description=company_description,
+            user_context=user_context,
+            resume_data=resume_data,
+            output_format=(
+                'Return plain text (no JSON, no markdown): the first line is '
+                '"Subject: <subject line>", then a blank line, then the email body.'
+            )
+        )
+        
+        # Use GENERATOR key for email generation
+        async for chunk in self._generate_stream(
+            slot="generator",
+            model=model_router.candidates("generator", "generate_email_stream")[0],
+            contents=prompt,
+            config=types.GenerateContentConfig(response_mime_type="text/plain"),
+            operation="generate_email_stream"
+        ):
+            yield chunk
+    
+    def build_email_batch_request(
+        self,
+        company_name: str,
+        company_description: str,
+        user_context: dict,
+        resume_data: dict
+    ) -> dict:
+        """
+        Build one inline request for an offline batch job
+        Same prompt and JSON response shape as generate_email
+        """
+        return {
+            "contents": self._build_email_prompt(
+                company_name=company_name,
+                company_description=company_description,
+                user_context=user_context,
+                resume_data=resume_data,
+                output_format='Return as JSON: {"subject": "...", "body": "..."}'
+            ),
+            "config": {
+                "response_mime_type": "application/json",
+                "response_schema": response_schema(GeneratedEmail)
+            }
+        }
+    
+    def parse_email_reply(self, text: str) -> dict:
+        """
+        Parse a JSON email reply produced outside generate_email (e.g. by a batch job)
+        Raises ValueError if it is not JSON or lacks a subject or body
+        """
+        return parse_structured(text, GeneratedEmail).build().model_dump()
+    
+    @staticmethod
+    def _validate_email_variants(text: str, count: int) -> list:
+        """Validate a JSON multi-variant reply; keeps up to `count` distinct complete emails"""
+        data = extract_json(text)
+        items = data.get("variants", []) if isinstance(data, dict) else data
+        
+        variants = []
+        seen = set()
+        for item in items:
+            if not isinstance(item, dict) or not item.get("subject") or not item.get("body"):
+                continue
+            key = (item["subject"].strip(), item["body"].strip())
+            if key in seen:
+                continue
+            seen.add(key)
+            variants.append({"subject": item["subject"], "body": item["body"]})
+        
+        if not variants:
+            raise ValueError("Variants reply has no complete email")
+        return variants[:count]
+    
+    @staticmethod
+    def _validate_text(text: str) -> str:
+        """Validate a free-form reply; needs non-empty text"""
+        if not text.strip():
+            raise ValueError("Empty reply")
+        return text
+    
+    @staticmethod
+    def _validate_json_text(text: str) -> str:
+        """Validate a JSON reply and return it as text"""
+        json.loads(text)
+        return text
+    
+    def _build_email_prompt(
+        self,
+        company_name: str,
+        company_description: str,
+        user_context: dict,
+        resume_data: dict,
+        output_format: str
+    ) -> str:
+        """
+        Build the outreach email prompt; output_format sets the response shape
+        """
+        prefix = self._build_candidate_prefix(user_context, resume_data, output_format)
+        return prefix + self._build_company_section(company_name, company_description)
+    
+    def _build_candidate_prefix(
+        self,
+        user_context: dict,
+        resume_data: dict,
+        output_format: str
+    ) -> str:
+        """
+        Build the per-user part of the email prompt
+        Identical for every company, so it is placed first as a cacheable prefix;
+        with the resume text it usually reaches GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+        so bulk runs serve it from an explicit context cache
+        """
+        parsed_data = resume_data.get('parsed_data') or {}
+        resume_text = apply_budget(
+            resume_data.get('extracted_text') or "",
+            settings.TOKEN_BUDGET_EMAIL_RESUME,
+            resume=True,
+            label="email resume"
+        ).text
+        
+        return f"""
+            Generate a personalized outreach email.
             
             Candidate Profile:
-            - Target Roles: {', '.join(user_context.get('target_roles', []))}
-            - Skills: {', '.join(resume_data.get('parsed_data', {}).get('skills', []))}
-            - Experience: {resume_data.get('parsed_data', {}).get('job_titles', [])}
+            - Target Roles: {', '.join(user_context.get('target_roles') or [])}
+            - Preferred Industries: {', '.join(user_context.get('preferred_industries') or [])}
+            - Keywords: {', '.join(user_context.get('keywords') or [])}
+            - Skills: {', '.join(parsed_data.get('skills', []))}
+            - Experience: {parsed_data.get('job_titles', [])}
+            - Notes from the candidate: {user_context.get('custom_message') or 'None'}
+            
+            Resume:
+            {resume_text or 'Not available'}
             
             Tone: {user_context.get('pitch_tone', 'professional')}
             
@@ -318,25 +1113,113 @@ class AIService:
             3. Clear value proposition
             4. Professional but friendly tone
             
-            Return as JSON: {{"subject": "...", "body": "..."}}
-            """
-            
-            response = client.models.generate_content(
-                model=settings.GEMINI_MODEL_GENERATOR,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            
-            content = response.text
-            email_data = json.loads(content)
-            
-            return email_data
+            {output_format}
             
-        except Exception as e:
-            logger.error(f"AI email generation error: {e}", exc_info=True)
-            return {
-                "subject": f"Inquiry about opportunities at {company_name}",
-                "body": "Email generation failed. Please write manually."
-            }
+            The company to write to is described below.
+            """
+    
+    def _build_company_section(self, company_name: str, company_description: str) -> str:
+        """
+        Build the per-company part of the email prompt
+        """
+        return f"""
+            Company: {company_name}
+            About: {company_description}
+            """
+    
+    @llm_operation("chat_completion")
+    async def chat_completion(self, prompt: str, json_response: bool = False, hedge: bool = False) -> str:
+        """
+        Get a free-form reply from the CHATBOT model
+        Used by the email review chatbot and quick actions
+        hedge=True opts into request hedging for latency-critical calls
+        """
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json" if json_response else "text/plain",
+            temperature=settings.GEMINI_TEMPERATURE
+        )
+        
+        # Use CHATBOT key for conversation and review
+        return await self._generate_routed(
+            slot="chatbot",
+            role="chatbot",
+            contents=prompt,
+            config=config,
+            validate=self._validate_json_text if json_response else self._validate_text,
+            hedge=hedge
+        )
+    
+    @llm_operation("chat_summary")
+    async def summarize_chat(self, summary: Optional[str], messages: List[str]) -> str:
+        """
+        Fold chat messages into the running summary of an email review conversation
+        GENERATOR model; the summary replaces older messages in chat prompts
+        """
+        transcript = apply_budget(
+            "\n".join(messages),
+            settings.TOKEN_BUDGET_CHAT_HISTORY,
+            label="chat summary"
+        )
+        prompt = f"""
+        You are keeping a running summary of a conversation between a user and an
+        assistant who are reviewing an outreach email together.
+        
+        Summary so far:
+        {summary or 'None yet'}
+        
+        New messages:
+        {transcript.text}
+        
+        Update the summary with the new messages. Keep the user's requests and
+        preferences, changes that were agreed or made, and open questions. Drop
+        small talk. Write at most 150 words of plain text.
+        """
+        
+        return await self._generate_routed(
+            slot="generator",
+            role="generator",
+            contents=prompt,
+            config=types.GenerateContentConfig(temperature=0.3),
+            validate=self._validate_text,
+            priority=PRIORITY_BATCH  # Runs after the reply; never delays interactive calls
+        )
+    
+    @llm_operation("chat_completion_structured")
+    async def chat_completion_structured(
+        self,
+        prompt: str,
+        schema: Type[BaseModel],
+        hedge: bool = False
+    ) -> BaseModel:
+        """
+        Get a schema-constrained reply from the CHATBOT model
+        Used by quick actions that rewrite the email
+        """
+        # Use CHATBOT key for conversation and review
+        return await self._generate_structured(
+            slot="chatbot",
+            role="chatbot",
+            contents=prompt,
+            schema=schema,
+            config=types.GenerateContentConfig(temperature=settings.GEMINI_TEMPERATURE),
+            hedge=hedge
+        )
+    
+    async def chat_completion_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream a free-form reply from the CHATBOT model as text chunks
+        """
+        config = types.GenerateContentConfig(
+            response_mime_type="text/plain",
+            temperature=settings.GEMINI_TEMPERATURE
+        )
+        
+        # Use CHATBOT key for conversation and review
+        async for chunk in self._generate_stream(
+            slot="chatbot",
+            model=model_router.candidates("chatbot", "chat_completion_stream")[0],
+            contents=prompt,
+            config=config,
+            operation="chat_completion_stream"
+        ):
+            yield chunk
@@ -29,7 +29,7 @@ class AuthService:
             User profile data or None if not found
         """
         try:
-            response = self.supabase.table('user_profiles') \
+            response = await self.supabase.table('user_profiles') \
                 .select('*') \
                 .eq('id', user_id) \
                 .single() \
@@ -66,7 +66,7 @@ class AuthService:
                 'updated_at': datetime.utcnow().isoformat(),
             }
             
-            response = self.supabase.table('user_profiles') \
+            response = await self.supabase.table('user_profiles') \
                 .upsert(profile_data) \
                 .execute()
             
@@ -95,7 +95,7 @@ class AuthService:
             # Add updated_at timestamp
             updates['updated_at'] = datetime.utcnow().isoformat()
             
-            response = self.supabase.table('user_profiles') \
+            response = await self.supabase.table('user_profiles') \
                 .update(updates) \
                 .eq('id', user_id) \
                 .execute()
@@ -118,7 +118,7 @@ class AuthService:
         """
         try:
             # Note: This should cascade delete related data based on DB constraints
-            self.supabase.table('user_profiles') \
+            await self.supabase.table('user_profiles') \
                 .delete() \
                 .eq('id', user_id) \
                 .execute()
@@ -140,7 +140,7 @@ class AuthService:
             True if user exists, False otherwise
         """
         try:
-            response = self.supabase.table('user_profiles') \
+            response = await self.supabase.table('user_profiles') \
                 .select('id') \
                 .eq('email', email) \
                 .execute()
@@ -169,21 +169,21 @@ class AuthService:
             }
             
             # Count resumes
-            resume_response = self.supabase.table('resumes') \
+            resume_response = await self.supabase.table('resumes') \
                 .select('id', count='exact') \
                 .eq('user_id', user_id) \
                 .execute()
             stats['resumes_count'] = resume_response.count if hasattr(resume_response, 'count') else 0
             
             # Count contexts
-            context_response = self.supabase.table('user_contexts') \
+            context_response = await self.supabase.table('user_contexts') \
                 .select('id', count='exact') \
                 .eq('user_id', user_id) \
                 .execute()
             stats['contexts_count'] = context_response.count if hasattr(context_response, 'count') else 0
             
             # Check SMTP configuration
-            smtp_response = self.supabase.table('smtp_credentials') \
+            smtp_response = await self.supabase.table('smtp_credentials') \
                 .select('id') \
                 .eq('user_id', user_id) \
                 .execute()
@@ -191,7 +191,7 @@ class AuthService:
             
             # Count emails sent (if email_logs table exists)
             try:
-                email_response = self.supabase.table('email_logs') \
+                email_response = await self.supabase.table('email_logs') \
                     .select('id', count='exact') \
                     .eq('user_id', user_id) \
                     .eq('status', 'sent') \
@@ -2,13 +2,62 @@
 AI Chatbot Service - handles email review and editing via chat
 """
 
+from app.core.config import settings
+from app.core.llm_metrics import llm_operation
+from app.models.schemas import EmailEdits, GeneratedEmail
+from app.modules.ai_engine.span_edits import EditConflict, apply_edits
+from app.modules.ai_engine.token_budget import apply_budget, count_tokens, normalize_whitespace
 from app.services.ai_service import AIService
 from app.services.email_management_service import EmailManagementService
-from typing import List, Dict
+from app.services.rewrite_cache_service import RewriteCacheService
+from typing import AsyncIterator, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+QUICK_ACTION_PROMPTS = {
+    "formal": "Rewrite this email in a more formal, professional tone while keeping the key points.",
+    "casual": "Rewrite this email in a friendly, casual tone while maintaining professionalism.",
+    "personality": "Add more personality and warmth to this email, making it more engaging.",
+    "shorten": "Make this email more concise while preserving all important information.",
+    "expand": "Expand this email with more details and context.",
+    "fix_grammar": "Fix any grammar, spelling, or punctuation errors in this email."
+}
+
+QUICK_ACTION_TEMPLATE = """
+            {instruction}
+            
+            Current Subject: {subject}
+            Current Body:
+            {body}
+            
+            Return the updated email with:
+            - subject: the updated subject (repeat the current one unless it should change significantly)
+            - body: the updated body text
+            """
+
+QUICK_ACTION_EDIT_TEMPLATE = """
+            {instruction}
+            
+            Current Subject: {subject}
+            Current Body:
+            {body}
+            
+            Do not rewrite the email. Return only the changes as a list of edits:
+            - field: "subject" or "body"
+            - find: the exact text to change, copied character for character, long
+              enough to occur only once in that field
+            - replace: the corrected text
+            Return an empty list if nothing needs to change.
+            """
+
+# Actions whose result depends on exact characters only reuse exact matches
+EXACT_MATCH_ACTIONS = {"fix_grammar"}
+
+# Actions that change a few words; the model returns span edits instead of the
+# whole email (falling back to a rewrite if the edits do not apply cleanly)
+EDIT_ACTIONS = {"fix_grammar"}
+
 
 class ChatbotService:
     """Service for AI chatbot interactions for email editing"""
@@ -16,7 +65,9 @@ class ChatbotService:
     def __init__(self):
         self.ai_service = AIService()
         self.email_service = EmailManagementService()
+        self.rewrite_cache = RewriteCacheService()
     
+    @llm_operation("chat")
     async def chat(
         self,
         user_id: str,
@@ -41,34 +92,77 @@ class ChatbotService:
                 user_message=user_message
             )
             
-            # Get AI response
-            response = await self.ai_service.llm.ainvoke(prompt)
-            assistant_message = response.content
+            # Get AI response (hedged: the user is waiting on it)
+            assistant_message = await self.ai_service.chat_completion(prompt, hedge=True)
             
             # Save chat messages
-            await self.email_service.save_chat_message(
-                user_id=user_id,
-                email_id=email_id,
-                role="user",
-                message=user_message
-            )
-            
-            await self.email_service.save_chat_message(
+            await self.email_service.save_chat_messages(
                 user_id=user_id,
                 email_id=email_id,
-                role="assistant",
-                message=assistant_message
+                messages=[("user", user_message), ("assistant", assistant_message)]
             )
             
             return {
                 "message": assistant_message,
                 "email_updated": False  # TODO: Detect if email should be updated
             }
-            
+        
         except Exception as e:
             logger.error(f"Chatbot error: {e}", exc_info=True)
             raise
     
+    async def chat_stream(
+        self,
+        user_id: str,
+        email_id: str,
+        user_message: str,
+        chat_history: List[Dict[str, str]]
+    ) -> AsyncIterator[dict]:
+        """
+        Process chat message and stream the AI response as it is generated
+        Both chat messages are saved in one write once the stream completes
+        Yields events: delta (reply text), done (full reply) or error
+        """
+        try:
+            logger.info(f"Streaming chat for email {email_id}")
+            
+            # Get email details
+            email_data = await self.email_service.get_email(user_id, email_id)
+            
+            # Build context-aware prompt
+            prompt = self._build_chat_prompt(
+                email_data=email_data,
+                chat_history=chat_history,
+                user_message=user_message
+            )
+            
+            # Stream AI response
+            parts = []
+            async for chunk in self.ai_service.chat_completion_stream(prompt):
+                parts.append(chunk)
+                yield {"event": "delta", "data": chunk}
+            assistant_message = "".join(parts)
+            
+            # Save chat messages
+            await self.email_service.save_chat_messages(
+                user_id=user_id,
+                email_id=email_id,
+                messages=[("user", user_message), ("assistant", assistant_message)]
+            )
+            
+            yield {
+                "event": "done",
+                "data": {
+                    "message": assistant_message,
+                    "email_updated": False
+                }
+            }
+        
+        except Exception as e:
+            logger.error(f"Chatbot stream error: {e}", exc_info=True)
+            yield {"event": "error", "data": str(e)}
+    
+    @llm_operation("quick_action")
     async def apply_quick_action(
         self,
         user_id: str,
@@ -84,80 +178,130 @@ class ChatbotService:
             # Get email details
             email_data = await self.email_service.get_email(user_id, email_id)
             
-            # Define action prompts
-            action_prompts = {
-                "formal": "Rewrite this email in a more formal, professional tone while keeping the key points.",
-                "casual": "Rewrite this email in a friendly, casual tone while maintaining professionalism.",
-                "personality": "Add more personality and warmth to this email, making it more engaging.",
-                "shorten": "Make this email more concise while preserving all important information.",
-                "expand": "Expand this email with more details and context.",
-                "fix_grammar": "Fix any grammar, spelling, or punctuation errors in this email."
-            }
-            
-            if action not in action_prompts:
-                raise ValueError(f"Invalid action. Must be one of: {list(action_prompts.keys())}")
-            
-            # Build prompt
-            prompt = f"""
-            {action_prompts[action]}
-            
-            Current Subject: {email_data['subject']}
-            Current Body:
-            {email_data['content']}
-            
-            Return the updated email in JSON format:
-            {{
-                "subject": "updated subject (only if significantly changed)",
-                "body": "updated body text"
-            }}
-            """
+            if action not in QUICK_ACTION_PROMPTS:
+                raise ValueError(f"Invalid action. Must be one of: {list(QUICK_ACTION_PROMPTS.keys())}")
             
-            # Get AI response
-            response = await self.ai_service.llm.ainvoke(prompt)
-            content = response.content
+            # Same user's email, action, model and prompt template -> reuse the stored rewrite
+            template = QUICK_ACTION_EDIT_TEMPLATE if action in EDIT_ACTIONS else QUICK_ACTION_TEMPLATE
+            scope = RewriteCacheService.make_scope(
+                user_id,
+                email_id,
+                action,
+                settings.GEMINI_MODEL_CHATBOT,
+                template + QUICK_ACTION_PROMPTS[action]
+            )
+            result = self.rewrite_cache.get(
+                scope,
+                email_data['subject'],
+                email_data['content'],
+                near=action not in EXACT_MATCH_ACTIONS
+            )
+            cached = result is not None
             
-            # Parse JSON
-            import json
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            if not cached:
+                result = None
+                if action in EDIT_ACTIONS:
+                    result = await self._edit_email(action, email_data)
+                if result is None:
+                    result = {**await self._rewrite_email(action, email_data), "edits": None}
+                self.rewrite_cache.set(scope, email_data['subject'], email_data['content'], result)
             
-            updated_email = json.loads(content)
+            edits = result.pop("edits", None)
+            updated_email = result
+            changed = (updated_email["subject"], updated_email["body"]) != (email_data['subject'], email_data['content'])
             
             # Update email in database
-            await self.email_service.update_email_content(
-                user_id=user_id,
-                email_id=email_id,
-                subject=updated_email.get("subject", email_data['subject']),
-                content=updated_email.get("body", updated_email.get("content", ""))
-            )
+            if changed:
+                await self.email_service.update_email_content(
+                    user_id=user_id,
+                    email_id=email_id,
+                    subject=updated_email["subject"],
+                    content=updated_email["body"]
+                )
             
-            # Save to chat history
-            await self.email_service.save_chat_message(
-                user_id=user_id,
-                email_id=email_id,
-                role="user",
-                message=f"[Quick Action: {action}]"
-            )
+            if edits is None:
+                reply = f"I've updated the email to be more {action}."
+            elif edits:
+                reply = f"I've made {len(edits)} edit{'s' if len(edits) != 1 else ''} to the email."
+            else:
+                reply = "The email needed no changes."
             
-            await self.email_service.save_chat_message(
+            # Save to chat history
+            await self.email_service.save_chat_messages(
                 user_id=user_id,
                 email_id=email_id,
-                role="assistant",
-                message=f"I've updated the email to be more {action}."
+                messages=[
+                    ("user", f"[Quick Action: {action}]"),
+                    ("assistant", reply)
+                ]
             )
             
             return {
                 "success": True,
                 "updated_email": updated_email,
-                "message": f"Email updated to be more {action}"
+                "edits": edits,
+                "message": reply if edits is not None else f"Email updated to be more {action}",
+                "cached": cached
             }
-            
+        
         except Exception as e:
             logger.error(f"Quick action error: {e}", exc_info=True)
             raise
     
+    async def _rewrite_email(self, action: str, email_data: dict) -> dict:
+        """
+        Helper to have the model regenerate the whole subject and body
+        """
+        # Build prompt (the whole body is rewritten, so only whitespace is squeezed)
+        prompt = QUICK_ACTION_TEMPLATE.format(
+            instruction=QUICK_ACTION_PROMPTS[action],
+            subject=email_data['subject'],
+            body=normalize_whitespace(email_data['content'])
+        )
+        
+        # Get schema-constrained AI response
+        return (await self.ai_service.chat_completion_structured(
+            prompt,
+            schema=GeneratedEmail,
+            hedge=True
+        )).model_dump()
+    
+    async def _edit_email(self, action: str, email_data: dict) -> Optional[dict]:
+        """
+        Helper to have the model list span edits and apply them locally
+        The body is sent verbatim so the edits can be matched exactly
+        
+        Returns:
+            Updated subject and body plus the applied edits (offsets into the
+            original texts), or None if the edits could not be applied cleanly
+        """
+        prompt = QUICK_ACTION_EDIT_TEMPLATE.format(
+            instruction=QUICK_ACTION_PROMPTS[action],
+            subject=email_data['subject'],
+            body=email_data['content']
+        )
+        
+        reply = await self.ai_service.chat_completion_structured(
+            prompt,
+            schema=EmailEdits,
+            hedge=True
+        )
+        
+        try:
+            updated, applied = apply_edits(
+                {"subject": email_data['subject'], "body": email_data['content']},
+                [edit.model_dump() for edit in reply.edits]
+            )
+        except EditConflict as e:
+            logger.warning(f"Quick action '{action}' edits rejected, rewriting instead: {e}")
+            return None
+        
+        if not updated["subject"].strip() or not updated["body"].strip():
+            logger.warning(f"Quick action '{action}' edits emptied the email, rewriting instead")
+            return None
+        
+        return {"subject": updated["subject"], "body": updated["body"], "edits": applied}
+    
     def _build_chat_prompt(
         self,
         email_data: dict,
@@ -166,7 +310,14 @@ class ChatbotService:
     ) -> str:
         """
         Build context-aware prompt for chat
+        Email body and history are trimmed to their token budgets
         """
+        body = apply_budget(
+            email_data['content'],
+            settings.TOKEN_BUDGET_CHAT_EMAIL,
+            label="chat email"
+        )
+        
         prompt = f"""
         You are an AI assistant helping to review and improve an outreach email.
         
@@ -174,14 +325,24 @@ class ChatbotService:
         - Company: {email_data.get('company_name', 'N/A')}
         - Position: {email_data.get('position_title', 'N/A')}
         - Subject: {email_data['subject']}
-        - Body: {email_data['content']}
+        - Body: {body.text}
         
         Chat History:
         """
         
-        # Add recent chat history (last 5 messages)
-        for msg in chat_history[-5:]:
-            prompt += f"\n{msg['role']}: {msg['message']}"
+        # Older messages are covered by the running summary
+        if email_data.get('chat_summary'):
+            summary = apply_budget(
+                email_data['chat_summary'],
+                settings.TOKEN_BUDGET_CHAT_SUMMARY,
+                label="chat summary"
+            )
+            prompt += f"\nSummary of earlier messages: {summary.text}"
+        
+        # Add the messages after the summary (oldest dropped while over budget)
+        recent = self._unsummarized(chat_history, email_data.get('chat_summary_until'))
+        for line in self._budget_history(recent, settings.TOKEN_BUDGET_CHAT_HISTORY):
+            prompt += f"\n{line}"
         
         prompt += f"\n\nUser: {user_message}"
         prompt += """
@@ -197,3 +358,84 @@ class ChatbotService:
         """
         
         return prompt
+    
+    @staticmethod
+    def _unsummarized(chat_history: List[Dict[str, str]], summarized_until: Optional[str]) -> List[Dict[str, str]]:
+        """
+        Messages not yet folded into the chat summary
+        """
+        if not summarized_until:
+            return chat_history
+        return [msg for msg in chat_history if not msg.get('created_at') or msg['created_at'] > summarized_until]
+    
+    @staticmethod
+    def _budget_history(chat_history: List[Dict[str, str]], max_tokens: int) -> List[str]:
+        """
+        Format chat history newest-first until the token budget is spent
+        """
+        lines = []
+        used = 0
+        for msg in reversed(chat_history):
+            line = f"{msg['role']}: {normalize_whitespace(msg['message'])}"
+            cost = count_tokens(line)
+            if lines and used + cost > max_tokens:
+                break
+            lines.insert(0, line)
+            used += cost
+        
+        if len(lines) < len(chat_history):
+            logger.info(f"Chat history trimmed to {len(lines)} of {len(chat_history)} messages")
+        return lines
+    
+    async def compact_history(self, user_id: str, email_id: str) -> bool:
+        """
+        Fold older chat messages into the email's running summary
+        Runs after a reply once CHAT_SUMMARY_EVERY_TURNS turns have piled up beyond
+        the CHAT_RECENT_MESSAGES kept verbatim, so prompts and the history loaded
+        for them stay the same size however long the conversation gets
+        
+        Returns:
+            Whether a new summary was stored
+        """
+        try:
+            email_data = await self.email_service.get_email(user_id, email_id)
+            pending = await self.email_service.get_chat_history(
+                user_id=user_id,
+                email_id=email_id,
+                after=email_data.get('chat_summary_until')
+            )
+            
+            fold_count = len(pending) - settings.CHAT_RECENT_MESSAGES
+            if fold_count < 2 * settings.CHAT_SUMMARY_EVERY_TURNS:
+                return False
+            
+            # Messages sharing a timestamp (one turn) are folded together, since
+            # chat_summary_until is compared by timestamp
+            while fold_count < len(pending) and pending[fold_count]['created_at'] == pending[fold_count - 1]['created_at']:
+                fold_count += 1
+            folded = pending[:fold_count]
+            
+            summary = await self.ai_service.summarize_chat(
+                email_data.get('chat_summary'),
+                [f"{msg['role']}: {normalize_whitespace(msg['message'])}" for msg in folded]
+            )
+            
+            previous_count = email_data.get('chat_summary_message_count') or 0
+            stored = await self.email_service.save_chat_summary(
+                user_id=user_id,
+                email_id=email_id,
+                summary=summary,
+                summarized_until=folded[-1]['created_at'],
+                message_count=previous_count + len(folded),
+                expected_count=previous_count
+            )
+            if stored:
+                logger.info(f"Folded {len(folded)} chat messages of email {email_id} into its summary")
+            else:
+                logger.info(f"Chat summary of email {email_id} changed concurrently, skipping")
+            return stored
+        
+        except Exception as e:
+            # The summary catches up on the next turn; chat keeps working meanwhile
+            logger.warning(f"Chat history compaction failed for email {email_id}: {e}")
+            return False
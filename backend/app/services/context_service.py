@@ -3,6 +3,8 @@ Context service - manages user context profiles
 """
 
 from app.database.supabase_client import get_supabase
+from app.services.ai_service import AIService
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,10 +33,11 @@ class ContextService:
                 "geography": context_data.get("geography", []),
                 "resume_extracted_text": context_data.get("resume_extracted_text"),
                 "resume_parsed_data": context_data.get("resume_parsed_data"),
-                "context_json": context_data
+                "context_json": context_data,
+                "context_suggestions": None  # Refined again in the background for the new context
             }
             
-            response = self.supabase.table("context_profiles")\
+            response = await self.supabase.table("context_profiles")\
                 .upsert(data, on_conflict="user_id")\
                 .execute()
             
@@ -44,10 +47,52 @@ class ContextService:
             logger.error(f"Save context error: {e}", exc_info=True)
             raise
     
+    async def save_context_suggestions(self, user_id: str, context_suggestions: dict, expected_updated_at: str) -> bool:
+        """
+        Store suggestions refined from a saved context
+        Only applies if the context has not been saved again since it was
+        refined (updated_at still equals expected_updated_at)
+        
+        Returns:
+            Whether the suggestions were stored
+        """
+        try:
+            result = await self.supabase.table("context_profiles")\
+                .update({"context_suggestions": context_suggestions})\
+                .eq("user_id", user_id)\
+                .eq("updated_at", expected_updated_at)\
+                .execute()
+            
+            return bool(result.data)
+            
+        except Exception as e:
+            logger.error(f"Save context suggestions error: {e}", exc_info=True)
+            raise
+    
+    async def refresh_context_suggestions(self, user_id: str, context: dict) -> Optional[dict]:
+        """
+        Refine a saved context with the LLM and store the suggestions on its row
+        Runs in the background after /context/build, so saving never waits on
+        the LLM; a failure leaves context_suggestions empty until the next save
+        """
+        try:
+            suggestions = await AIService().refine_context(context)
+            stored = await self.save_context_suggestions(user_id, suggestions, context["updated_at"])
+            if not stored:
+                logger.info(f"Context of user {user_id} was saved again while refining, skipping")
+                return None
+            
+            logger.info(f"Stored refined context suggestions for user {user_id}")
+            return suggestions
+            
+        except Exception as e:
+            logger.warning(f"Context refinement failed for user {user_id}: {e}")
+            return None
+    
     async def get_context(self, user_id: str) -> dict:
         """Get user's context profile"""
         try:
-            response = self.supabase.table("context_profiles")\
+            response = await self.supabase.table("context_profiles")\
                 .select("*")\
                 .eq("user_id", user_id)\
                 .execute()
@@ -64,7 +109,7 @@ class ContextService:
     async def delete_context(self, user_id: str):
         """Delete user's context profile"""
         try:
-            self.supabase.table("context_profiles")\
+            await self.supabase.table("context_profiles")\
                 .delete()\
                 .eq("user_id", user_id)\
                 .execute()
@@ -85,7 +130,7 @@ class ContextService:
                     "resume_extracted_text": resume_extracted_text,
                     "resume_parsed_data": resume_parsed_data
                 }
-                response = self.supabase.table("context_profiles")\
+                response = await self.supabase.table("context_profiles")\
                     .insert(data)\
                     .execute()
             else:
@@ -96,7 +141,7 @@ class ContextService:
                 if resume_parsed_data is not None:
                     data["resume_parsed_data"] = resume_parsed_data
                 
-                response = self.supabase.table("context_profiles")\
+                response = await self.supabase.table("context_profiles")\
                     .update(data)\
                     .eq("user_id", user_id)\
                     .execute()
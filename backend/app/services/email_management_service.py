@@ -2,21 +2,93 @@
 Email Management Service - handles AI-generated emails workflow
 """
 
+from app.core.config import settings
+from app.core.gemini_batch import BatchJobFailed, get_batch_backend
+from app.core.rate_limiter import PRIORITY_BATCH
 from app.database.supabase_client import get_supabase_client
+from app.modules.ai_engine.minhash import LSHIndex, MinHasher, band_keys
 from app.services.ai_service import AIService
-from typing import List, Optional, Dict
-from datetime import datetime
+from typing import AsyncIterator, List, Optional, Dict, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Columns set by near-duplicate fingerprinting
+DUPLICATE_FIELDS = ("content_minhash", "content_bands", "duplicate_of", "duplicate_similarity")
+FINGERPRINT_PAGE_SIZE = 1000  # PostgREST's default max rows per request
+FINGERPRINT_ID_CHUNK = 100  # UUIDs per id=in.(...) filter, keeps the request URL short
+
+
+class StreamedEmailParser:
+    """
+    Incrementally splits a streamed "Subject: ...\n\nbody" reply into
+    subject and body deltas as chunks arrive
+    """
+    
+    SUBJECT_PREFIX = "subject:"
+    
+    def __init__(self):
+        self.field = "subject"
+        self.prefix_checked = False
+        self.pending = ""
+        self.subject = ""
+        self.body = ""
+    
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk and return (field, delta) pairs ready to send"""
+        self.pending += chunk
+        deltas = []
+        
+        if self.field == "subject":
+            if not self.prefix_checked:
+                head = self.pending.lstrip()
+                if len(head) < len(self.SUBJECT_PREFIX) and "\n" not in head:
+                    return deltas  # Wait until the prefix can be recognized
+                if head.lower().startswith(self.SUBJECT_PREFIX):
+                    head = head[len(self.SUBJECT_PREFIX):].lstrip(" ")
+                self.pending = head
+                self.prefix_checked = True
+            
+            line, newline, rest = self.pending.partition("\n")
+            if line:
+                self.subject += line
+                deltas.append(("subject", line))
+            if not newline:
+                self.pending = ""
+                return deltas
+            self.field = "body"
+            self.pending = rest.lstrip("\r\n")
+            if not self.pending:
+                return deltas
+        
+        if self.field == "body":
+            if not self.body:
+                self.pending = self.pending.lstrip("\r\n")
+            if self.pending:
+                self.body += self.pending
+                deltas.append(("body", self.pending))
+            self.pending = ""
+        
+        return deltas
+    
+    def result(self) -> dict:
+        """Final subject and body"""
+        return {"subject": self.subject.strip(), "body": self.body.strip()}
+
 
 class EmailManagementService:
     """Service for managing AI-generated emails workflow"""
     
+    # Fixed permutations so stored signatures stay comparable across processes
+    _hasher = MinHasher()
+    
     def __init__(self):
         self.supabase = get_supabase_client()
         self.ai_service = AIService()
+        self.batch_backend = get_batch_backend()
     
     async def generate_email(
         self,
@@ -37,21 +109,7 @@ class EmailManagementService:
             logger.info(f"Generating email for {company_name} for user {user_id}")
             
             # Get user context and resume
-            context_response = self.supabase.table("context_profiles")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .single()\
-                .execute()
-            
-            resume_response = self.supabase.table("resumes")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .order("created_at", desc=True)\
-                .limit(1)\
-                .execute()
-            
-            user_context = context_response.data if context_response.data else {}
-            resume_data = resume_response.data[0] if resume_response.data else {}
+            user_context, resume_data = await self._load_generation_context(user_id)
             
             # Generate email with AI
             email_content = await self.ai_service.generate_email(
@@ -62,28 +120,23 @@ class EmailManagementService:
             )
             
             # Store in database
-            email_data = {
-                "user_id": user_id,
-                "recipient_email": "",  # Will be filled later
-                "recipient_name": "",
-                "subject": email_content.get("subject", ""),
-                "content": email_content.get("body", ""),
-                "company_name": company_name,
-                "company_website": company_website,
-                "company_location": company_location,
-                "position_title": position_title,
-                "keywords": keywords or [],
-                "job_type": job_type,
-                "salary_range": salary_range,
-                "status": "new",
-                "ai_model": "gemini-pro",
-                "generation_metadata": {
-                    "custom_prompt": custom_prompt,
-                    "generated_at": datetime.utcnow().isoformat()
-                }
-            }
+            email_data = self._build_email_record(
+                user_id=user_id,
+                email_content=email_content,
+                company_name=company_name,
+                company_website=company_website,
+                company_location=company_location,
+                position_title=position_title,
+                job_type=job_type,
+                salary_range=salary_range,
+                keywords=keywords,
+                custom_prompt=custom_prompt
+            )
             
-            result = self.supabase.table("ai_emails")\
+            # Flag drafts nearly identical to one the user already has
+            await self._flag_near_duplicates(user_id, [email_data])
+            
+            result = await self.supabase.table("ai_emails")\
                 .insert(email_data)\
                 .execute()
             
@@ -98,7 +151,7 @@ class EmailManagementService:
             )
             
             return result.data[0]
-            
+        
         except Exception as e:
             logger.error(f"Email generation error: {e}", exc_info=True)
             await self._log_activity(
@@ -109,6 +162,564 @@ class EmailManagementService:
             )
             raise
     
+    async def generate_email_variants(
+        self,
+        user_id: str,
+        company_name: str,
+        company_website: Optional[str],
+        company_location: Optional[str],
+        position_title: Optional[str],
+        job_type: Optional[str],
+        salary_range: Optional[str],
+        keywords: Optional[List[str]],
+        custom_prompt: Optional[str] = None,
+        variants: int = 3
+    ) -> List[dict]:
+        """
+        Generate several alternative emails for one company with a single LLM call
+        Variants are stored as sibling rows sharing a variant_group id
+        """
+        try:
+            variants = max(1, min(variants, settings.EMAIL_MAX_VARIANTS))
+            logger.info(f"Generating {variants} email variants for {company_name} for user {user_id}")
+            
+            # Get user context and resume
+            user_context, resume_data = await self._load_generation_context(user_id)
+            
+            # Generate all variants in one AI call
+            variant_contents = await self.ai_service.generate_email_variants(
+                company_name=company_name,
+                company_description=custom_prompt or f"Company: {company_name}",
+                user_context=user_context,
+                resume_data=resume_data,
+                count=variants
+            )
+            
+            # Store variants as sibling rows
+            variant_group = str(uuid.uuid4())
+            records = []
+            for index, email_content in enumerate(variant_contents):
+                record = self._build_email_record(
+                    user_id=user_id,
+                    email_content=email_content,
+                    company_name=company_name,
+                    company_website=company_website,
+                    company_location=company_location,
+                    position_title=position_title,
+                    job_type=job_type,
+                    salary_range=salary_range,
+                    keywords=keywords,
+                    custom_prompt=custom_prompt
+                )
+                record["generation_metadata"]["variant_group"] = variant_group
+                record["generation_metadata"]["variant_index"] = index
+                records.append(record)
+            
+            await self._flag_near_duplicates(user_id, records)
+            
+            result = await self.supabase.table("ai_emails")\
+                .insert(records)\
+                .execute()
+            
+            # Log activity
+            await self._log_activity(
+                user_id=user_id,
+                level="success",
+                action="email_variants_generated",
+                message=f"Generated {len(result.data)} email variants for {company_name}"
+            )
+            
+            return result.data
+        
+        except Exception as e:
+            logger.error(f"Email variants generation error: {e}", exc_info=True)
+            await self._log_activity(
+                user_id=user_id,
+                level="error",
+                action="email_generation_failed",
+                message=f"Failed to generate email variants: {str(e)}"
+            )
+            raise
+    
+    async def generate_email_stream(
+        self,
+        user_id: str,
+        company_name: str,
+        company_website: Optional[str],
+        company_location: Optional[str],
+        position_title: Optional[str],
+        job_type: Optional[str],
+        salary_range: Optional[str],
+        keywords: Optional[List[str]],
+        custom_prompt: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Generate a personalized email, yielding subject/body deltas as they arrive
+        The ai_emails row is stored once the stream completes
+        Yields events: subject, body, done (stored email) or error
+        """
+        try:
+            logger.info(f"Streaming email for {company_name} for user {user_id}")
+            
+            # Get user context and resume
+            user_context, resume_data = await self._load_generation_context(user_id)
+            
+            # Stream email from AI
+            parser = StreamedEmailParser()
+            async for chunk in self.ai_service.generate_email_stream(
+                company_name=company_name,
+                company_description=custom_prompt or f"Company: {company_name}",
+                user_context=user_context,
+                resume_data=resume_data
+            ):
+                for field, delta in parser.feed(chunk):
+                    yield {"event": field, "data": delta}
+            
+            email_content = parser.result()
+            if not email_content["body"]:
+                raise ValueError("AI returned an empty email")
+            
+            # Store in database
+            email_data = self._build_email_record(
+                user_id=user_id,
+                email_content=email_content,
+                company_name=company_name,
+                company_website=company_website,
+                company_location=company_location,
+                position_title=position_title,
+                job_type=job_type,
+                salary_range=salary_range,
+                keywords=keywords,
+                custom_prompt=custom_prompt
+            )
+            
+            # Flag drafts nearly identical to one the user already has
+            await self._flag_near_duplicates(user_id, [email_data])
+            
+            result = await self.supabase.table("ai_emails")\
+                .insert(email_data)\
+                .execute()
+            
+            # Log activity
+            await self._log_activity(
+                user_id=user_id,
+                level="success",
+                action="email_generated",
+                message=f"Generated email for {company_name}",
+                related_entity_type="email",
+                related_entity_id=result.data[0]["id"]
+            )
+            
+            yield {"event": "done", "data": result.data[0]}
+        
+        except Exception as e:
+            logger.error(f"Email stream generation error: {e}", exc_info=True)
+            await self._log_activity(
+                user_id=user_id,
+                level="error",
+                action="email_generation_failed",
+                message=f"Failed to generate email: {str(e)}"
+            )
+            yield {"event": "error", "data": str(e)}
+    
+    async def generate_emails_bulk(
+        self,
+        user_id: str,
+        companies: List[dict],
+        concurrency: Optional[int] = None
+    ) -> dict:
+        """
+        Generate emails for many companies at once
+        Loads context and resume once, runs generations with bounded concurrency
+        and stores all generated emails with a single bulk insert
+        """
+        try:
+            concurrency = max(1, min(
+                concurrency or settings.EMAIL_BULK_CONCURRENCY,
+                settings.EMAIL_BULK_MAX_CONCURRENCY
+            ))
+            logger.info(
+                f"Bulk generating {len(companies)} emails for user {user_id} "
+                f"(concurrency {concurrency})"
+            )
+            
+            # Get user context and resume once for the whole batch
+            user_context, resume_data = await self._load_generation_context(user_id)
+            
+            semaphore = asyncio.Semaphore(concurrency)
+            results: List[dict] = [None] * len(companies)
+            records: List[dict] = []
+            record_indexes: List[int] = []
+            completed = 0
+            
+            async def generate_one(index: int, company: dict):
+                nonlocal completed
+                company_name = company["company_name"]
+                async with semaphore:
+                    try:
+                        email_content = await self.ai_service.generate_email(
+                            company_name=company_name,
+                            company_description=company.get("custom_prompt") or f"Company: {company_name}",
+                            user_context=user_context,
+                            resume_data=resume_data,
+                            fallback_on_error=False,
+                            priority=PRIORITY_BATCH
+                        )
+                        records.append(self._build_email_record(
+                            user_id=user_id,
+                            email_content=email_content,
+                            company_name=company_name,
+                            company_website=company.get("company_website"),
+                            company_location=company.get("company_location"),
+                            position_title=company.get("position_title"),
+                            job_type=company.get("job_type"),
+                            salary_range=company.get("salary_range"),
+                            keywords=company.get("keywords"),
+                            custom_prompt=company.get("custom_prompt")
+                        ))
+                        record_indexes.append(index)
+                        results[index] = {
+                            "index": index,
+                            "company_name": company_name,
+                            "status": "generated"
+                        }
+                    except Exception as e:
+                        logger.warning(f"Bulk generation failed for {company_name}: {e}")
+                        results[index] = {
+                            "index": index,
+                            "company_name": company_name,
+                            "status": "failed",
+                            "error": str(e)
+                        }
+                
+                completed += 1
+                logger.info(
+                    f"Bulk generation progress: {completed}/{len(companies)} "
+                    f"({company_name}: {results[index]['status']})"
+                )
+            
+            await asyncio.gather(*(
+                generate_one(index, company) for index, company in enumerate(companies)
+            ))
+            
+            # Store all generated emails in one round-trip
+            emails = []
+            if records:
+                await self._flag_near_duplicates(user_id, records)
+                insert_result = await self.supabase.table("ai_emails")\
+                    .insert(records)\
+                    .execute()
+                emails = insert_result.data
+                
+                for index, email in zip(record_indexes, emails):
+                    results[index]["email_id"] = email["id"]
+            
+            succeeded = len(emails)
+            failed = len(companies) - succeeded
+            
+            # Log activity
+            await self._log_activity(
+                user_id=user_id,
+                level="success" if not failed else "warning",
+                action="emails_bulk_generated",
+                message=f"Generated {succeeded} of {len(companies)} emails"
+            )
+            
+            return {
+                "emails": emails,
+                "results": results,
+                "total": len(companies),
+                "succeeded": succeeded,
+                "failed": failed
+            }
+        
+        except Exception as e:
+            logger.error(f"Bulk email generation error: {e}", exc_info=True)
+            await self._log_activity(
+                user_id=user_id,
+                level="error",
+                action="email_generation_failed",
+                message=f"Failed to bulk generate emails: {str(e)}"
+            )
+            raise
+    
+    async def submit_emails_batch(self, user_id: str, companies: List[dict]) -> dict:
+        """
+        Submit email generation for many companies as one offline batch job
+        Cheaper than generate_emails_bulk and doesn't use interactive quota,
+        but results can take hours. The job is stored in email_batch_jobs and
+        collected by collect_emails_batch (status endpoint or background sweep)
+        """
+        try:
+            logger.info(f"Submitting batch generation of {len(companies)} emails for user {user_id}")
+            
+            # Get user context and resume once for the whole batch
+            user_context, resume_data = await self._load_generation_context(user_id)
+            
+            requests = [
+                self.ai_service.build_email_batch_request(
+                    company_name=company["company_name"],
+                    company_description=company.get("custom_prompt") or f"Company: {company['company_name']}",
+                    user_context=user_context,
+                    resume_data=resume_data
+                )
+                for company in companies
+            ]
+            
+            model = settings.GEMINI_MODEL_GENERATOR
+            job_name = await self.batch_backend.submit(
+                model=model,
+                requests=requests,
+                display_name=f"agentm-emails-{user_id}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+            )
+            
+            # Persist the job, so a restart doesn't lose it or its results
+            result = await self.supabase.table("email_batch_jobs")\
+                .insert({
+                    "user_id": user_id,
+                    "job_name": job_name,
+                    "model": model,
+                    "companies": companies,
+                    "total": len(companies),
+                    "status": "running"
+                })\
+                .execute()
+            
+            # Log activity
+            await self._log_activity(
+                user_id=user_id,
+                level="info",
+                action="emails_batch_submitted",
+                message=f"Submitted batch generation of {len(companies)} emails"
+            )
+            
+            return result.data[0]
+        
+        except Exception as e:
+            logger.error(f"Batch email submission error: {e}", exc_info=True)
+            raise
+    
+    async def get_emails_batch(self, user_id: str, batch_id: str) -> Optional[dict]:
+        """Get a user's batch job"""
+        try:
+            result = await self.supabase.table("email_batch_jobs")\
+                .select("*")\
+                .eq("id", batch_id)\
+                .eq("user_id", user_id)\
+                .execute()
+            
+            return result.data[0] if result.data else None
+        
+        except Exception as e:
+            logger.error(f"Get batch job error: {e}", exc_info=True)
+            raise
+    
+    async def collect_emails_batch(self, job: dict) -> dict:
+        """
+        Check a stored batch job once and store its emails if it has finished
+        Safe to call concurrently (status endpoint, sweeps on several workers):
+        only the caller that moves the job from 'running' to 'collecting'
+        inserts the emails
+        
+        Returns:
+            The job row as it is now
+        """
+        if job["status"] != "running":
+            return job
+        
+        job_name = job["job_name"]
+        try:
+            replies = await self.batch_backend.poll(job_name)
+        except BatchJobFailed as e:
+            return await self._fail_batch_job(job, str(e))
+        
+        if replies is None:
+            if self._batch_expired(job):
+                return await self._fail_batch_job(
+                    job,
+                    f"Batch job {job_name} did not finish within {settings.GEMINI_BATCH_MAX_WAIT:.0f}s"
+                )
+            return job
+        
+        if not await self._update_batch_job(job_name, {"status": "collecting"}, expected_status="running"):
+            logger.info(f"Batch job {job_name} is already being collected")
+            return await self.get_emails_batch(job["user_id"], job["id"]) or job
+        
+        try:
+            summary = await self._store_batch_replies(job["user_id"], job_name, job["companies"], replies)
+        except Exception:
+            # Back to running, so the next check retries
+            await self._update_batch_job(job_name, {"status": "running"}, expected_status="collecting")
+            raise
+        
+        completed = await self._update_batch_job(
+            job_name,
+            {
+                "status": "completed",
+                "results": summary["results"],
+                "succeeded": summary["succeeded"],
+                "failed": summary["failed"],
+                "completed_at": datetime.utcnow().isoformat()
+            },
+            expected_status="collecting"
+        )
+        return completed or {**job, **summary, "status": "completed"}
+    
+    async def sweep_emails_batches(self) -> int:
+        """
+        Collect every running batch job of all users
+        
+        Returns:
+            Number of jobs that completed or failed
+        """
+        try:
+            result = await self.supabase.table("email_batch_jobs")\
+                .select("*")\
+                .eq("status", "running")\
+                .execute()
+        except Exception as e:
+            logger.warning(f"Batch job sweep failed: {e}")
+            return 0
+        
+        finished = 0
+        for job in result.data or []:
+            try:
+                job = await self.collect_emails_batch(job)
+                finished += job["status"] in ("completed", "failed")
+            except Exception as e:
+                logger.warning(f"Collecting batch job {job['job_name']} failed: {e}")
+        return finished
+    
+    async def run_batch_sweep(self):
+        """Sweep batch jobs every GEMINI_BATCH_POLL_INTERVAL seconds until cancelled, starting at once"""
+        while True:
+            await self.sweep_emails_batches()
+            await asyncio.sleep(settings.GEMINI_BATCH_POLL_INTERVAL)
+    
+    async def _store_batch_replies(
+        self,
+        user_id: str,
+        job_name: str,
+        companies: List[dict],
+        replies: List[dict]
+    ) -> dict:
+        """
+        Helper to turn a finished batch job's replies into emails with one bulk insert
+        companies must be the list the job was submitted with (replies are in that order)
+        """
+        logger.info(f"Batch job {job_name} finished with {len(replies)} replies")
+        
+        results: List[dict] = []
+        records: List[dict] = []
+        record_indexes: List[int] = []
+        for index, company in enumerate(companies):
+            company_name = company["company_name"]
+            reply = replies[index] if index < len(replies) else {"text": None, "error": "Missing reply"}
+            try:
+                if reply["error"]:
+                    raise ValueError(reply["error"])
+                email_content = self.ai_service.parse_email_reply(reply["text"])
+            except Exception as e:
+                logger.warning(f"Batch generation failed for {company_name}: {e}")
+                results.append({
+                    "index": index,
+                    "company_name": company_name,
+                    "status": "failed",
+                    "error": str(e)
+                })
+                continue
+            
+            record = self._build_email_record(
+                user_id=user_id,
+                email_content=email_content,
+                company_name=company_name,
+                company_website=company.get("company_website"),
+                company_location=company.get("company_location"),
+                position_title=company.get("position_title"),
+                job_type=company.get("job_type"),
+                salary_range=company.get("salary_range"),
+                keywords=company.get("keywords"),
+                custom_prompt=company.get("custom_prompt")
+            )
+            record["generation_metadata"]["batch_job"] = job_name
+            records.append(record)
+            record_indexes.append(index)
+            results.append({
+                "index": index,
+                "company_name": company_name,
+                "status": "generated"
+            })
+        
+        # Store all generated emails in one round-trip
+        emails = []
+        if records:
+            await self._flag_near_duplicates(user_id, records)
+            insert_result = await self.supabase.table("ai_emails")\
+                .insert(records)\
+                .execute()
+            emails = insert_result.data
+            
+            for index, email in zip(record_indexes, emails):
+                results[index]["email_id"] = email["id"]
+        
+        succeeded = len(emails)
+        failed = len(companies) - succeeded
+        
+        # Log activity
+        await self._log_activity(
+            user_id=user_id,
+            level="success" if not failed else "warning",
+            action="emails_batch_generated",
+            message=f"Batch generated {succeeded} of {len(companies)} emails"
+        )
+        
+        return {
+            "emails": emails,
+            "results": results,
+            "total": len(companies),
+            "succeeded": succeeded,
+            "failed": failed
+        }
+    
+    async def _update_batch_job(self, job_name: str, data: dict, expected_status: str) -> Optional[dict]:
+        """
+        Helper to update a batch job only while it still has expected_status
+        Returns the updated row, or None if the status had changed
+        """
+        result = await self.supabase.table("email_batch_jobs")\
+            .update(data)\
+            .eq("job_name", job_name)\
+            .eq("status", expected_status)\
+            .execute()
+        
+        return result.data[0] if result.data else None
+    
+    async def _fail_batch_job(self, job: dict, error: str) -> dict:
+        """Helper to mark a batch job failed and log it"""
+        logger.error(f"Batch job {job['job_name']} failed: {error}")
+        failed = await self._update_batch_job(
+            job["job_name"],
+            {"status": "failed", "error": error, "completed_at": datetime.utcnow().isoformat()},
+            expected_status="running"
+        )
+        await self._log_activity(
+            user_id=job["user_id"],
+            level="error",
+            action="email_generation_failed",
+            message=f"Batch job {job['job_name']} failed: {error}"
+        )
+        return failed or {**job, "status": "failed", "error": error}
+    
+    @staticmethod
+    def _batch_expired(job: dict) -> bool:
+        """Helper to check whether a batch job has outlived GEMINI_BATCH_MAX_WAIT"""
+        if not job.get("created_at"):
+            return False
+        created_at = datetime.fromisoformat(job["created_at"])
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - created_at > timedelta(seconds=settings.GEMINI_BATCH_MAX_WAIT)
+    
     async def get_emails(
         self,
         user_id: str,
@@ -126,9 +737,9 @@ class EmailManagementService:
             if status:
                 query = query.eq("status", status)
             
-            result = query.execute()
+            result = await query.execute()
             return result.data
-            
+        
         except Exception as e:
             logger.error(f"Get emails error: {e}", exc_info=True)
             raise
@@ -138,7 +749,7 @@ class EmailManagementService:
         Get a specific email by ID
         """
         try:
-            result = self.supabase.table("ai_emails")\
+            result = await self.supabase.table("ai_emails")\
                 .select("*")\
                 .eq("id", email_id)\
                 .eq("user_id", user_id)\
@@ -146,7 +757,7 @@ class EmailManagementService:
                 .execute()
             
             return result.data
-            
+        
         except Exception as e:
             logger.error(f"Get email error: {e}", exc_info=True)
             raise
@@ -171,7 +782,7 @@ class EmailManagementService:
                 "reviewed_at": datetime.utcnow().isoformat() if status in ["approved", "rejected"] else None
             }
             
-            result = self.supabase.table("ai_emails")\
+            result = await self.supabase.table("ai_emails")\
                 .update(update_data)\
                 .eq("id", email_id)\
                 .eq("user_id", user_id)\
@@ -188,7 +799,7 @@ class EmailManagementService:
             )
             
             return result.data[0]
-            
+        
         except Exception as e:
             logger.error(f"Update email status error: {e}", exc_info=True)
             raise
@@ -212,12 +823,16 @@ class EmailManagementService:
                 update_data["subject"] = subject
             if content is not None:
                 update_data["content"] = content
+                # Re-fingerprint the edited body and refresh its duplicate flag
+                fingerprint = {"id": email_id, "content": content}
+                await self._flag_near_duplicates(user_id, [fingerprint])
+                update_data.update({field: fingerprint[field] for field in DUPLICATE_FIELDS})
             if recipient_email is not None:
                 update_data["recipient_email"] = recipient_email
             if recipient_name is not None:
                 update_data["recipient_name"] = recipient_name
             
-            result = self.supabase.table("ai_emails")\
+            result = await self.supabase.table("ai_emails")\
                 .update(update_data)\
                 .eq("id", email_id)\
                 .eq("user_id", user_id)\
@@ -234,7 +849,7 @@ class EmailManagementService:
             )
             
             return result.data[0]
-            
+        
         except Exception as e:
             logger.error(f"Update email content error: {e}", exc_info=True)
             raise
@@ -244,7 +859,7 @@ class EmailManagementService:
         Delete an email
         """
         try:
-            self.supabase.table("ai_emails")\
+            await self.supabase.table("ai_emails")\
                 .delete()\
                 .eq("id", email_id)\
                 .eq("user_id", user_id)\
@@ -261,7 +876,7 @@ class EmailManagementService:
             )
             
             return True
-            
+        
         except Exception as e:
             logger.error(f"Delete email error: {e}", exc_info=True)
             raise
@@ -269,25 +884,88 @@ class EmailManagementService:
     async def get_chat_history(
         self,
         user_id: str,
-        email_id: str
+        email_id: str,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        after: Optional[str] = None
     ) -> List[dict]:
         """
-        Get chat history for an email
+        Get chat history for an email, oldest first
+        
+        Args:
+            limit: Only the newest `limit` messages (all when None)
+            offset: Skip this many of the newest messages (for paging back)
+            after: Only messages created after this timestamp
         """
         try:
-            result = self.supabase.table("email_chat_history")\
+            # Newest first so limit/offset page back from the latest turn; both
+            # messages of a turn share created_at, and the reply is the newer one
+            query = self.supabase.table("email_chat_history")\
                 .select("*")\
                 .eq("email_id", email_id)\
                 .eq("user_id", user_id)\
-                .order("created_at", desc=False)\
-                .execute()
+                .order("created_at", desc=True)\
+                .order("role", desc=False)
             
-            return result.data
+            if after:
+                query = query.gt("created_at", after)
+            if limit is not None:
+                query = query.range(offset, offset + limit - 1)
             
+            result = await query.execute()
+            
+            return list(reversed(result.data or []))
+        
         except Exception as e:
             logger.error(f"Get chat history error: {e}", exc_info=True)
             raise
     
+    async def get_chat_tail(self, user_id: str, email_id: str) -> List[dict]:
+        """
+        Get the newest chat messages that can still be quoted verbatim in a prompt
+        Older messages are covered by the email's running chat summary
+        """
+        return await self.get_chat_history(
+            user_id=user_id,
+            email_id=email_id,
+            limit=settings.CHAT_RECENT_MESSAGES + 2 * settings.CHAT_SUMMARY_EVERY_TURNS
+        )
+    
+    async def save_chat_summary(
+        self,
+        user_id: str,
+        email_id: str,
+        summary: str,
+        summarized_until: str,
+        message_count: int,
+        expected_count: int
+    ) -> bool:
+        """
+        Store the running chat summary of an email
+        Only applies if no other compaction has stored one since it was read
+        (chat_summary_message_count still equals expected_count)
+        
+        Returns:
+            Whether the summary was stored
+        """
+        try:
+            result = await self.supabase.table("ai_emails")\
+                .update({
+                    "chat_summary": summary,
+                    "chat_summary_until": summarized_until,
+                    "chat_summary_message_count": message_count
+                })\
+                .eq("id", email_id)\
+                .eq("user_id", user_id)\
+                .eq("chat_summary_message_count", expected_count)\
+                .execute()
+            
+            return bool(result.data)
+        
+        except Exception as e:
+            logger.error(f"Save chat summary error: {e}", exc_info=True)
+            raise
+    
     async def save_chat_message(
         self,
         user_id: str,
@@ -307,16 +985,257 @@ class EmailManagementService:
                 "ai_model": "gemini-pro" if role == "assistant" else None
             }
             
-            result = self.supabase.table("email_chat_history")\
+            result = await self.supabase.table("email_chat_history")\
                 .insert(chat_data)\
                 .execute()
             
             return result.data[0]
-            
+        
         except Exception as e:
             logger.error(f"Save chat message error: {e}", exc_info=True)
             raise
     
+    async def save_chat_messages(
+        self,
+        user_id: str,
+        email_id: str,
+        messages: List[Tuple[str, str]]
+    ) -> List[dict]:
+        """
+        Save several chat messages (role, message) in one insert
+        """
+        try:
+            chat_data = [
+                {
+                    "email_id": email_id,
+                    "user_id": user_id,
+                    "role": role,
+                    "message": message,
+                    "ai_model": "gemini-pro" if role == "assistant" else None
+                }
+                for role, message in messages
+            ]
+            
+            result = await self.supabase.table("email_chat_history")\
+                .insert(chat_data)\
+                .execute()
+            
+            return result.data
+        
+        except Exception as e:
+            logger.error(f"Save chat messages error: {e}", exc_info=True)
+            raise
+    
+    async def cluster_similar_emails(
+        self,
+        user_id: str,
+        threshold: Optional[float] = None,
+        status: Optional[str] = None
+    ) -> dict:
+        """
+        Group the user's drafts into clusters of near-duplicates
+        Pairs come from an LSH index over stored MinHash signatures, so only
+        similar drafts are compared rather than every pair
+        """
+        try:
+            threshold = settings.EMAIL_DUPLICATE_THRESHOLD if threshold is None else threshold
+            rows = await self._load_email_fingerprints(user_id, status)
+            
+            index = LSHIndex(bands=settings.EMAIL_DUPLICATE_LSH_BANDS)
+            parent = {row["id"]: row["id"] for row in rows}
+            
+            def find(email_id: str) -> str:
+                while parent[email_id] != email_id:
+                    parent[email_id] = parent[parent[email_id]]
+                    email_id = parent[email_id]
+                return email_id
+            
+            links = []
+            for row in rows:
+                signature = tuple(row["content_minhash"])
+                for other_id, score in index.query(signature, threshold):
+                    parent[find(other_id)] = find(row["id"])
+                    links.append((row["id"], score))
+                index.add(row["id"], signature)
+            
+            # Weakest link that holds each cluster together
+            pair_scores: Dict[str, float] = {}
+            for email_id, score in links:
+                root = find(email_id)
+                pair_scores[root] = min(score, pair_scores.get(root, 1.0))
+            
+            groups: Dict[str, List[dict]] = {}
+            for row in rows:
+                groups.setdefault(find(row["id"]), []).append({
+                    "id": row["id"],
+                    "company_name": row.get("company_name"),
+                    "subject": row.get("subject") or "",
+                    "status": row.get("status") or "new"
+                })
+            
+            clusters = [
+                {"emails": members, "min_similarity": round(pair_scores.get(root, 1.0), 3)}
+                for root, members in groups.items()
+                if len(members) > 1
+            ]
+            clusters.sort(key=lambda cluster: len(cluster["emails"]), reverse=True)
+            
+            return {
+                "clusters": clusters,
+                "total_emails": len(rows),
+                "clustered_emails": sum(len(cluster["emails"]) for cluster in clusters),
+                "threshold": threshold
+            }
+        
+        except Exception as e:
+            logger.error(f"Cluster emails error: {e}", exc_info=True)
+            raise
+    
+    async def _load_email_fingerprints(self, user_id: str, status: Optional[str]) -> List[dict]:
+        """
+        Helper to page through the user's drafts with their MinHash signatures
+        Drafts stored before fingerprinting existed are fingerprinted from their content
+        """
+        rows: List[dict] = []
+        start = 0
+        while True:
+            query = self.supabase.table("ai_emails")\
+                .select("id, company_name, subject, status, content_minhash")\
+                .eq("user_id", user_id)\
+                .order("created_at", desc=True)\
+                .range(start, start + FINGERPRINT_PAGE_SIZE - 1)
+            
+            if status:
+                query = query.eq("status", status)
+            
+            page = (await query.execute()).data or []
+            rows.extend(page)
+            if len(page) < FINGERPRINT_PAGE_SIZE:
+                break
+            start += FINGERPRINT_PAGE_SIZE
+        
+        missing = [row for row in rows if not row.get("content_minhash")]
+        for offset in range(0, len(missing), FINGERPRINT_ID_CHUNK):
+            chunk = {row["id"]: row for row in missing[offset:offset + FINGERPRINT_ID_CHUNK]}
+            contents = await self.supabase.table("ai_emails")\
+                .select("id, content")\
+                .eq("user_id", user_id)\
+                .in_("id", list(chunk))\
+                .execute()
+            for item in contents.data or []:
+                chunk[item["id"]]["content_minhash"] = self._fingerprint(item["content"])["content_minhash"]
+        
+        return [row for row in rows if row.get("content_minhash")]
+    
+    def _fingerprint(self, content: str) -> dict:
+        """
+        Helper to compute the MinHash signature and LSH band keys of an email body
+        """
+        signature = self._hasher.signature(content or "")
+        return {
+            "content_minhash": list(signature),
+            "content_bands": band_keys(signature, settings.EMAIL_DUPLICATE_LSH_BANDS)
+        }
+    
+    async def _flag_near_duplicates(self, user_id: str, records: List[dict]):
+        """
+        Helper to fingerprint ai_emails rows before they are written and flag
+        those nearly identical to an existing draft or an earlier row in the batch
+        Sets id (if missing), content_minhash, content_bands, duplicate_of and
+        duplicate_similarity on each record
+        """
+        index = LSHIndex(bands=settings.EMAIL_DUPLICATE_LSH_BANDS)
+        for record in records:
+            record.setdefault("id", str(uuid.uuid4()))
+            record.update(self._fingerprint(record["content"]))
+        
+        try:
+            # Only drafts sharing an LSH band with a new row are fetched (GIN index)
+            response = await self.supabase.rpc("find_email_duplicate_candidates", {
+                "p_user_id": user_id,
+                "p_bands": sorted({band for record in records for band in record["content_bands"]}),
+                "p_limit": settings.EMAIL_DUPLICATE_MAX_CANDIDATES
+            }).execute()
+            for row in response.data or []:
+                if row.get("content_minhash"):
+                    index.add(row["id"], tuple(row["content_minhash"]))
+        except Exception as e:
+            logger.warning(f"Near-duplicate lookup failed, checking within batch only: {e}")
+        
+        for record in records:
+            signature = tuple(record["content_minhash"])
+            matches = [
+                (email_id, score)
+                for email_id, score in index.query(signature, settings.EMAIL_DUPLICATE_THRESHOLD)
+                if email_id != record["id"]
+            ]
+            record["duplicate_of"] = matches[0][0] if matches else None
+            record["duplicate_similarity"] = round(matches[0][1], 3) if matches else None
+            if matches:
+                logger.info(f"Draft for {record.get('company_name')} is a near-duplicate of {matches[0][0]}")
+            index.add(record["id"], signature)
+    
+    async def _load_generation_context(self, user_id: str) -> Tuple[dict, dict]:
+        """
+        Helper to fetch the user's context profile and latest resume
+        """
+        # Both queries share the HTTP/2 pool, so they run concurrently
+        context_response, resume_response = await asyncio.gather(
+            self.supabase.table("context_profiles")\
+                .select("*")\
+                .eq("user_id", user_id)\
+                .single()\
+                .execute(),
+            self.supabase.table("resumes")\
+                .select("*")\
+                .eq("user_id", user_id)\
+                .order("created_at", desc=True)\
+                .limit(1)\
+                .execute()
+        )
+        
+        user_context = context_response.data if context_response.data else {}
+        resume_data = resume_response.data[0] if resume_response.data else {}
+        
+        return user_context, resume_data
+    
+    def _build_email_record(
+        self,
+        user_id: str,
+        email_content: dict,
+        company_name: str,
+        company_website: Optional[str],
+        company_location: Optional[str],
+        position_title: Optional[str],
+        job_type: Optional[str],
+        salary_range: Optional[str],
+        keywords: Optional[List[str]],
+        custom_prompt: Optional[str] = None
+    ) -> dict:
+        """
+        Helper to build an ai_emails row from generated content
+        """
+        return {
+            "user_id": user_id,
+            "recipient_email": "",  # Will be filled later
+            "recipient_name": "",
+            "subject": email_content.get("subject", ""),
+            "content": email_content.get("body", ""),
+            "company_name": company_name,
+            "company_website": company_website,
+            "company_location": company_location,
+            "position_title": position_title,
+            "keywords": keywords or [],
+            "job_type": job_type,
+            "salary_range": salary_range,
+            "status": "new",
+            "ai_model": "gemini-pro",
+            "generation_metadata": {
+                "custom_prompt": custom_prompt,
+                "generated_at": datetime.utcnow().isoformat()
+            }
+        }
+    
     async def _log_activity(
         self,
         user_id: str,
@@ -339,10 +1258,10 @@ class EmailManagementService:
                 "related_entity_id": related_entity_id
             }
             
-            self.supabase.table("activity_logs")\
+            await self.supabase.table("activity_logs")\
                 .insert(log_data)\
                 .execute()
-            
+        
         except Exception as e:
             logger.error(f"Activity logging error: {e}", exc_info=True)
             # Don't raise - logging should not break main flow
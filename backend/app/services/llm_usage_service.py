@@ -0,0 +1,92 @@
+"""
+LLM Usage Service - per-user daily totals of LLM calls, tokens and cost
+Calls are summed in memory and flushed periodically to llm_usage_daily
+"""
+
+from app.core.config import settings
+from app.core.llm_metrics import OUTCOME_OK, LLMCall
+from app.database.supabase_client import get_supabase_client
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = (
+    "calls",
+    "failed_calls",
+    "retries",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "cost_usd",
+    "latency_seconds",
+)
+
+
+class LLMUsageService:
+    """Service for buffered per-user LLM usage totals"""
+    
+    # Pending increments per (user_id, date, operation, model), shared across requests in this worker
+    _pending: Dict[Tuple[str, str, str, str], Dict[str, float]] = {}
+    
+    def __init__(self):
+        self.supabase = get_supabase_client()
+    
+    @classmethod
+    def add(cls, call: LLMCall):
+        """Add a call to its user's daily totals (calls without a user are skipped)"""
+        if not call.user_id:
+            return
+        
+        day = datetime.now(timezone.utc).date().isoformat()
+        key = (call.user_id, day, call.operation, call.model)
+        totals = cls._pending.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        totals["calls"] += 1
+        totals["failed_calls"] += call.outcome != OUTCOME_OK
+        totals["retries"] += call.retries
+        totals["prompt_tokens"] += call.prompt_tokens
+        totals["completion_tokens"] += call.completion_tokens
+        totals["cached_tokens"] += call.cached_tokens
+        totals["cost_usd"] += call.cost
+        totals["latency_seconds"] += call.latency
+    
+    async def flush(self) -> int:
+        """
+        Write pending totals as increments, one row per user/day/operation/model
+        Returns the number of rows written; on failure they are kept for the next flush
+        """
+        pending = LLMUsageService._pending
+        if not pending:
+            return 0
+        LLMUsageService._pending = {}
+        
+        rows = [
+            {
+                "user_id": user_id,
+                "usage_date": day,
+                "operation": operation,
+                "model": model,
+                **totals
+            }
+            for (user_id, day, operation, model), totals in pending.items()
+        ]
+        
+        try:
+            await self.supabase.rpc("record_llm_usage", {"p_rows": rows}).execute()
+            return len(rows)
+            
+        except Exception as e:
+            logger.warning(f"LLM usage flush failed, retrying next interval: {e}")
+            for key, totals in pending.items():
+                current = LLMUsageService._pending.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))
+                for field, value in totals.items():
+                    current[field] += value
+            return 0
+    
+    async def run(self):
+        """Flush every LLM_USAGE_FLUSH_INTERVAL seconds until cancelled"""
+        while True:
+            await asyncio.sleep(settings.LLM_USAGE_FLUSH_INTERVAL)
+            await self.flush()
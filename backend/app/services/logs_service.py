@@ -38,7 +38,7 @@ class LogsService:
             if action:
                 query = query.eq("action", action)
             
-            result = query.execute()
+            result = await query.execute()
             return result.data
             
         except Exception as e:
@@ -69,7 +69,7 @@ class LogsService:
                 "related_entity_id": related_entity_id
             }
             
-            result = self.supabase.table("activity_logs")\
+            result = await self.supabase.table("activity_logs")\
                 .insert(log_data)\
                 .execute()
             
@@ -93,7 +93,7 @@ class LogsService:
             
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
-            result = self.supabase.table("activity_logs")\
+            result = await self.supabase.table("activity_logs")\
                 .delete()\
                 .eq("user_id", user_id)\
                 .lt("created_at", cutoff_date.isoformat())\
@@ -111,7 +111,7 @@ class LogsService:
         """
         try:
             # Get all logs for user
-            result = self.supabase.table("activity_logs")\
+            result = await self.supabase.table("activity_logs")\
                 .select("level, action")\
                 .eq("user_id", user_id)\
                 .execute()
@@ -0,0 +1,77 @@
+"""
+Parse Cache Service - content-addressed cache for resume parsing results
+In-process LRU in front of the resume_parse_cache table
+"""
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.database.supabase_client import get_supabase_client
+from typing import Optional
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCacheService:
+    """Service for cached resume parse results"""
+    
+    # Shared across requests in this worker
+    _memory = LRUCache(maxsize=settings.RESUME_PARSE_CACHE_SIZE)
+    
+    def __init__(self):
+        self.supabase = get_supabase_client()
+    
+    @staticmethod
+    def make_key(resume_text: str, model: str, prompt_version: str) -> str:
+        """
+        Build the cache key from the extracted text, model and prompt version
+        Bumping the prompt version changes every key, so old entries are never served
+        """
+        digest = hashlib.sha256()
+        for part in (prompt_version, model, resume_text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+    
+    async def get(self, cache_key: str) -> Optional[dict]:
+        """Get cached parsed data, checking memory first and then the database"""
+        cached = self._memory.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self.supabase.table("resume_parse_cache")\
+                .select("parsed_data")\
+                .eq("cache_key", cache_key)\
+                .limit(1)\
+                .execute()
+            
+            if not response.data:
+                return None
+            
+            parsed_data = response.data[0]["parsed_data"]
+            self._memory.set(cache_key, parsed_data)
+            return parsed_data
+            
+        except Exception as e:
+            logger.warning(f"Parse cache lookup failed: {e}")
+            return None
+    
+    async def set(self, cache_key: str, model: str, prompt_version: str, parsed_data: dict):
+        """Store parsed data in memory and in the database"""
+        self._memory.set(cache_key, parsed_data)
+        
+        try:
+            await self.supabase.table("resume_parse_cache")\
+                .upsert({
+                    "cache_key": cache_key,
+                    "model": model,
+                    "prompt_version": prompt_version,
+                    "parsed_data": parsed_data
+                }, on_conflict="cache_key")\
+                .execute()
+            
+        except Exception as e:
+            logger.warning(f"Parse cache write failed: {e}")
+            # Don't raise - caching should not break parsing
@@ -4,11 +4,14 @@ Resume service - handles resume upload, storage, and retrieval
 
 from fastapi import UploadFile
 from app.database.supabase_client import get_supabase
+from app.models.schemas import ParsedResumeData
+from app.services.ai_service import AIService
 import PyPDF2
 import docx
 import io
 import logging
 from datetime import datetime
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +31,7 @@ class ResumeService:
             content = await file.read()
             
             # Check if resume already exists for user
-            existing = self.supabase.table("resumes").select("id").eq("user_id", user_id).execute()
+            existing = await self.supabase.table("resumes").select("id").eq("user_id", user_id).execute()
             if existing.data:
                 logger.info(f"User {user_id} already has a resume. Uploading new version.")
             
@@ -38,7 +41,7 @@ class ResumeService:
             file_path = f"{user_id}/resume_{user_id}.{ext}"
             
             # Upload to Supabase storage (upsert=True to overwrite)
-            storage_response = self.supabase.storage.from_("resumes").upload(
+            storage_response = await self.supabase.storage.from_("resumes").upload(
                 file_path,
                 content,
                 {"content-type": file.content_type, "upsert": "true"}
@@ -58,7 +61,7 @@ class ResumeService:
                 "is_parse_completed": False   # Parse not done yet
             }
             
-            db_response = self.supabase.table("resumes").insert(resume_data).execute()
+            db_response = await self.supabase.table("resumes").insert(resume_data).execute()
             resume_record = db_response.data[0]
             
             return {
@@ -77,7 +80,7 @@ class ResumeService:
     async def get_resume_text(self, resume_id: str, user_id: str) -> str:
         """Get extracted text from resume"""
         try:
-            response = self.supabase.table("resumes")\
+            response = await self.supabase.table("resumes")\
                 .select("extracted_text")\
                 .eq("id", resume_id)\
                 .eq("user_id", user_id)\
@@ -92,8 +95,18 @@ class ResumeService:
             logger.error(f"Get resume text error: {e}", exc_info=True)
             raise
     
-    async def save_parsed_data(self, resume_id: str, user_id: str, parsed_data: any):
-        """Save parsed resume data to database and mark parse as completed"""
+    async def save_parsed_data(
+        self,
+        resume_id: str,
+        user_id: str,
+        parsed_data: any,
+        context_suggestions: Optional[dict] = None
+    ):
+        """
+        Save parsed resume data to database and mark parse as completed
+        Context suggestions from the same parse are stored alongside; None clears
+        suggestions left over from an earlier parse
+        """
         try:
             # Convert Pydantic model to dict if needed
             if hasattr(parsed_data, "model_dump"):
@@ -104,9 +117,10 @@ class ResumeService:
                 data_to_save = parsed_data
 
             # Update both parsed_data and completion status
-            self.supabase.table("resumes")\
+            await self.supabase.table("resumes")\
                 .update({
                     "parsed_data": data_to_save,
+                    "context_suggestions": context_suggestions,
                     "is_parse_completed": True  # Mark parse as completed
                 })\
                 .eq("id", resume_id)\
@@ -119,11 +133,36 @@ class ResumeService:
             logger.error(f"Save parsed data error: {e}", exc_info=True)
             raise
     
+    async def save_context_suggestions(self, resume_id: str, user_id: str, context_suggestions: dict):
+        """Store context suggestions generated for a parsed resume"""
+        try:
+            await self.supabase.table("resumes")\
+                .update({"context_suggestions": context_suggestions})\
+                .eq("id", resume_id)\
+                .eq("user_id", user_id)\
+                .execute()
+            
+        except Exception as e:
+            logger.error(f"Save context suggestions error: {e}", exc_info=True)
+            raise
+    
+    async def refresh_context_suggestions(self, resume_id: str, user_id: str, parsed_data: ParsedResumeData) -> dict:
+        """
+        Generate context suggestions for a parsed resume and store them on its row
+        Used when the parse did not produce them in the same LLM call
+        """
+        suggestions = await AIService().generate_context_suggestions(parsed_data)
+        try:
+            await self.save_context_suggestions(resume_id, user_id, suggestions)
+        except Exception as e:
+            logger.warning(f"Failed to store context suggestions for resume {resume_id}: {e}")
+        return suggestions
+    
     async def get_current_resume(self, user_id: str) -> dict:
         """Get current resume for user"""
         try:
             # Get latest resume for user
-            response = self.supabase.table("resumes")\
+            response = await self.supabase.table("resumes")\
                 .select("*")\
                 .eq("user_id", user_id)\
                 .order("created_at", desc=True)\
@@ -142,7 +181,7 @@ class ResumeService:
     async def get_resume(self, resume_id: str, user_id: str) -> dict:
         """Get resume details"""
         try:
-            response = self.supabase.table("resumes")\
+            response = await self.supabase.table("resumes")\
                 .select("*")\
                 .eq("id", resume_id)\
                 .eq("user_id", user_id)\
@@ -166,7 +205,7 @@ class ResumeService:
             original_name = resume["file_name"]
             
             # Download from Storage
-            response = self.supabase.storage.from_("resumes").download(file_path)
+            response = await self.supabase.storage.from_("resumes").download(file_path)
             
             # Determine mime type
             mime_type = "application/pdf"
@@ -189,7 +228,7 @@ class ResumeService:
             file_path = resume["file_path"]
             
             # Download from Storage
-            response = self.supabase.storage.from_("resumes").download(file_path)
+            response = await self.supabase.storage.from_("resumes").download(file_path)
             
             # Determine mime type (basic check based on extension)
             mime_type = "application/pdf"
@@ -228,7 +267,8 @@ class ResumeService:
             
             text = ""
             for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+                # Form feed between pages, so page headers/footers can be recognized
+                text += page.extract_text() + "\n\f\n"
             
             return text.strip()
         except Exception as e:
@@ -0,0 +1,105 @@
+"""
+Rewrite Cache Service - reuse quick-action rewrites of the same email
+In-process LRU keyed by normalized subject/body hash plus a scope (user, email,
+action, model and prompt template), with MinHash near-matching for near-identical
+versions of the same email
+"""
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.modules.ai_engine.minhash import LSHIndex, MinHasher
+from app.modules.ai_engine.token_budget import normalize_whitespace
+from typing import Dict, Optional
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RewriteCacheService:
+    """Service for cached quick-action rewrites"""
+    
+    # Shared across requests in this worker; one LSH index per scope
+    _indexes: Dict[str, LSHIndex] = {}
+    _hasher = MinHasher()
+    _entries = LRUCache(
+        maxsize=settings.QUICK_ACTION_CACHE_SIZE,
+        on_evict=lambda key, entry: RewriteCacheService._forget(key, entry)
+    )
+    
+    @staticmethod
+    def make_scope(user_id: str, email_id: str, action: str, model: str, template: str) -> str:
+        """
+        Scope of a rewrite: the owning user and email, the action, the model and
+        the full prompt template
+        Rewrites are never shared across users or emails, even on a near match;
+        editing a template changes the scope, so rewrites from the old prompt are never served
+        """
+        digest = hashlib.sha256()
+        for part in (user_id, email_id, action, model, template):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()[:32]
+    
+    @staticmethod
+    def make_key(scope: str, subject: str, body: str) -> str:
+        """Exact-match key; whitespace-only differences map to the same key"""
+        digest = hashlib.sha256()
+        for part in (scope, normalize_whitespace(subject or ""), normalize_whitespace(body or "")):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+    
+    @classmethod
+    def _forget(cls, key: str, entry: dict):
+        index = cls._indexes.get(entry["scope"])
+        if index is not None:
+            index.remove(key)
+            if not len(index):
+                del cls._indexes[entry["scope"]]
+    
+    def get(self, scope: str, subject: str, body: str, near: bool = True) -> Optional[dict]:
+        """
+        Cached rewrite of an email, or None
+        
+        Args:
+            scope: Scope from make_scope
+            subject: Current subject
+            body: Current body
+            near: Also accept a near-identical email (MinHash similarity of at
+                least QUICK_ACTION_CACHE_SIMILARITY)
+        """
+        entry = self._entries.get(self.make_key(scope, subject, body))
+        if entry is not None:
+            return dict(entry["result"])
+        
+        index = self._indexes.get(scope)
+        if not near or index is None or settings.QUICK_ACTION_CACHE_SIMILARITY > 1:
+            return None
+        
+        matches = index.query(
+            self._hasher.signature(f"{subject}\n{body}"),
+            threshold=settings.QUICK_ACTION_CACHE_SIMILARITY
+        )
+        if not matches:
+            return None
+        
+        key, score = matches[0]
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        logger.info(f"Quick action cache near match (similarity {score:.2f})")
+        return dict(entry["result"])
+    
+    def set(self, scope: str, subject: str, body: str, result: dict):
+        """Store the rewrite of an email"""
+        key = self.make_key(scope, subject, body)
+        self._entries.set(key, {"scope": scope, "result": dict(result)})
+        if key in self._entries:
+            self._indexes.setdefault(scope, LSHIndex()).add(key, self._hasher.signature(f"{subject}\n{body}"))
+    
+    @classmethod
+    def clear(cls):
+        """Drop all cached rewrites"""
+        cls._entries.clear()
+        cls._indexes.clear()
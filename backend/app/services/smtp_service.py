@@ -37,7 +37,7 @@ class SMTPService:
                 "is_active": True
             }
             
-            response = self.supabase.table("smtp_credentials")\
+            response = await self.supabase.table("smtp_credentials")\
                 .upsert(data, on_conflict="user_id")\
                 .execute()
             
@@ -54,7 +54,7 @@ class SMTPService:
     async def get_credentials(self, user_id: str, include_password: bool = False) -> dict:
         """Get user's SMTP credentials"""
         try:
-            response = self.supabase.table("smtp_credentials")\
+            response = await self.supabase.table("smtp_credentials")\
                 .select("*")\
                 .eq("user_id", user_id)\
                 .eq("is_active", True)\
@@ -138,7 +138,7 @@ class SMTPService:
     async def delete_credentials(self, user_id: str):
         """Delete user's SMTP credentials"""
         try:
-            self.supabase.table("smtp_credentials")\
+            await self.supabase.table("smtp_credentials")\
                 .delete()\
                 .eq("user_id", user_id)\
                 .execute()
@@ -8,10 +8,19 @@ Phase 1: MVP with resume parsing, context building, and manual email sending
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.circuit_breaker import circuit_breakers
+from app.core.hedging import hedge_budget
+from app.core.llm_metrics import llm_metrics
+from app.core.model_router import model_router
+from app.database.supabase_client import SupabaseClient
+from app.modules.ai_engine.tag_matcher import get_tag_matcher
+from app.services.email_management_service import EmailManagementService
+from app.services.llm_usage_service import LLMUsageService
 from app.api.v1.router import api_router
 
 # Configure logging
@@ -30,10 +39,29 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"API Version: v1")
     
+    # Per-user daily LLM usage totals, flushed in the background
+    usage_service = LLMUsageService()
+    llm_metrics.add_listener(LLMUsageService.add)
+    usage_flusher = asyncio.create_task(usage_service.run())
+    
+    # Collect offline batch jobs, including ones submitted before a restart
+    batch_sweeper = None
+    if settings.GEMINI_BATCH_SWEEP_ENABLED:
+        batch_sweeper = asyncio.create_task(EmailManagementService().run_batch_sweep())
+    
+    # Build the tag automaton now rather than on the first request that needs it
+    get_tag_matcher()
+    
     yield
     
     # Shutdown
     logger.info("👋 Agent M Backend shutting down...")
+    usage_flusher.cancel()
+    if batch_sweeper:
+        batch_sweeper.cancel()
+    llm_metrics.remove_listener(LLMUsageService.add)
+    await usage_service.flush()
+    await SupabaseClient.close()
 
 
 # Create FastAPI app
@@ -67,12 +95,26 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (degraded while any AI circuit is open)"""
     return {
-        "status": "healthy",
+        "status": "degraded" if circuit_breakers.any_open() else "healthy",
         "service": "agent-m-backend",
         "version": "0.1.0",
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "ai": {
+            "circuit_breakers": circuit_breakers.snapshot(),
+            "models": model_router.snapshot()
+        }
+    }
+
+
+# LLM metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """In-process LLM call histograms per operation and model (since process start)"""
+    return {
+        "llm": llm_metrics.snapshot(),
+        "hedging": hedge_budget.snapshot()
     }
 
 
@@ -84,7 +126,8 @@ async def root():
         "message": "Agent M API",
         "version": "0.1.0",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "metrics": "/metrics"
     }
 
 
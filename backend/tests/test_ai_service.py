@@ -0,0 +1,314 @@
+"""
+Tests for AI Service
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from app.core.config import settings
+from app.core.gemini_client import GeminiClientPool, get_gemini_client
+from app.core.rate_limiter import PRIORITY_BATCH
+from app.models.schemas import ContextSuggestionsResponse, ParsedResumeData
+from app.services.ai_service import AIService
+
+
+def test_client_pool_reuses_client_per_key():
+    """Test that the pool builds one client per API key"""
+    GeminiClientPool.clear()
+    
+    with patch('app.core.gemini_client.genai.Client') as mock_client_cls:
+        mock_client_cls.side_effect = lambda api_key: Mock(api_key=api_key)
+        first = GeminiClientPool.get_client("key-a")
+        second = GeminiClientPool.get_client("key-a")
+        other = GeminiClientPool.get_client("key-b")
+    
+    assert first is second
+    assert other is not first
+    assert mock_client_cls.call_count == 2
+    GeminiClientPool.clear()
+
+
+def test_unknown_key_slot_rejected():
+    """Test that only configured key slots are accepted"""
+    with pytest.raises(ValueError, match="Unknown key slot"):
+        get_gemini_client("unknown")
+
+
+@pytest.mark.asyncio
+async def test_generate_email_uses_async_client():
+    """Test that email generation awaits the async models API"""
+    service = AIService()
+    
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(
+        return_value=Mock(text='{"subject": "Hello", "body": "World"}', usage_metadata=None)
+    )
+    
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        result = await service.generate_email(
+            company_name="Acme",
+            company_description="Rockets",
+            user_context={"target_roles": ["Engineer"]},
+            resume_data={"parsed_data": {"skills": ["Python"]}}
+        )
+    
+    assert result == {"subject": "Hello", "body": "World"}
+    mock_client.aio.models.generate_content.assert_awaited_once()
+    mock_client.models.generate_content.assert_not_called()
+
+
+def test_candidate_prefix_is_stable_across_companies():
+    """Test that only the company section differs between email prompts"""
+    service = AIService()
+    user_context = {"target_roles": ["Engineer"], "pitch_tone": "friendly"}
+    resume_data = {"parsed_data": {"skills": ["Python"], "job_titles": ["Developer"]}}
+    
+    acme = service._build_email_prompt("Acme", "Rockets", user_context, resume_data, "Return JSON")
+    globex = service._build_email_prompt("Globex", "Chemicals", user_context, resume_data, "Return JSON")
+    prefix = service._build_candidate_prefix(user_context, resume_data, "Return JSON")
+    
+    assert acme.startswith(prefix)
+    assert globex.startswith(prefix)
+    assert "Acme" not in prefix
+
+
+@pytest.mark.asyncio
+async def test_context_cache_created_once_for_concurrent_requests():
+    """Test that concurrent generations share one cached content"""
+    import asyncio
+    from app.core.context_cache import ContextCacheRegistry
+    
+    registry = ContextCacheRegistry()
+    mock_client = Mock()
+    cached = Mock()
+    cached.name = "cachedContents/abc"
+    mock_client.aio.caches.create = AsyncMock(return_value=cached)
+    
+    with patch('app.core.context_cache.get_gemini_client', return_value=mock_client):
+        names = await asyncio.gather(*(
+            registry.get_or_create("generator", "models/gemini-2.5-flash", "profile") for _ in range(5)
+        ))
+    
+    assert set(names) == {"cachedContents/abc"}
+    mock_client.aio.caches.create.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_generate_email_serves_realistic_profile_from_context_cache():
+    """Test that a profile with a full resume passes the cache threshold and is not sent inline"""
+    service = AIService()
+    resume_text = "\n".join(
+        f"Senior Engineer, Company {index} (201{index % 10} - 202{index % 4}): built payment services in "
+        f"Python and Go, cut p99 latency by {index + 10}%, mentored {index % 5 + 2} engineers"
+        for index in range(40)
+    )
+    resume_data = {"parsed_data": {"skills": ["Python", "Go"]}, "extracted_text": resume_text}
+    user_context = {"target_roles": ["Backend Developer"], "preferred_industries": ["FinTech"]}
+    
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(
+        return_value=Mock(text='{"subject": "Hello", "body": "World"}', usage_metadata=None)
+    )
+    registry = Mock(get_or_create=AsyncMock(return_value="cachedContents/profile"))
+    
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client), \
+            patch('app.services.ai_service.context_cache', registry):
+        await service.generate_email("Acme", "Rockets", user_context, resume_data)
+        await service.generate_email("Globex", "Chemicals", user_context, resume_data)
+    
+    prefix = registry.get_or_create.call_args.kwargs["prefix"]
+    assert len(prefix) // 4 >= settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+    assert "Company 39" in prefix
+    assert {call.kwargs["prefix"] for call in registry.get_or_create.call_args_list} == {prefix}
+    for call in mock_client.aio.models.generate_content.call_args_list:
+        assert call.kwargs["config"].cached_content == "cachedContents/profile"
+        assert "Company 39" not in call.kwargs["contents"]
+
+
+def test_email_variants_reply_deduplicated_and_capped():
+    """Test that incomplete and duplicate variants are dropped and the count is capped"""
+    reply = (
+        '{"variants": ['
+        '{"subject": "A", "body": "One"}, '
+        '{"subject": "A", "body": "One"}, '
+        '{"subject": "", "body": "No subject"}, '
+        '{"subject": "B", "body": "Two"}, '
+        '{"subject": "C", "body": "Three"}'
+        ']}'
+    )
+    
+    variants = AIService._validate_email_variants(reply, count=2)
+    
+    assert variants == [{"subject": "A", "body": "One"}, {"subject": "B", "body": "Two"}]
+    with pytest.raises(ValueError):
+        AIService._validate_email_variants('{"variants": []}', count=2)
+
+
+@pytest.mark.asyncio
+async def test_structured_reply_repairs_only_broken_fields():
+    """Test that a reply with one invalid field triggers a small repair call for that field"""
+    from app.models.schemas import ParsedResumeData
+    
+    service = AIService()
+    replies = [
+        '{"name": "Jo", "skills": ["Python"], "experience_years": "lots", '
+        '"education": [], "job_titles": ["Dev"], "achievements": []}',
+        '{"experience_years": 4}'
+    ]
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+        Mock(text=text, usage_metadata=None) for text in replies
+    ])
+    
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        result = await service._generate_structured(
+            slot="generator",
+            role="generator",
+            contents="Parse this resume",
+            schema=ParsedResumeData
+        )
+    
+    assert result.experience_years == 4
+    assert result.skills == ["Python"]
+    assert mock_client.aio.models.generate_content.await_count == 2
+    repair_call = mock_client.aio.models.generate_content.call_args_list[1].kwargs
+    assert "experience_years" in repair_call["contents"]
+    assert list(repair_call["config"].response_schema.properties) == ["experience_years"]
+
+
+@pytest.mark.asyncio
+async def test_parse_resume_text_asks_llm_only_for_unsettled_fields():
+    """Test that only the settled name is left out; other local finds go to the LLM as hints"""
+    service = AIService()
+    service._parse_cache = Mock(get=AsyncMock(return_value=None), set=AsyncMock())
+    resume = "Jane Doe\njane@example.com | github.com/jdoe\n5 years of experience with Python and Docker"
+    
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=Mock(
+        text='{"links": [{"key": "Portfolio", "value": "https://jane.dev"}, {"key": "GitHub", "value": "jdoe"}], '
+             '"skills": ["Python", "Leadership"], "experience_years": 3, "education": ["BSc"], '
+             '"job_titles": [], "achievements": []}',
+        usage_metadata=None
+    ))
+    
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        result = await service.parse_resume_text(resume)
+    
+    request = mock_client.aio.models.generate_content.call_args.kwargs
+    assert set(request["config"].response_schema.properties) == {
+        "links", "skills", "experience_years", "education", "job_titles", "achievements"
+    }
+    assert "name" not in request["config"].response_schema.properties
+    assert "a keyword scan suggested: Python, Docker" in request["contents"]
+    assert "a phrase scan suggested 5" in request["contents"]
+    assert "already found: Email, GitHub" in request["contents"]
+    assert result.name == "Jane Doe"
+    # A stated "N years of experience" is only a hint; the LLM's reading wins
+    assert result.experience_years == 3
+    assert result.links == {
+        "Portfolio": "https://jane.dev",
+        "GitHub": "https://github.com/jdoe",
+        "Email": "mailto:jane@example.com"
+    }
+    # The LLM rejected the local "Docker" hit
+    assert result.skills == ["Python", "Leadership"]
+    assert result.education == ["BSc"]
+
+
+@pytest.mark.asyncio
+async def test_parse_resume_text_returns_local_fields_when_llm_fails():
+    """Test that a failed LLM call still yields the locally found fields"""
+    service = AIService()
+    service._parse_cache = Mock(get=AsyncMock(return_value=None), set=AsyncMock())
+    service._generate_structured = AsyncMock(side_effect=RuntimeError("model unavailable"))
+    
+    result = await service.parse_resume_text("Jane Doe\njane@example.com\nPython, Kubernetes")
+    
+    assert result.name == "Jane Doe"
+    assert result.skills == ["Python", "Kubernetes"]
+    assert result.education == []
+    service._parse_cache.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_context_suggestions_fall_back_to_tags():
+    """Test that suggestions come from the tag matcher when the LLM fails"""
+    service = AIService()
+    service._generate_structured = AsyncMock(side_effect=RuntimeError("model unavailable"))
+    parsed = ParsedResumeData(
+        skills=["Golang", "k8s", "Fintech payments"],
+        experience_years=4,
+        education=[],
+        job_titles=["Backend Engineer"],
+        achievements=[]
+    )
+    
+    suggestions = await service.generate_context_suggestions(parsed)
+    
+    assert suggestions["suggested_roles"] == ["Backend Developer"]
+    assert suggestions["suggested_industries"] == ["FinTech"]
+    assert suggestions["suggested_keywords"] == ["Go", "Kubernetes"]
+
+
+@pytest.mark.asyncio
+async def test_parse_resume_with_suggestions_single_call():
+    """Test that parsing and context suggestions share one LLM call and one cache entry"""
+    service = AIService()
+    service._parse_cache = Mock(get=AsyncMock(return_value=None), set=AsyncMock())
+    
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(return_value=Mock(
+        text='{"name": "Jane Doe", "skills": [], "experience_years": 3, "education": ["BSc"], '
+             '"job_titles": ["Developer"], "achievements": [], "suggested_roles": ["Backend Developer"], '
+             '"suggested_industries": ["SaaS"], "suggested_keywords": ["APIs"], "suggested_geography": ["Remote"]}',
+        usage_metadata=None
+    ))
+    
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        parsed, suggestions = await service.parse_resume_with_suggestions("Built internal tools for a few teams")
+    
+    mock_client.aio.models.generate_content.assert_awaited_once()
+    assert parsed.name == "Jane Doe"
+    assert parsed.education == ["BSc"]
+    assert suggestions == {
+        "suggested_roles": ["Backend Developer"],
+        "suggested_industries": ["SaaS"],
+        "suggested_keywords": ["APIs"],
+        "suggested_geography": ["Remote"]
+    }
+    cached = service._parse_cache.set.call_args.kwargs["parsed_data"]
+    assert cached["context_suggestions"] == suggestions
+    
+    # A cache hit returns both without calling the LLM
+    service._parse_cache.get = AsyncMock(return_value=cached)
+    with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        cached_parsed, cached_suggestions = await service.parse_resume_with_suggestions("Built internal tools for a few teams")
+    
+    mock_client.aio.models.generate_content.assert_awaited_once()
+    assert cached_parsed == parsed
+    assert cached_suggestions == suggestions
+
+
+@pytest.mark.asyncio
+async def test_refine_context_drops_chosen_items():
+    """Test that refinement returns only suggestions the context does not already have"""
+    service = AIService()
+    service._generate_structured = AsyncMock(return_value=ContextSuggestionsResponse(
+        suggested_roles=["backend engineer", "Platform Engineer"],
+        suggested_industries=["FinTech"],
+        suggested_keywords=["Go", "gRPC"],
+        suggested_geography=["Remote"]
+    ))
+    
+    refined = await service.refine_context({
+        "target_roles": ["Backend Engineer"],
+        "preferred_industries": [],
+        "keywords": ["Go"],
+        "geography": None
+    })
+    
+    assert refined == {
+        "suggested_roles": ["Platform Engineer"],
+        "suggested_industries": ["FinTech"],
+        "suggested_keywords": ["gRPC"],
+        "suggested_geography": ["Remote"]
+    }
+    assert service._generate_structured.call_args.kwargs["priority"] == PRIORITY_BATCH
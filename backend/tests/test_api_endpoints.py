@@ -1,9 +1,12 @@
 """
 Integration tests for API endpoints
 """
+import httpx
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, AsyncMock, Mock
 from fastapi import status
+from app.core.security import get_current_user_id
+from main import app
 
 
 def test_health_check(client):
@@ -42,3 +45,55 @@ def test_cors_headers(client):
     response = client.options("/api/v1/resume/upload")
     # CORS middleware should add headers
     assert response.status_code in [200, 405]  # Some frameworks return 405 for OPTIONS
+
+
+async def post_as_user(user_id, path, json):
+    """POST to the app as an authenticated user, reading the full (streamed) response"""
+    app.dependency_overrides[get_current_user_id] = lambda: user_id
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, json=json)
+    finally:
+        app.dependency_overrides.pop(get_current_user_id, None)
+
+
+@pytest.mark.asyncio
+async def test_generate_email_stream_runs_to_completion(mock_user_id):
+    """Test that the streaming endpoint emits every event through to done without compacting chat"""
+    async def fake_stream(**kwargs):
+        yield {"event": "subject", "data": "Hello Acme"}
+        yield {"event": "body", "data": "Dear team"}
+        yield {"event": "done", "data": {"id": "email-1", "user_id": kwargs["user_id"]}}
+    
+    service = Mock()
+    service.generate_email_stream = fake_stream
+    chatbot = Mock(compact_history=AsyncMock())
+    with patch('app.api.v1.endpoints.email_management.EmailManagementService', return_value=service), \
+            patch('app.api.v1.endpoints.email_management.ChatbotService', return_value=chatbot):
+        response = await post_as_user(mock_user_id, "/api/v1/emails/generate/stream", {"company_name": "Acme"})
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: subject", "event: body", "event: done"]
+    assert mock_user_id in response.text
+    chatbot.compact_history.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_compacts_history_after_the_turn(mock_user_id):
+    """Test that a streamed chat turn schedules compaction once the stream has finished"""
+    async def fake_chat_stream(**kwargs):
+        yield {"event": "delta", "data": "Sounds good"}
+        yield {"event": "done", "data": {"message": "Sounds good", "email_updated": False}}
+    
+    service = Mock(get_chat_tail=AsyncMock(return_value=[]))
+    chatbot = Mock(compact_history=AsyncMock())
+    chatbot.chat_stream = fake_chat_stream
+    with patch('app.api.v1.endpoints.email_management.EmailManagementService', return_value=service), \
+            patch('app.api.v1.endpoints.email_management.ChatbotService', return_value=chatbot):
+        response = await post_as_user(mock_user_id, "/api/v1/emails/email-1/chat/stream", {"message": "Shorter?"})
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert "event: done" in response.text
+    chatbot.compact_history.assert_awaited_once_with(mock_user_id, "email-1")
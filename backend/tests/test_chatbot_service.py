@@ -0,0 +1,267 @@
+"""
+Tests for Chatbot Service
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from app.models.schemas import EmailEdit, EmailEdits, GeneratedEmail
+from app.services.chatbot_service import QUICK_ACTION_TEMPLATE, ChatbotService
+from app.services.rewrite_cache_service import RewriteCacheService
+
+
+def make_service():
+    """Build the chatbot with mocked Supabase"""
+    with patch('app.services.email_management_service.get_supabase_client', return_value=Mock()):
+        service = ChatbotService()
+    service.email_service.get_email = AsyncMock(return_value={
+        "company_name": "Acme",
+        "position_title": "Engineer",
+        "subject": "Hello",
+        "content": "Dear team"
+    })
+    service.email_service.save_chat_messages = AsyncMock(return_value=[])
+    return service
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_saves_history_once_after_stream():
+    """Test that both chat messages are persisted in one write after the last chunk"""
+    service = make_service()
+    
+    async def fake_stream(prompt):
+        for chunk in ["Sure, ", "shorten ", "it."]:
+            service.email_service.save_chat_messages.assert_not_awaited()
+            yield chunk
+    
+    service.ai_service.chat_completion_stream = fake_stream
+    
+    events = [event async for event in service.chat_stream(
+        user_id="user-1",
+        email_id="email-1",
+        user_message="Make it shorter",
+        chat_history=[]
+    )]
+    
+    assert [e["event"] for e in events] == ["delta", "delta", "delta", "done"]
+    assert events[-1]["data"]["message"] == "Sure, shorten it."
+    service.email_service.save_chat_messages.assert_awaited_once_with(
+        user_id="user-1",
+        email_id="email-1",
+        messages=[("user", "Make it shorter"), ("assistant", "Sure, shorten it.")]
+    )
+
+
+def test_chat_prompt_drops_oldest_history_over_budget():
+    """Test that the chat prompt keeps the newest messages within the history budget"""
+    service = make_service()
+    history = [
+        {"role": "user", "message": f"message-{i} " + "filler " * 200}
+        for i in range(5)
+    ]
+    
+    with patch('app.services.chatbot_service.settings') as mock_settings:
+        mock_settings.TOKEN_BUDGET_CHAT_EMAIL = 1500
+        mock_settings.TOKEN_BUDGET_CHAT_HISTORY = 800
+        prompt = service._build_chat_prompt(
+            email_data={"subject": "Hello", "content": "Dear team"},
+            chat_history=history,
+            user_message="Thoughts?"
+        )
+    
+    assert "message-4" in prompt
+    assert "message-0" not in prompt
+    assert "User: Thoughts?" in prompt
+
+
+def make_quick_action_service(content="Dear team, I would love to join Acme as an engineer next year."):
+    """Chatbot whose quick actions rewrite through a counted mock"""
+    RewriteCacheService.clear()
+    service = make_service()
+    service.email_service.get_email.return_value = {"subject": "Hello", "content": content}
+    service.email_service.update_email_content = AsyncMock()
+    service.ai_service.chat_completion_structured = AsyncMock(
+        side_effect=lambda prompt, schema, hedge: (
+            GeneratedEmail(subject="Greetings", body="Rewritten body") if schema is GeneratedEmail
+            else EmailEdits(edits=[EmailEdit(find="next year", replace="next year.")])
+        )
+    )
+    return service
+
+
+@pytest.mark.asyncio
+async def test_repeated_quick_action_is_served_from_cache():
+    """Test that the same action on the same email skips the LLM the second time"""
+    service = make_quick_action_service()
+    
+    first = await service.apply_quick_action("user-1", "email-1", "formal")
+    second = await service.apply_quick_action("user-1", "email-1", "formal")
+    other_action = await service.apply_quick_action("user-1", "email-1", "shorten")
+    
+    assert (first["cached"], second["cached"], other_action["cached"]) == (False, True, False)
+    assert second["updated_email"] == {"subject": "Greetings", "body": "Rewritten body"}
+    assert service.ai_service.chat_completion_structured.await_count == 2
+    assert service.email_service.update_email_content.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_near_identical_email_reuses_rewrite_except_for_grammar_fixes():
+    """Test that case/punctuation-only differences match, but not for fix_grammar"""
+    service = make_quick_action_service()
+    await service.apply_quick_action("user-1", "email-1", "formal")
+    await service.apply_quick_action("user-1", "email-1", "fix_grammar")
+    
+    service.email_service.get_email.return_value = {
+        "subject": "Hello",
+        "content": "dear team - I would love to join ACME as an engineer next year!"
+    }
+    near = await service.apply_quick_action("user-1", "email-1", "formal")
+    grammar = await service.apply_quick_action("user-1", "email-1", "fix_grammar")
+    
+    assert near["cached"] is True
+    assert grammar["cached"] is False
+
+
+@pytest.mark.asyncio
+async def test_cached_rewrite_is_not_shared_across_users_or_emails():
+    """Test that the same email text owned by another user or email is rewritten afresh"""
+    service = make_quick_action_service()
+    await service.apply_quick_action("user-1", "email-1", "formal")
+    
+    other_user = await service.apply_quick_action("user-2", "email-2", "formal")
+    other_email = await service.apply_quick_action("user-1", "email-3", "formal")
+    
+    assert other_user["cached"] is False
+    assert other_email["cached"] is False
+    assert service.ai_service.chat_completion_structured.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_prompt_template_change_invalidates_cached_rewrites():
+    """Test that editing the quick action template stops serving old rewrites"""
+    service = make_quick_action_service()
+    await service.apply_quick_action("user-1", "email-1", "formal")
+    
+    with patch('app.services.chatbot_service.QUICK_ACTION_TEMPLATE', QUICK_ACTION_TEMPLATE + "Keep it brief.\n"):
+        result = await service.apply_quick_action("user-1", "email-1", "formal")
+    
+    assert result["cached"] is False
+    assert service.ai_service.chat_completion_structured.await_count == 2
+
+
+def test_chat_prompt_uses_summary_instead_of_folded_messages():
+    """Test that messages covered by the chat summary are not quoted again"""
+    service = make_service()
+    history = [
+        {"role": "user", "message": "old request", "created_at": "2024-01-01T10:00:00+00:00"},
+        {"role": "assistant", "message": "old reply", "created_at": "2024-01-01T10:00:00+00:00"},
+        {"role": "user", "message": "new request", "created_at": "2024-01-01T11:00:00+00:00"}
+    ]
+    
+    prompt = service._build_chat_prompt(
+        email_data={
+            "subject": "Hello",
+            "content": "Dear team",
+            "chat_summary": "User wants a shorter intro.",
+            "chat_summary_until": "2024-01-01T10:00:00+00:00"
+        },
+        chat_history=history,
+        user_message="Thoughts?"
+    )
+    
+    assert "Summary of earlier messages: User wants a shorter intro." in prompt
+    assert "old request" not in prompt
+    assert "user: new request" in prompt
+
+
+@pytest.mark.asyncio
+async def test_compact_history_folds_all_but_recent_turns():
+    """Test that compaction summarizes older turns and keeps the recent ones verbatim"""
+    service = make_service()
+    service.email_service.get_email.return_value = {
+        "chat_summary": "Earlier summary",
+        "chat_summary_until": "t00",
+        "chat_summary_message_count": 4
+    }
+    pending = []
+    for turn in range(6):
+        pending.append({"role": "user", "message": f"ask {turn}", "created_at": f"t{turn + 1:02d}"})
+        pending.append({"role": "assistant", "message": f"answer {turn}", "created_at": f"t{turn + 1:02d}"})
+    service.email_service.get_chat_history = AsyncMock(return_value=pending)
+    service.email_service.save_chat_summary = AsyncMock(return_value=True)
+    service.ai_service.summarize_chat = AsyncMock(return_value="New summary")
+    
+    with patch('app.services.chatbot_service.settings') as mock_settings:
+        mock_settings.CHAT_RECENT_MESSAGES = 5
+        mock_settings.CHAT_SUMMARY_EVERY_TURNS = 3
+        stored = await service.compact_history("user-1", "email-1")
+    
+    assert stored is True
+    assert service.email_service.get_chat_history.call_args.kwargs["after"] == "t00"
+    summary, folded = service.ai_service.summarize_chat.call_args[0]
+    assert summary == "Earlier summary"
+    # 12 pending - 5 recent = 7, rounded up to the whole turn
+    assert folded[0] == "user: ask 0"
+    assert folded[-1] == "assistant: answer 3"
+    service.email_service.save_chat_summary.assert_awaited_once_with(
+        user_id="user-1",
+        email_id="email-1",
+        summary="New summary",
+        summarized_until="t04",
+        message_count=12,
+        expected_count=4
+    )
+
+
+@pytest.mark.asyncio
+async def test_compact_history_waits_for_enough_turns():
+    """Test that no summary call is made until enough turns pile up"""
+    service = make_service()
+    service.email_service.get_email.return_value = {}
+    service.email_service.get_chat_history = AsyncMock(return_value=[
+        {"role": "user", "message": "hi", "created_at": "t01"},
+        {"role": "assistant", "message": "hello", "created_at": "t01"}
+    ])
+    service.ai_service.summarize_chat = AsyncMock()
+    
+    assert await service.compact_history("user-1", "email-1") is False
+    service.ai_service.summarize_chat.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_grammar_fix_applies_span_edits():
+    """Test that fix_grammar asks for edits and applies them locally"""
+    service = make_quick_action_service(content="Dear team, i would love to join Acme as an engeneer.")
+    service.ai_service.chat_completion_structured = AsyncMock(return_value=EmailEdits(edits=[
+        EmailEdit(find="i would", replace="I would"),
+        EmailEdit(find="engeneer", replace="engineer")
+    ]))
+    
+    result = await service.apply_quick_action("user-1", "email-1", "fix_grammar")
+    
+    assert service.ai_service.chat_completion_structured.call_args.kwargs["schema"] is EmailEdits
+    assert result["updated_email"] == {"subject": "Hello", "body": "Dear team, I would love to join Acme as an engineer."}
+    assert [(edit["start"], edit["original"], edit["replacement"]) for edit in result["edits"]] == [
+        (11, "i would", "I would"),
+        (43, "engeneer", "engineer")
+    ]
+    service.email_service.update_email_content.assert_awaited_once_with(
+        user_id="user-1",
+        email_id="email-1",
+        subject="Hello",
+        content="Dear team, I would love to join Acme as an engineer."
+    )
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_edits_fall_back_to_rewrite():
+    """Test that edits that do not apply cleanly lead to a full rewrite"""
+    service = make_quick_action_service(content="Hi team, hi again, hi.")
+    service.ai_service.chat_completion_structured = AsyncMock(side_effect=[
+        EmailEdits(edits=[EmailEdit(find="hi", replace="Hi")]),
+        GeneratedEmail(subject="Hello", body="Hi team, hi again, hi!")
+    ])
+    
+    result = await service.apply_quick_action("user-1", "email-1", "fix_grammar")
+    
+    assert service.ai_service.chat_completion_structured.await_count == 2
+    assert result["edits"] is None
+    assert result["updated_email"]["body"] == "Hi team, hi again, hi!"
@@ -0,0 +1,80 @@
+"""
+Tests for model and key circuit breakers
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from google.genai import errors
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitOpenError
+)
+from app.core.config import settings
+from app.services.ai_service import AIService
+
+
+def test_breaker_opens_then_probes_once():
+    """Test open -> half-open with a single probe -> closed"""
+    breaker = CircuitBreaker("models/test")
+    
+    with patch.object(settings, "GEMINI_BREAKER_FAILURE_THRESHOLD", 3), \
+            patch.object(settings, "GEMINI_BREAKER_RESET_TIMEOUT", 30.0):
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        
+        breaker.opened_at = time.monotonic() - 31
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()  # only one probe at a time
+        
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+
+def test_quota_errors_charge_the_key_not_the_model():
+    """Test that 429s open the key circuit while timeouts open the model circuit"""
+    registry = CircuitBreakerRegistry()
+    
+    with patch.object(settings, "GEMINI_BREAKER_FAILURE_THRESHOLD", 1):
+        registry.check("key-a", "models/m1")
+        registry.record_failure("key-a", "models/m1", Mock(spec=errors.ClientError, code=429))
+        registry.check("key-b", "models/m2")
+        registry.record_failure("key-b", "models/m2", asyncio.TimeoutError())
+    
+    assert registry.key("key-a").state == OPEN
+    assert registry.model("models/m1").state == CLOSED
+    assert registry.model("models/m2").state == OPEN
+    assert registry.key("key-b").state == CLOSED
+    with pytest.raises(CircuitOpenError):
+        registry.check("key-a", "models/m1")
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_calling_gemini():
+    """Test that calls skip a model with an open circuit instead of waiting for its timeout"""
+    service = AIService()
+    registry = CircuitBreakerRegistry()
+    for model in ["models/gemini-2.0-flash", "models/gemini-2.5-flash", "models/gemini-2.5-pro"]:
+        registry.model(model).state = OPEN
+        registry.model(model).opened_at = time.monotonic()
+    
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock()
+    
+    with patch('app.services.ai_service.circuit_breakers', registry), \
+            patch('app.core.llm_backend.get_gemini_client', return_value=mock_client):
+        started = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            await service.chat_completion("Hi")
+    
+    assert time.monotonic() - started < 0.1
+    mock_client.aio.models.generate_content.assert_not_called()
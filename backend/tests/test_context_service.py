@@ -2,7 +2,7 @@
 Tests for Context Service
 """
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 from app.services.context_service import ContextService
 
 
@@ -70,3 +70,26 @@ async def test_update_context_profile(mock_supabase, mock_user_id, sample_contex
     
     assert result["success"] is True
     assert result["context"]["experience_level"] == "Lead"
+
+
+@pytest.mark.asyncio
+async def test_refresh_context_suggestions_skips_resaved_context(mock_user_id):
+    """Test that refinement results are only stored on the context they were made from"""
+    supabase = Mock()
+    supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=Mock(data=[]))
+    refined = {"suggested_roles": ["Platform Engineer"]}
+    
+    with patch('app.services.context_service.get_supabase', return_value=supabase), \
+            patch('app.services.context_service.AIService') as mock_ai_cls:
+        mock_ai_cls.return_value.refine_context = AsyncMock(return_value=refined)
+        service = ContextService()
+        result = await service.refresh_context_suggestions(
+            mock_user_id,
+            {"target_roles": ["Backend Engineer"], "updated_at": "2024-01-01T00:00:00+00:00"}
+        )
+    
+    assert result is None
+    supabase.table.return_value.update.assert_called_once_with({"context_suggestions": refined})
+    supabase.table.return_value.update.return_value.eq.return_value.eq.assert_called_once_with(
+        "updated_at", "2024-01-01T00:00:00+00:00"
+    )
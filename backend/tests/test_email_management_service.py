@@ -0,0 +1,385 @@
+"""
+Tests for Email Management Service
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from app.core.gemini_batch import FakeBatchBackend
+from app.services.email_management_service import EmailManagementService, StreamedEmailParser
+
+
+def make_service(mock_supabase):
+    """Build the service with mocked Supabase and AI clients"""
+    with patch('app.services.email_management_service.get_supabase_client', return_value=mock_supabase):
+        service = EmailManagementService()
+    service._load_generation_context = AsyncMock(return_value=({"target_roles": ["Engineer"]}, {}))
+    service._log_activity = AsyncMock()
+    return service
+
+
+def use_batch_jobs_table(mock_supabase):
+    """Back the email_batch_jobs table with an in-memory dict of rows by job name"""
+    rows = {}
+    other_tables = mock_supabase.table.return_value
+    jobs_table = Mock()
+    
+    def insert(row):
+        stored = {"id": f"batch-{len(rows) + 1}", **row}
+        rows[row["job_name"]] = stored
+        return Mock(execute=AsyncMock(return_value=Mock(data=[dict(stored)])))
+    
+    def update(data):
+        def filter_status(job_name, status):
+            async def execute():
+                row = rows.get(job_name)
+                if row is None or row["status"] != status:
+                    return Mock(data=[])
+                row.update(data)
+                return Mock(data=[dict(row)])
+            return Mock(execute=execute)
+        return Mock(eq=lambda _, job_name: Mock(eq=lambda _, status: filter_status(job_name, status)))
+    
+    jobs_table.insert.side_effect = insert
+    jobs_table.update.side_effect = update
+    jobs_table.select.return_value.eq.return_value.execute = AsyncMock(
+        side_effect=lambda: Mock(data=[dict(row) for row in rows.values() if row["status"] == "running"])
+    )
+    jobs_table.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+        side_effect=lambda: Mock(data=[dict(row) for row in rows.values()])
+    )
+    mock_supabase.table.side_effect = lambda name: jobs_table if name == "email_batch_jobs" else other_tables
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_bulk_generate_single_insert_and_per_item_results():
+    """Test that bulk generation inserts once and reports failures per company"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=lambda: Mock(
+        data=[{"id": f"email-{i}"} for i in range(len(mock_supabase.table.return_value.insert.call_args[0][0]))]
+    ))
+    service = make_service(mock_supabase)
+    
+    async def fake_generate(company_name, **kwargs):
+        if company_name == "Broken":
+            raise RuntimeError("quota exceeded")
+        return {"subject": f"Hi {company_name}", "body": "Body"}
+    
+    service.ai_service.generate_email = AsyncMock(side_effect=fake_generate)
+    
+    result = await service.generate_emails_bulk(
+        user_id="user-1",
+        companies=[{"company_name": "Acme"}, {"company_name": "Broken"}, {"company_name": "Globex"}],
+        concurrency=2
+    )
+    
+    assert mock_supabase.table.return_value.insert.call_count == 1
+    inserted_rows = mock_supabase.table.return_value.insert.call_args[0][0]
+    assert len(inserted_rows) == 2
+    assert result["succeeded"] == 2
+    assert result["failed"] == 1
+    assert result["results"][1]["status"] == "failed"
+    assert "quota exceeded" in result["results"][1]["error"]
+    assert result["results"][0]["email_id"] is not None
+    service._load_generation_context.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_bulk_generate_respects_concurrency_limit():
+    """Test that no more than `concurrency` generations run at once"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=Mock(
+        data=[{"id": f"email-{i}"} for i in range(10)]
+    ))
+    service = make_service(mock_supabase)
+    
+    in_flight = 0
+    peak = 0
+    
+    async def fake_generate(company_name, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"subject": "Hi", "body": "Body"}
+    
+    service.ai_service.generate_email = AsyncMock(side_effect=fake_generate)
+    
+    await service.generate_emails_bulk(
+        user_id="user-1",
+        companies=[{"company_name": f"Company {i}"} for i in range(10)],
+        concurrency=3
+    )
+    
+    assert peak == 3
+
+
+def test_streamed_email_parser_splits_subject_and_body():
+    """Test incremental subject/body splitting across arbitrary chunk boundaries"""
+    parser = StreamedEmailParser()
+    deltas = []
+    for chunk in ["Sub", "ject: Hello ", "Acme\n", "\nDear team,", "\nThanks"]:
+        deltas.extend(parser.feed(chunk))
+    
+    assert "".join(d for f, d in deltas if f == "subject") == "Hello Acme"
+    assert "".join(d for f, d in deltas if f == "body") == "Dear team,\nThanks"
+    assert parser.result() == {"subject": "Hello Acme", "body": "Dear team,\nThanks"}
+
+
+@pytest.mark.asyncio
+async def test_generate_email_stream_stores_row_at_end():
+    """Test that streamed generation inserts the email after the last chunk"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=Mock(
+        data=[{"id": "email-1"}]
+    ))
+    service = make_service(mock_supabase)
+    
+    async def fake_stream(**kwargs):
+        for chunk in ["Subject: Hi\n\n", "Body ", "text"]:
+            yield chunk
+    
+    service.ai_service.generate_email_stream = fake_stream
+    
+    events = [event async for event in service.generate_email_stream(
+        user_id="user-1",
+        company_name="Acme",
+        company_website=None,
+        company_location=None,
+        position_title=None,
+        job_type=None,
+        salary_range=None,
+        keywords=None
+    )]
+    
+    assert [e["event"] for e in events] == ["subject", "body", "body", "done"]
+    inserted = mock_supabase.table.return_value.insert.call_args[0][0]
+    assert inserted["subject"] == "Hi"
+    assert inserted["content"] == "Body text"
+
+
+@pytest.mark.asyncio
+async def test_batch_generate_replays_fake_job_into_one_insert():
+    """Test that a submitted batch job is collected once done and its replies inserted as new emails"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=Mock(
+        data=[{"id": "email-0"}, {"id": "email-2"}]
+    ))
+    jobs = use_batch_jobs_table(mock_supabase)
+    service = make_service(mock_supabase)
+    service.batch_backend = FakeBatchBackend(
+        responses=[
+            '{"subject": "Hi Acme", "body": "Body"}',
+            RuntimeError("safety block"),
+            '{"subject": "Hi Globex", "body": "Body"}'
+        ],
+        polls_until_done=3
+    )
+    
+    result = await service.submit_emails_batch(
+        user_id="user-1",
+        companies=[{"company_name": "Acme"}, {"company_name": "Broken"}, {"company_name": "Globex"}]
+    )
+    while result["status"] == "running":
+        result = await service.collect_emails_batch(result)
+    
+    job = service.batch_backend.jobs[result["job_name"]]
+    assert job["polls"] == 3
+    assert len(job["requests"]) == 3
+    assert "Acme" in job["requests"][0]["contents"]
+    
+    assert mock_supabase.table.return_value.insert.call_count == 1
+    inserted_rows = mock_supabase.table.return_value.insert.call_args[0][0]
+    assert [row["company_name"] for row in inserted_rows] == ["Acme", "Globex"]
+    assert all(row["status"] == "new" for row in inserted_rows)
+    assert result["succeeded"] == 2
+    assert result["results"][1]["status"] == "failed"
+    assert result["results"][2]["email_id"] == "email-2"
+    assert jobs[result["job_name"]]["status"] == "completed"
+    assert jobs[result["job_name"]]["succeeded"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_collect_marks_failed_job_and_stores_nothing():
+    """Test that a failed batch job is marked failed and stores no emails"""
+    mock_supabase = Mock()
+    jobs = use_batch_jobs_table(mock_supabase)
+    service = make_service(mock_supabase)
+    service.batch_backend = FakeBatchBackend(fail=True)
+    
+    job = await service.submit_emails_batch(user_id="user-1", companies=[{"company_name": "Acme"}])
+    result = await service.collect_emails_batch(job)
+    
+    assert result["status"] == "failed"
+    assert "JOB_STATE_FAILED" in result["error"]
+    mock_supabase.table.return_value.insert.assert_not_called()
+    assert [job["status"] for job in jobs.values()] == ["failed"]
+
+
+@pytest.mark.asyncio
+async def test_batch_job_survives_restart_and_is_collected_once():
+    """Test that a stored job is collected by a later sweep, and only by one collector"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=Mock(data=[{"id": "email-0"}]))
+    jobs = use_batch_jobs_table(mock_supabase)
+    backend = FakeBatchBackend(polls_until_done=2)
+    
+    submitter = make_service(mock_supabase)
+    submitter.batch_backend = backend
+    submitted = await submitter.submit_emails_batch(user_id="user-1", companies=[{"company_name": "Acme"}])
+    assert submitted["status"] == "running"
+    
+    # A new process (fresh service instances) picks the job up from the table
+    sweeper, endpoint = make_service(mock_supabase), make_service(mock_supabase)
+    sweeper.batch_backend = endpoint.batch_backend = backend
+    assert await sweeper.sweep_emails_batches() == 0
+    
+    stale = dict(jobs[submitted["job_name"]])
+    assert await sweeper.sweep_emails_batches() == 1
+    # A concurrent status check holding the old row must not store the emails again
+    await endpoint.collect_emails_batch(stale)
+    
+    assert mock_supabase.table.return_value.insert.call_count == 1
+    assert jobs[submitted["job_name"]]["status"] == "completed"
+    assert jobs[submitted["job_name"]]["results"][0]["email_id"] == "email-0"
+
+
+@pytest.mark.asyncio
+async def test_generate_variants_single_call_sibling_rows():
+    """Test that N variants come from one AI call and are inserted as sibling rows"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=lambda: Mock(
+        data=mock_supabase.table.return_value.insert.call_args[0][0]
+    ))
+    service = make_service(mock_supabase)
+    service.ai_service.generate_email_variants = AsyncMock(return_value=[
+        {"subject": "First", "body": "Body 1"},
+        {"subject": "Second", "body": "Body 2"},
+        {"subject": "Third", "body": "Body 3"}
+    ])
+    
+    emails = await service.generate_email_variants(
+        user_id="user-1",
+        company_name="Acme",
+        company_website=None,
+        company_location=None,
+        position_title=None,
+        job_type=None,
+        salary_range=None,
+        keywords=None,
+        variants=3
+    )
+    
+    service.ai_service.generate_email_variants.assert_awaited_once()
+    assert service.ai_service.generate_email_variants.call_args.kwargs["count"] == 3
+    assert mock_supabase.table.return_value.insert.call_count == 1
+    assert [email["subject"] for email in emails] == ["First", "Second", "Third"]
+    groups = {email["generation_metadata"]["variant_group"] for email in emails}
+    assert len(groups) == 1
+    assert [email["generation_metadata"]["variant_index"] for email in emails] == [0, 1, 2]
+
+
+DRAFT = (
+    "Hi Priya, I came across Acme's work on reusable rockets and would love to help "
+    "your avionics team ship faster. I built flight software at two startups and led "
+    "the telemetry rewrite that cut ground station latency in half."
+)
+
+
+@pytest.mark.asyncio
+async def test_bulk_generate_flags_near_duplicate_drafts():
+    """Test that a draft nearly identical to an earlier one in the batch is flagged"""
+    mock_supabase = Mock()
+    mock_supabase.rpc.return_value.execute = AsyncMock(return_value=Mock(data=[]))
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=lambda: Mock(
+        data=mock_supabase.table.return_value.insert.call_args[0][0]
+    ))
+    service = make_service(mock_supabase)
+    bodies = {
+        "Acme": DRAFT,
+        "Globex": DRAFT.replace("in half", "by half"),
+        "Initech": "Quarterly invoice attached, please remit payment within thirty days of receipt."
+    }
+    service.ai_service.generate_email = AsyncMock(
+        side_effect=lambda company_name, **kwargs: {"subject": "Hello", "body": bodies[company_name]}
+    )
+    
+    await service.generate_emails_bulk(
+        user_id="user-1",
+        companies=[{"company_name": name} for name in bodies],
+        concurrency=1
+    )
+    
+    rows = {row["company_name"]: row for row in mock_supabase.table.return_value.insert.call_args[0][0]}
+    assert rows["Acme"]["duplicate_of"] is None
+    assert rows["Globex"]["duplicate_of"] == rows["Acme"]["id"]
+    assert rows["Globex"]["duplicate_similarity"] >= 0.8
+    assert rows["Initech"]["duplicate_of"] is None
+    assert len(rows["Acme"]["content_bands"]) == 16
+    assert mock_supabase.rpc.call_args[0][0] == "find_email_duplicate_candidates"
+
+
+@pytest.mark.asyncio
+async def test_flag_near_duplicates_against_stored_candidates():
+    """Test that stored drafts returned by the band lookup are matched"""
+    mock_supabase = Mock()
+    service = make_service(mock_supabase)
+    stored = service._fingerprint(DRAFT)["content_minhash"]
+    mock_supabase.rpc.return_value.execute = AsyncMock(return_value=Mock(
+        data=[{"id": "email-old", "content_minhash": stored}]
+    ))
+    record = {"content": DRAFT.replace("Hi Priya", "Hello Priya")}
+    
+    await service._flag_near_duplicates("user-1", [record])
+    
+    assert record["duplicate_of"] == "email-old"
+    assert record["id"] != "email-old"
+
+
+@pytest.mark.asyncio
+async def test_cluster_similar_emails_groups_near_duplicates():
+    """Test that clustering groups similar drafts and fingerprints unflagged ones"""
+    mock_supabase = Mock()
+    service = make_service(mock_supabase)
+    rows = [
+        {"id": "e1", "company_name": "Acme", "subject": "A", "status": "new",
+         "content_minhash": service._fingerprint(DRAFT)["content_minhash"]},
+        {"id": "e2", "company_name": "Globex", "subject": "B", "status": "new", "content_minhash": None},
+        {"id": "e3", "company_name": "Initech", "subject": "C", "status": "sent",
+         "content_minhash": service._fingerprint("Quarterly invoice attached, please remit payment.")["content_minhash"]}
+    ]
+    table = mock_supabase.table.return_value
+    table.select.return_value.eq.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=Mock(data=rows))
+    table.select.return_value.eq.return_value.in_.return_value.execute = AsyncMock(return_value=Mock(
+        data=[{"id": "e2", "content": DRAFT.replace("in half", "by half")}]
+    ))
+    
+    result = await service.cluster_similar_emails(user_id="user-1")
+    
+    assert result["total_emails"] == 3
+    assert result["clustered_emails"] == 2
+    assert len(result["clusters"]) == 1
+    assert {email["id"] for email in result["clusters"][0]["emails"]} == {"e1", "e2"}
+    assert 0.8 <= result["clusters"][0]["min_similarity"] <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_unfingerprinted_drafts_are_loaded_in_short_id_chunks():
+    """Test that content for old drafts is fetched in small id=in.(...) chunks of the user's rows"""
+    mock_supabase = Mock()
+    service = make_service(mock_supabase)
+    rows = [
+        {"id": f"e{index}", "company_name": "Acme", "subject": "A", "status": "new", "content_minhash": None}
+        for index in range(250)
+    ]
+    table = mock_supabase.table.return_value
+    table.select.return_value.eq.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=Mock(data=rows))
+    lookup = table.select.return_value.eq.return_value.in_
+    lookup.return_value.execute = AsyncMock(return_value=Mock(data=[]))
+    
+    await service.cluster_similar_emails(user_id="user-1")
+    
+    chunks = [call.args[1] for call in lookup.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert table.select.return_value.eq.call_args_list[-1].args == ("user_id", "user-1")
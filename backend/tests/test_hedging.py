@@ -0,0 +1,86 @@
+"""
+Tests for hedged Gemini requests
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from app.core.config import settings
+from app.core.hedging import HedgeBudget
+from app.core.model_router import ModelRouter
+from app.services.ai_service import AIService
+
+FLASH_20 = "models/gemini-2.0-flash"
+
+
+def make_router():
+    """Router whose first chatbot model has a ~10ms p90"""
+    router = ModelRouter()
+    for _ in range(10):
+        router.record(FLASH_20, 0.01, ok=True)
+    return router
+
+
+def make_service(delays):
+    """Service whose n-th Gemini call takes delays[n] seconds"""
+    service = AIService()
+    calls = {"started": 0, "cancelled": 0}
+    
+    async def fake_generate(slot, model, contents, config=None, priority=0, timeout=None):
+        index = calls["started"]
+        calls["started"] += 1
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            calls["cancelled"] += 1
+            raise
+        return Mock(text=f"reply {index}")
+    
+    service._generate = fake_generate
+    return service, calls
+
+
+def test_hedge_budget_caps_extra_calls():
+    """Test that hedges never exceed the configured share of primary calls"""
+    budget = HedgeBudget()
+    
+    with patch.object(settings, "GEMINI_HEDGE_MAX_RATIO", 0.25), \
+            patch.object(settings, "GEMINI_HEDGE_BURST", 5.0):
+        granted = 0
+        for _ in range(100):
+            budget.record_request()
+            granted += budget.try_acquire()
+    
+    assert granted == 25
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    """Test that a call outliving p90 is duplicated and the slower one cancelled"""
+    service, calls = make_service([1.0, 0.0])
+    
+    with patch('app.services.ai_service.model_router', make_router()), \
+            patch('app.services.ai_service.hedge_budget', HedgeBudget()) as budget, \
+            patch.object(settings, "GEMINI_HEDGE_ENABLED", True), \
+            patch.object(settings, "GEMINI_HEDGE_MIN_DELAY", 0.01):
+        budget.credits = 1
+        reply = await asyncio.wait_for(service.chat_completion("Hi", hedge=True), timeout=0.5)
+    
+    assert reply == "reply 1"
+    assert calls == {"started": 2, "cancelled": 1}
+    assert budget.hedge_wins == 1
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_budget():
+    """Test that an exhausted budget leaves the slow call unhedged"""
+    service, calls = make_service([0.1, 0.0])
+    
+    with patch('app.services.ai_service.model_router', make_router()), \
+            patch('app.services.ai_service.hedge_budget', HedgeBudget()), \
+            patch.object(settings, "GEMINI_HEDGE_ENABLED", True), \
+            patch.object(settings, "GEMINI_HEDGE_MIN_DELAY", 0.01), \
+            patch.object(settings, "GEMINI_HEDGE_MAX_RATIO", 0.0):
+        reply = await service.chat_completion("Hi", hedge=True)
+    
+    assert reply == "reply 0"
+    assert calls["started"] == 1
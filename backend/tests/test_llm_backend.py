@@ -0,0 +1,105 @@
+"""
+Tests for the pluggable LLM backend and the local fake
+"""
+import statistics
+import pytest
+from unittest.mock import patch
+from google.genai import errors
+from app.core.config import settings
+from app.core.llm_backend import FakeLLMBackend, GeminiBackend, get_llm_backend
+from app.core.model_router import ModelRouter
+from app.services.ai_service import AIService
+
+
+def fast_fake_settings():
+    """Patch settings so the fake answers instantly"""
+    return patch.multiple(
+        settings,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=0.0,
+        FAKE_LLM_LATENCY_DISTRIBUTION="fixed",
+        FAKE_LLM_STREAM_CHUNK_DELAY=0.0
+    )
+
+
+def test_backend_selected_by_config():
+    """Test that LLM_BACKEND picks the implementation"""
+    assert isinstance(get_llm_backend(), GeminiBackend)
+    with patch.object(settings, "LLM_BACKEND", "fake"):
+        assert isinstance(AIService().backend, FakeLLMBackend)
+    with patch.object(settings, "LLM_BACKEND", "other"):
+        with pytest.raises(ValueError):
+            get_llm_backend()
+
+
+@pytest.mark.asyncio
+async def test_fake_replies_satisfy_response_schemas():
+    """Test that structured calls get schema-valid replies without credentials"""
+    with fast_fake_settings(), \
+            patch('app.services.ai_service.model_router', ModelRouter()):
+        service = AIService()
+        email = await service.generate_email(
+            company_name="Acme",
+            company_description="Rockets",
+            user_context={},
+            resume_data={},
+            fallback_on_error=False
+        )
+        variants = await service.generate_email_variants(
+            company_name="Acme",
+            company_description="Rockets",
+            user_context={},
+            resume_data={},
+            count=2
+        )
+        reply = await service.chat_completion("Hi")
+    
+    assert email == {"subject": "Fake subject 1", "body": "Fake body 1"}
+    assert [variant["subject"] for variant in variants] == ["Fake subject 1", "Fake subject 2"]
+    assert reply.startswith("Fake reply from models/")
+    assert service.backend.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_fake_stream_reports_usage_on_last_chunk():
+    """Test that streamed replies arrive in chunks and carry token counts at the end"""
+    with fast_fake_settings(), patch.object(settings, "FAKE_LLM_STREAM_CHUNKS", 4):
+        backend = FakeLLMBackend()
+        stream = await backend.generate_stream("chatbot", "models/gemini-2.0-flash", "Hello there", None)
+        chunks = [chunk async for chunk in stream]
+    
+    assert len(chunks) == 4
+    assert "".join(chunk.text for chunk in chunks).startswith("Fake reply from models/gemini-2.0-flash")
+    assert [chunk.usage_metadata is None for chunk in chunks] == [True, True, True, False]
+    assert chunks[-1].usage_metadata.prompt_token_count == 3
+
+
+@pytest.mark.asyncio
+async def test_fake_error_rates_raise_sdk_errors():
+    """Test that configured error rates raise the same exceptions as the SDK"""
+    with fast_fake_settings(), patch.object(settings, "FAKE_LLM_RATE_LIMIT_RATE", 1.0):
+        with pytest.raises(errors.ClientError) as rate_limited:
+            await FakeLLMBackend().generate("chatbot", "models/gemini-2.0-flash", "Hi")
+    with fast_fake_settings(), patch.object(settings, "FAKE_LLM_ERROR_RATE", 1.0):
+        with pytest.raises(errors.ServerError) as overloaded:
+            await FakeLLMBackend().generate("chatbot", "models/gemini-2.0-flash", "Hi")
+    
+    assert rate_limited.value.code == 429
+    assert overloaded.value.code == 503
+
+
+def test_fake_latency_is_seeded_and_per_model():
+    """Test that latency samples are reproducible and follow per-model medians"""
+    with patch.multiple(
+        settings,
+        FAKE_LLM_LATENCY=1.0,
+        FAKE_LLM_MODEL_LATENCY={"models/slow": 4.0},
+        FAKE_LLM_LATENCY_DISTRIBUTION="lognormal",
+        FAKE_LLM_LATENCY_SPREAD=0.3
+    ):
+        first = [FakeLLMBackend(seed=7).sample_latency("models/fast") for _ in range(3)]
+        backend = FakeLLMBackend(seed=7)
+        samples = [backend.sample_latency("models/slow") for _ in range(500)]
+    
+    assert first[0] == first[1] == first[2]
+    assert statistics.median(samples) == pytest.approx(4.0, rel=0.1)
@@ -0,0 +1,120 @@
+"""
+Tests for LLM call instrumentation and per-user usage totals
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from google.genai import errors
+from app.core.config import settings
+from app.core.llm_metrics import Histogram, LLMCall, LLMMetrics, current_user
+from app.core.model_router import ModelRouter
+from app.services.ai_service import AIService
+from app.services.llm_usage_service import LLMUsageService
+
+FLASH_20 = "models/gemini-2.0-flash"
+
+
+def rate_limited():
+    """A 429 ClientError, built without depending on the SDK constructor signature"""
+    error = errors.ClientError.__new__(errors.ClientError)
+    error.code = 429
+    return error
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    """Test that percentiles report the upper bound of the bucket they fall in"""
+    histogram = Histogram([0.1, 1.0, 10.0])
+    for value in [0.05] * 90 + [5.0] * 10:
+        histogram.observe(value)
+    
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.95) == 10.0
+    assert histogram.snapshot()["buckets"] == {"0.1": 90, "1.0": 0, "10.0": 10, "+Inf": 0}
+
+
+@pytest.mark.asyncio
+async def test_generate_records_tokens_retries_and_user():
+    """Test that a call is recorded once with its retries, token counts, operation and user"""
+    service = AIService()
+    mock_client = Mock()
+    mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+        rate_limited(),
+        Mock(text="Hello", usage_metadata=Mock(
+            prompt_token_count=120,
+            candidates_token_count=30,
+            cached_content_token_count=None,
+            total_token_count=150
+        )),
+    ])
+    metrics = LLMMetrics()
+    calls = []
+    metrics.add_listener(calls.append)
+    
+    token = current_user.set("user-1")
+    try:
+        with patch('app.core.llm_backend.get_gemini_client', return_value=mock_client), \
+                patch('app.services.ai_service.model_router', ModelRouter()), \
+                patch('app.services.ai_service.llm_metrics', metrics), \
+                patch.object(settings, "GEMINI_RETRY_BASE_DELAY", 0.0):
+            reply = await service.chat_completion("Hi")
+    finally:
+        current_user.reset(token)
+    
+    assert reply == "Hello"
+    assert len(calls) == 1
+    call = calls[0]
+    assert (call.operation, call.model, call.slot, call.user_id) == ("chat_completion", FLASH_20, "chatbot", "user-1")
+    assert (call.outcome, call.retries, call.prompt_tokens, call.completion_tokens) == ("ok", 1, 120, 30)
+    assert call.cost == pytest.approx((120 * 0.10 + 30 * 0.40) / 1_000_000)
+    
+    stats = metrics.snapshot()["operations"]["chat_completion"][FLASH_20]
+    assert stats["calls"] == 1
+    assert stats["outcomes"] == {"ok": 1}
+    assert stats["tokens"]["prompt"] == 120
+
+
+@pytest.mark.asyncio
+async def test_usage_totals_are_one_row_per_user_day():
+    """Test that many calls become one increment row, kept for retry if the write fails"""
+    mock_supabase = Mock()
+    mock_supabase.rpc.return_value.execute = AsyncMock(side_effect=[Exception("offline"), Mock()])
+    
+    with patch('app.services.llm_usage_service.get_supabase_client', return_value=mock_supabase), \
+            patch.object(LLMUsageService, "_pending", {}):
+        service = LLMUsageService()
+        for _ in range(3):
+            LLMUsageService.add(LLMCall(
+                slot="generator",
+                model=FLASH_20,
+                latency=1.0,
+                prompt_tokens=100,
+                completion_tokens=50,
+                operation="generate_email",
+                user_id="user-1"
+            ))
+        LLMUsageService.add(LLMCall(slot="generator", model=FLASH_20, latency=1.0))  # no user
+        
+        assert await service.flush() == 0
+        assert await service.flush() == 1
+        assert await service.flush() == 0
+    
+    rows = mock_supabase.rpc.call_args.args[1]["p_rows"]
+    assert len(rows) == 1
+    assert rows[0]["user_id"] == "user-1"
+    assert rows[0]["operation"] == "generate_email"
+    assert rows[0]["calls"] == 3
+    assert rows[0]["prompt_tokens"] == 300
+    assert rows[0]["latency_seconds"] == pytest.approx(3.0)
+
+
+def test_listener_is_registered_once_and_can_be_removed():
+    """Test that re-adding a listener (e.g. on app reload) does not count calls twice"""
+    metrics = LLMMetrics()
+    calls = []
+    metrics.add_listener(calls.append)
+    metrics.add_listener(calls.append)
+    
+    metrics.record(LLMCall(slot="chatbot", model=FLASH_20, latency=0.1, operation="chat"))
+    metrics.remove_listener(calls.append)
+    metrics.record(LLMCall(slot="chatbot", model=FLASH_20, latency=0.1, operation="chat"))
+    
+    assert len(calls) == 1
@@ -0,0 +1,56 @@
+"""
+Tests for MinHash fingerprints and the LSH index
+"""
+from app.core.cache import LRUCache
+from app.modules.ai_engine.minhash import LSHIndex, MinHasher, shingles, similarity
+
+EMAIL = (
+    "Hi Priya, I came across Acme's work on reusable rockets and would love to "
+    "help your avionics team ship faster. I built flight software at two startups."
+)
+
+
+def test_shingles_ignore_case_punctuation_and_spacing():
+    """Test that formatting-only differences give identical shingles"""
+    assert shingles("Hello,  World! How are you?") == shingles("hello world how are YOU")
+    assert shingles("") == set()
+
+
+def test_signatures_estimate_similarity():
+    """Test that near-identical texts score high and unrelated texts low"""
+    hasher = MinHasher()
+    original = hasher.signature(EMAIL)
+    edited = hasher.signature(EMAIL.replace("two startups", "three startups"))
+    unrelated = hasher.signature("Quarterly invoice attached, please remit payment within thirty days.")
+    
+    assert similarity(original, original) == 1.0
+    assert similarity(original, edited) > 0.7
+    assert similarity(original, unrelated) < 0.2
+
+
+def test_lsh_index_finds_similar_and_forgets_removed():
+    """Test that queries return near matches only, most similar first"""
+    hasher = MinHasher()
+    index = LSHIndex(bands=16)
+    index.add("a", hasher.signature(EMAIL))
+    index.add("b", hasher.signature("A completely different note about the weekly team lunch menu."))
+    
+    matches = index.query(hasher.signature(EMAIL + " Thanks!"), threshold=0.7)
+    assert [key for key, _ in matches] == ["a"]
+    
+    index.remove("a")
+    assert index.query(hasher.signature(EMAIL), threshold=0.7) == []
+    assert len(index) == 1
+
+
+def test_lru_cache_reports_evictions():
+    """Test that evicted entries are passed to on_evict"""
+    evicted = []
+    cache = LRUCache(maxsize=2, on_evict=lambda key, value: evicted.append(key))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache
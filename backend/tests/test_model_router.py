@@ -0,0 +1,85 @@
+"""
+Tests for the latency-aware model router
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from app.core.config import settings
+from app.core.model_router import ModelRouter
+from app.services.ai_service import AIService
+
+FLASH_20 = "models/gemini-2.0-flash"
+FLASH_25 = "models/gemini-2.5-flash"
+PRO_25 = "models/gemini-2.5-pro"
+
+
+def test_candidates_cascade_up_to_role_model():
+    """Test that roles start on the cheapest tier and stop at their configured model"""
+    router = ModelRouter()
+    
+    assert router.candidates("generator") == [FLASH_20, FLASH_25]
+    assert router.candidates("chatbot") == [FLASH_20, FLASH_25, PRO_25]
+    assert router.candidates("parser") == [FLASH_20]
+
+
+def test_failing_model_is_demoted():
+    """Test that a model with a high recent error rate is tried last"""
+    router = ModelRouter()
+    for _ in range(10):
+        router.record(FLASH_20, 1.0, ok=False)
+    
+    assert router.candidates("generator") == [FLASH_25, FLASH_20]
+
+
+def test_slow_model_ranked_behind_models_meeting_target():
+    """Test that live p50 against the operation's latency target reorders the cascade"""
+    router = ModelRouter()
+    for _ in range(10):
+        router.record(FLASH_20, 6.0, ok=True)
+        router.record(FLASH_25, 2.0, ok=True)
+    
+    with patch.object(settings, "GEMINI_ROUTER_LATENCY_TARGETS", {"chat": 4.0}), \
+            patch.object(settings, "GEMINI_ROUTER_LATENCY_TARGET", 15.0):
+        # Chat needs p50 <= 4s; the cheaper tier misses it, the unmeasured pro model does not
+        assert router.candidates("chatbot", "chat") == [FLASH_25, PRO_25, FLASH_20]
+        # Batch-style operations keep the cheap-first order
+        assert router.candidates("chatbot", "chat_summary") == [FLASH_20, FLASH_25, PRO_25]
+    
+    for _ in range(10):
+        router.record(PRO_25, 5.0, ok=True)
+    with patch.object(settings, "GEMINI_ROUTER_LATENCY_TARGETS", {"chat": 1.0}):
+        # Nothing meets the target: fastest p50 first
+        assert router.candidates("chatbot", "chat") == [FLASH_25, PRO_25, FLASH_20]
+
+
+def test_timeout_follows_observed_p95():
+    """Test that attempt timeouts are derived from live latency"""
+    router = ModelRouter()
+    assert router.timeout(FLASH_25) == settings.GEMINI_ROUTER_MAX_TIMEOUT
+    
+    for latency in [3.0] * 18 + [4.0] * 2:
+        router.record(FLASH_25, latency, ok=True)
+    
+    assert router.timeout(FLASH_25) == pytest.approx(4.0 * settings.GEMINI_ROUTER_TIMEOUT_FACTOR)
+
+
+@pytest.mark.asyncio
+async def test_invalid_output_escalates_to_next_model():
+    """Test that a reply failing validation is retried on the stronger model"""
+    service = AIService()
+    service._generate = AsyncMock(side_effect=[
+        Mock(text='Sorry, I can only answer in prose.'),
+        Mock(text='{"subject": "Hi", "body": "Hello"}'),
+    ])
+    
+    with patch('app.services.ai_service.model_router', ModelRouter()):
+        result = await service.generate_email(
+            company_name="Acme",
+            company_description="Rockets",
+            user_context={},
+            resume_data={},
+            fallback_on_error=False
+        )
+    
+    assert result == {"subject": "Hi", "body": "Hello"}
+    models = [call.kwargs["model"] for call in service._generate.await_args_list]
+    assert models == [FLASH_20, FLASH_25]
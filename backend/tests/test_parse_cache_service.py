@@ -0,0 +1,63 @@
+"""
+Tests for Parse Cache Service
+"""
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from app.core.cache import LRUCache
+from app.services.parse_cache_service import ParseCacheService
+
+
+def test_cache_key_changes_with_prompt_version():
+    """Test that a prompt version bump invalidates the key"""
+    key_v1 = ParseCacheService.make_key("resume text", "models/gemini-2.5-flash", "1")
+    key_v1_again = ParseCacheService.make_key("resume text", "models/gemini-2.5-flash", "1")
+    key_v2 = ParseCacheService.make_key("resume text", "models/gemini-2.5-flash", "2")
+    key_other_model = ParseCacheService.make_key("resume text", "models/gemini-2.0-flash", "1")
+    
+    assert key_v1 == key_v1_again
+    assert key_v1 != key_v2
+    assert key_v1 != key_other_model
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test LRU eviction order"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert "a" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_hit_skips_database(mock_supabase):
+    """Test that in-process hits never query the database"""
+    with patch('app.services.parse_cache_service.get_supabase_client', return_value=mock_supabase):
+        service = ParseCacheService()
+        service._memory = LRUCache(maxsize=4)
+        service._memory.set("key-1", {"skills": ["Python"]})
+        
+        result = await service.get("key-1")
+    
+    assert result == {"skills": ["Python"]}
+    mock_supabase.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_database_hit_populates_memory():
+    """Test that database hits are promoted into the LRU"""
+    mock_supabase = Mock()
+    mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value\
+        .execute = AsyncMock(return_value=Mock(data=[{"parsed_data": {"skills": ["Go"]}}]))
+    
+    with patch('app.services.parse_cache_service.get_supabase_client', return_value=mock_supabase):
+        service = ParseCacheService()
+        service._memory = LRUCache(maxsize=4)
+        
+        result = await service.get("key-2")
+    
+    assert result == {"skills": ["Go"]}
+    assert service._memory.get("key-2") == {"skills": ["Go"]}
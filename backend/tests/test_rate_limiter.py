@@ -0,0 +1,70 @@
+"""
+Tests for the Gemini quota scheduler
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.core.rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    QuotaScheduler,
+    RateLimitTimeout,
+    TokenBucket
+)
+
+
+def test_token_bucket_wait_time():
+    """Test that an empty bucket reports the refill wait"""
+    bucket = TokenBucket(capacity=60, refill_per_second=1.0)
+    assert bucket.wait_time(10) == 0
+    
+    bucket.consume(60)
+    assert bucket.wait_time(10) == pytest.approx(10, abs=0.1)
+    
+    bucket.consume(-5)  # refund
+    assert bucket.wait_time(5) == pytest.approx(0, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_served_before_batch():
+    """Test that queued interactive calls jump ahead of queued batch calls"""
+    scheduler = QuotaScheduler()
+    order = []
+    
+    with patch('app.core.rate_limiter.settings') as mock_settings:
+        mock_settings.GEMINI_MODEL_RATE_LIMITS = {}
+        mock_settings.GEMINI_RPM_LIMIT = 600  # one request every 0.1s
+        mock_settings.GEMINI_TPM_LIMIT = 1000000
+        mock_settings.GEMINI_QUEUE_TIMEOUT = 5
+        
+        # Drain the request bucket so every caller has to queue
+        lane = scheduler._lane("key", "model")
+        lane.requests.consume(600)
+        
+        async def call(name, priority):
+            await scheduler.acquire("key", "model", 10, priority)
+            order.append(name)
+        
+        batch = [asyncio.create_task(call(f"batch-{i}", PRIORITY_BATCH)) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("chat", PRIORITY_INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+    
+    assert order[0] == "chat"
+
+
+@pytest.mark.asyncio
+async def test_backoff_pauses_lane_until_timeout():
+    """Test that a paused lane makes waiters time out instead of hanging"""
+    scheduler = QuotaScheduler()
+    
+    with patch('app.core.rate_limiter.settings') as mock_settings:
+        mock_settings.GEMINI_MODEL_RATE_LIMITS = {}
+        mock_settings.GEMINI_RPM_LIMIT = 60
+        mock_settings.GEMINI_TPM_LIMIT = 1000000
+        mock_settings.GEMINI_QUEUE_TIMEOUT = 0.05
+        
+        scheduler.backoff("key", "model", seconds=10)
+        
+        with pytest.raises(RateLimitTimeout):
+            await scheduler.acquire("key", "model", 10)
@@ -0,0 +1,50 @@
+"""
+Tests for local resume field extraction
+"""
+from app.modules.ai_engine.resume_heuristics import extract_name, extract_resume_fields
+
+RESUME = """JANE DOE
+Senior Software Engineer
+jane.doe@example.com | +1 (415) 555-0132 | linkedin.com/in/janedoe | https://github.com/jdoe
+Summary
+8+ years of experience building Python and Go services on AWS with Docker and PostgreSQL.
+Experience
+Backend Developer, Acme 2019 - 2023
+Built JavaScript tooling and GitHub Actions pipelines
+"""
+
+
+def test_extracts_contact_details_and_links():
+    """Test that name, contact details and profile links are found"""
+    fields = extract_resume_fields(RESUME)
+    
+    assert fields["name"] == "Jane Doe"
+    assert fields["experience_years"] == 8
+    assert fields["links"] == {
+        "Email": "mailto:jane.doe@example.com",
+        "Phone": "tel:+14155550132",
+        "LinkedIn": "https://linkedin.com/in/janedoe",
+        "GitHub": "https://github.com/jdoe"
+    }
+
+
+def test_name_must_precede_contact_details_and_not_be_a_known_term():
+    """Test that skill/industry lines are skipped and names below the contacts are not settled"""
+    assert extract_name("Machine Learning\nJohn Smith\njohn@example.com") == "John Smith"
+    assert extract_name("Cloud Computing\njohn@example.com\nJohn Smith") is None
+    assert extract_name("John Smith\nBuilt things at several places.") is None
+
+
+def test_vocabulary_matches_whole_terms_only():
+    """Test that skills and roles match whole terms in canonical case"""
+    fields = extract_resume_fields(RESUME + "\nLet's go rust-proof the react loop. Used C++ and node.js")
+    
+    assert fields["skills"] == ["Python", "Go", "AWS", "Docker", "PostgreSQL", "JavaScript", "C++", "Node.js"]
+    assert fields["job_titles"] == ["Software Engineer", "Backend Developer"]
+
+
+def test_missing_fields_are_left_out():
+    """Test that fields not found are omitted so the LLM is asked for them"""
+    fields = extract_resume_fields("Work history\nBuilt things at several places.")
+    
+    assert fields == {}
@@ -0,0 +1,36 @@
+"""
+Tests for span edits
+"""
+import pytest
+from app.modules.ai_engine.span_edits import EditConflict, apply_edits
+
+
+def test_edits_applied_with_offsets_into_original():
+    """Test that edits to both fields apply and report original offsets"""
+    texts = {"subject": "Quick question", "body": "I has a idea for you."}
+    
+    updated, applied = apply_edits(texts, [
+        {"field": "body", "find": "a idea", "replace": "an idea"},
+        {"field": "body", "find": "I has", "replace": "I have"},
+        {"field": "subject", "find": "question", "replace": "question!"},
+        {"field": "body", "find": "you", "replace": "you"}
+    ])
+    
+    assert updated == {"subject": "Quick question!", "body": "I have an idea for you."}
+    assert [(edit["field"], edit["start"], edit["end"]) for edit in applied] == [
+        ("body", 0, 5),
+        ("body", 6, 12),
+        ("subject", 6, 14)
+    ]
+
+
+@pytest.mark.parametrize("edits", [
+    [{"field": "body", "find": "missing", "replace": "x"}],
+    [{"field": "body", "find": "the", "replace": "a"}],
+    [{"field": "body", "find": "the cat", "replace": "a cat"}, {"field": "body", "find": "cat sat", "replace": "dog sat"}],
+    [{"field": "signature", "find": "cat", "replace": "dog"}]
+])
+def test_unclean_edits_rejected(edits):
+    """Test that missing, ambiguous, overlapping or unknown-field edits raise"""
+    with pytest.raises(EditConflict):
+        apply_edits({"body": "the cat sat on the mat"}, edits)
@@ -0,0 +1,75 @@
+"""
+Tests for structured output parsing
+"""
+import pytest
+from google.genai import types
+from app.models.schemas import GeneratedEmail, ParsedResumeData
+from app.modules.ai_engine.structured_output import (
+    StructuredOutputError,
+    extract_json,
+    parse_model,
+    parse_structured,
+    response_schema
+)
+
+
+def test_response_schema_is_accepted_by_gemini_types():
+    """Test that schemas derived from Pydantic models validate as Gemini schemas"""
+    schema = types.Schema.model_validate(response_schema(ParsedResumeData))
+    
+    assert schema.properties["experience_years"].nullable is True
+    assert schema.properties["skills"].type == types.Type.ARRAY
+    # Free-form dicts travel as key/value pair lists
+    assert schema.properties["links"].items.properties["key"].type == types.Type.STRING
+
+
+def test_extract_json_handles_fences_and_trailing_commas():
+    """Test that fenced replies with prose and trailing commas still parse"""
+    reply = 'Here you go:\n```json\n{"subject": "Hi", "body": "Text",}\n```\nThanks!'
+    
+    assert extract_json(reply) == {"subject": "Hi", "body": "Text"}
+    with pytest.raises(StructuredOutputError):
+        extract_json("no json here")
+
+
+def test_extract_json_salvages_truncated_reply():
+    """Test that complete fields survive a reply cut off mid-value"""
+    reply = '{"skills": ["Python", "SQL"], "job_titles": ["Dev"], "achievements": ["Shipped v1", "Led te'
+    
+    data = extract_json(reply)
+    
+    assert data["skills"] == ["Python", "SQL"]
+    assert data["job_titles"] == ["Dev"]
+
+
+def test_parse_structured_reports_broken_fields():
+    """Test that valid fields are kept and invalid ones are reported per field"""
+    result = parse_structured(
+        '{"skills": ["Python"], "experience_years": "many", "education": [], '
+        '"job_titles": [], "achievements": [], "links": [{"key": "GitHub", "value": "gh/jo"}]}',
+        ParsedResumeData
+    )
+    
+    assert list(result.errors) == ["experience_years"]
+    assert result.data["links"] == {"GitHub": "gh/jo"}
+    with pytest.raises(StructuredOutputError):
+        result.build()
+
+
+def test_parse_structured_folds_empty_links_list():
+    """Test that an empty pair list becomes {} for dict fields but stays a list elsewhere"""
+    result = parse_structured(
+        '{"skills": [], "experience_years": 3, "education": [], '
+        '"job_titles": [], "achievements": [], "links": []}',
+        ParsedResumeData
+    )
+    
+    assert result.complete
+    assert result.data["links"] == {}
+    assert result.data["skills"] == []
+
+
+def test_parse_model_rejects_empty_required_field():
+    """Test that an empty email body is treated as broken"""
+    with pytest.raises(StructuredOutputError, match="body"):
+        parse_model('{"subject": "Hi", "body": ""}', GeneratedEmail)
@@ -0,0 +1,23 @@
+"""
+Tests for the Supabase client singleton
+"""
+import pytest
+from supabase import AsyncClient
+from app.database.supabase_client import SupabaseClient, get_supabase, get_supabase_client
+
+
+@pytest.mark.asyncio
+async def test_services_share_one_async_client_and_pool():
+    """Test that every service gets the same async client and HTTP/2 PostgREST session"""
+    await SupabaseClient.close()
+    
+    client = get_supabase_client()
+    
+    assert isinstance(client, AsyncClient)
+    assert get_supabase() is client
+    assert client.postgrest.session is get_supabase().postgrest.session
+    assert client.postgrest.session._transport._pool._http2
+    
+    await SupabaseClient.close()
+    assert get_supabase_client() is not client
+    await SupabaseClient.close()
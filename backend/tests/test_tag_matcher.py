@@ -0,0 +1,69 @@
+"""
+Tests for the Aho-Corasick tag matcher
+"""
+from app.modules.ai_engine.tag_matcher import AhoCorasick, get_tag_matcher
+from app.modules.scraper.company_discovery import CompanyDiscovery
+
+
+def test_automaton_finds_overlapping_patterns():
+    """Test that every occurrence is reported, including overlapping ones"""
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    
+    found = [(start, end, automaton.patterns[index]) for start, end, index in automaton.iter("ushers")]
+    
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_aliases_normalized_with_offsets():
+    """Test that aliases map to canonical tags and offsets point into the text"""
+    text = "Former SRE, now an ML Engineer at an ecommerce startup using k8s and Postgres."
+    
+    matches = get_tag_matcher().find(text)
+    
+    assert [(match.tag, match.category) for match in matches] == [
+        ("Site Reliability Engineer", "roles"),
+        ("Machine Learning", "keywords"),
+        ("Machine Learning Engineer", "roles"),
+        ("E-commerce", "industries"),
+        ("Kubernetes", "keywords"),
+        ("PostgreSQL", "keywords")
+    ]
+    assert all(text[match.start:match.end] == match.text for match in matches)
+    assert matches[2].text == "ML Engineer"
+
+
+def test_whole_terms_and_case_sensitive_terms():
+    """Test that partial words and everyday words are not tagged"""
+    tags = get_tag_matcher().tags("JavaScript on GitHub. Let's go to the spring fair. Wrote Go and C++, not Java.")
+    
+    assert tags["keywords"] == ["JavaScript", "Go", "C++", "Java"]
+    assert tags["roles"] == []
+
+
+def test_everyday_words_and_hyphenated_words_are_not_tagged():
+    """Test that ambiguous words and hyphen-joined words do not create tags"""
+    tags = get_tag_matcher().tags(
+        "Go-to engineer since Spring 2021, Node owner, REST days, crypto wallet. "
+        "Software Developer turned Product Designer. Skills:\n-Go\n-Python-based tooling"
+    )
+    
+    assert tags["keywords"] == ["Go"]
+    assert tags["industries"] == []
+    assert tags["roles"] == ["Software Developer", "Product Designer"]
+
+
+def test_user_vocabulary_and_company_industry_filter():
+    """Test that extra tags are matched and companies filter on canonical industries"""
+    matcher = get_tag_matcher().with_vocabulary({"keywords": ["Terraform"]})
+    assert matcher.tags("Provisioned with terraform")["keywords"] == ["Terraform"]
+    assert get_tag_matcher().tags("Provisioned with terraform")["keywords"] == []
+    assert get_tag_matcher().with_vocabulary({"keywords": ["Terraform"]}) is matcher
+    
+    companies = [
+        {"name": "Shopify", "description": "Ecommerce platform for merchants"},
+        {"name": "Stripe", "industry": "Financial Technology"},
+        {"name": "Riot", "description": "Online games"}
+    ]
+    filtered = CompanyDiscovery().filter_companies(companies, industries=["E-commerce", "FinTech"])
+    
+    assert [company["name"] for company in filtered] == ["Shopify", "Stripe"]
@@ -0,0 +1,102 @@
+"""
+Tests for prompt token budgeting
+"""
+from unittest.mock import patch
+from app.core.llm_metrics import LLMMetrics, current_operation
+from app.modules.ai_engine.token_budget import (
+    TRUNCATION_MARKER,
+    apply_budget,
+    clean_resume_text,
+    count_tokens,
+    truncate_to_budget
+)
+
+
+def test_clean_resume_text_strips_boilerplate():
+    """Test that page numbers, repeated headers and filler lines are removed"""
+    text = (
+        "Curriculum Vitae\n"
+        "Jane Doe | jane@example.com\n"
+        "Software   Engineer at   Acme\n\n\n\n"
+        "Page 1 of 2\n"
+        "Jane Doe | jane@example.com\n"
+        "Skills: Python, SQL\n"
+        "2 / 2\n"
+        "References available upon request"
+    )
+    
+    cleaned = clean_resume_text(text)
+    
+    assert cleaned.count("Jane Doe | jane@example.com") == 1
+    assert "Software Engineer at Acme" in cleaned
+    assert "Skills: Python, SQL" in cleaned
+    assert "Page 1" not in cleaned
+    assert "2 / 2" not in cleaned
+    assert "Curriculum Vitae" not in cleaned
+    assert "References" not in cleaned
+    assert "\n\n\n" not in cleaned
+
+
+def test_truncate_keeps_head_and_tail():
+    """Test that truncation keeps the opening and closing lines within budget"""
+    lines = [f"Line {i} " + "word " * 20 for i in range(200)]
+    text = "\n".join(lines)
+    
+    truncated = truncate_to_budget(text, max_tokens=500)
+    
+    assert count_tokens(truncated) <= 500
+    assert truncated.startswith("Line 0 ")
+    assert truncated.rstrip().endswith(lines[-1].rstrip())
+    assert TRUNCATION_MARKER in truncated
+
+
+def test_apply_budget_leaves_short_text_intact():
+    """Test that text under budget is only whitespace-normalized"""
+    result = apply_budget("Hello   there,\n\n\n\nthanks", max_tokens=100)
+    
+    assert result.text == "Hello there,\n\nthanks"
+    assert TRUNCATION_MARKER not in result.text
+    assert result.saved_tokens == result.original_tokens - result.final_tokens
+
+
+def test_apply_budget_reports_saved_tokens_to_metrics():
+    """Test that tokens saved are recorded per operation and text"""
+    metrics = LLMMetrics()
+    token = current_operation.set("parse_resume")
+    try:
+        with patch('app.modules.ai_engine.token_budget.llm_metrics', metrics):
+            result = apply_budget("word " * 2000, max_tokens=100, label="resume parse")
+    finally:
+        current_operation.reset(token)
+    
+    stats = metrics.snapshot()["budgets"]["parse_resume"]["resume parse"]
+    assert stats["fits"] == 1
+    assert stats["saved_tokens"] == result.saved_tokens > 0
+
+
+def test_clean_resume_text_keeps_repeated_body_lines():
+    """Test that repeated job titles and bullets are content, not headers"""
+    text = (
+        "Jane Doe\n"
+        "Software Engineer\nAcme\n- Built Python services\n- Led migrations\n"
+        "Software Engineer\nGlobex\n- Built Python services\n- On-call rotation\n"
+        "Education: BSc Computer Science"
+    )
+    
+    cleaned = clean_resume_text(text)
+    
+    assert cleaned.count("Software Engineer") == 2
+    assert cleaned.count("- Built Python services") == 2
+
+
+def test_truncate_cuts_single_overlong_line():
+    """Test that text without line breaks is cut mid-line and still fills the budget"""
+    text = " ".join(f"word{i}" for i in range(5000))
+    
+    truncated = truncate_to_budget(text, max_tokens=1500)
+    
+    assert count_tokens(truncated) <= 1500
+    assert count_tokens(truncated) >= 1400
+    assert truncated.startswith("word0 word1")
+    assert truncated.endswith("word4999")
+    assert TRUNCATION_MARKER in truncated
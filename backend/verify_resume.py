@@ -1,7 +1,7 @@
 import sys
 import os
 import asyncio
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
 
 # Add backend to path
@@ -62,13 +62,13 @@ async def test_upload_resume():
     
     # Mock Supabase responses
     # 1. Check existing
-    mock_supabase.table().select().eq().execute.return_value.data = [{"id": "existing_id"}]
+    mock_supabase.table().select().eq().execute = AsyncMock(return_value=MagicMock(data=[{"id": "existing_id"}]))
     
     # 2. Upload
-    mock_supabase.storage.from_().upload.return_value = "ok"
+    mock_supabase.storage.from_().upload = AsyncMock(return_value="ok")
     
     # 3. Insert
-    mock_supabase.table().insert().execute.return_value.data = [{"id": "new_id"}]
+    mock_supabase.table().insert().execute = AsyncMock(return_value=MagicMock(data=[{"id": "new_id"}]))
     
     result = await service.upload_resume("user123", mock_file)
     
@@ -0,0 +1,8 @@
+-- Store AI refinement suggestions on the context profile
+-- Filled by a background job after POST /context/build, so saving a context
+-- no longer waits on the LLM
+
+ALTER TABLE public.context_profiles
+ADD COLUMN IF NOT EXISTS context_suggestions JSONB;
+
+COMMENT ON COLUMN public.context_profiles.context_suggestions IS 'Roles, industries, keywords and geography related to this context but not in it; NULL until refined after the latest save';
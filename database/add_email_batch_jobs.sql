@@ -0,0 +1,33 @@
+-- Persist offline batch generation jobs
+-- Jobs can run for up to 24h, so they are stored instead of being polled by a
+-- request-scoped task; a background sweep (and GET /emails/generate/batch/{id})
+-- collects finished jobs, also after a restart
+
+CREATE TABLE IF NOT EXISTS public.email_batch_jobs (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
+  job_name TEXT NOT NULL UNIQUE,
+  model TEXT NOT NULL,
+  companies JSONB NOT NULL,
+  total INTEGER NOT NULL,
+  status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'collecting', 'completed', 'failed')),
+  succeeded INTEGER,
+  failed INTEGER,
+  results JSONB,
+  error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  completed_at TIMESTAMP WITH TIME ZONE
+);
+
+COMMENT ON COLUMN public.email_batch_jobs.job_name IS 'Gemini batch job name used for polling';
+COMMENT ON COLUMN public.email_batch_jobs.companies IS 'Companies in request order; replies are matched to them by index';
+COMMENT ON COLUMN public.email_batch_jobs.status IS 'running until finished; collecting while its emails are being stored (guards concurrent collection)';
+
+ALTER TABLE public.email_batch_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own batch jobs"
+  ON public.email_batch_jobs FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE INDEX IF NOT EXISTS idx_email_batch_jobs_user_id ON public.email_batch_jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_email_batch_jobs_running ON public.email_batch_jobs(status) WHERE status = 'running';
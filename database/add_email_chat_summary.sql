@@ -0,0 +1,17 @@
+-- Add rolling summaries of email chat history
+-- Older chat messages are folded into a running summary stored on the email, so
+-- chat prompts quote the summary plus the newest messages and only that tail
+-- has to be loaded
+
+ALTER TABLE public.ai_emails
+  ADD COLUMN IF NOT EXISTS chat_summary TEXT,
+  ADD COLUMN IF NOT EXISTS chat_summary_until TIMESTAMP WITH TIME ZONE,
+  ADD COLUMN IF NOT EXISTS chat_summary_message_count INTEGER DEFAULT 0;
+
+COMMENT ON COLUMN public.ai_emails.chat_summary IS 'Running summary of the chat messages created up to chat_summary_until';
+COMMENT ON COLUMN public.ai_emails.chat_summary_until IS 'created_at of the newest chat message folded into chat_summary';
+COMMENT ON COLUMN public.ai_emails.chat_summary_message_count IS 'Chat messages folded into chat_summary (also guards concurrent updates)';
+
+-- Newest messages of one email (chat tail and history pages)
+CREATE INDEX IF NOT EXISTS idx_email_chat_email_created_at
+  ON public.email_chat_history(email_id, created_at DESC);
@@ -0,0 +1,45 @@
+-- Add near-duplicate detection for AI-generated emails
+-- Each draft stores a 64-value MinHash signature of its body plus its LSH band keys.
+-- Drafts sharing a band key are candidate duplicates; the GIN index makes that
+-- lookup sublinear in the number of drafts a user has
+
+ALTER TABLE public.ai_emails
+  ADD COLUMN IF NOT EXISTS content_minhash BIGINT[],
+  ADD COLUMN IF NOT EXISTS content_bands TEXT[],
+  ADD COLUMN IF NOT EXISTS duplicate_of UUID,
+  ADD COLUMN IF NOT EXISTS duplicate_similarity REAL;
+
+COMMENT ON COLUMN public.ai_emails.content_minhash IS 'MinHash signature of the email body (word 3-shingles)';
+COMMENT ON COLUMN public.ai_emails.content_bands IS 'LSH band keys of content_minhash, used to find near-duplicate candidates';
+COMMENT ON COLUMN public.ai_emails.duplicate_of IS 'Earlier draft this one nearly duplicates (not a foreign key: the earlier draft may be deleted)';
+
+CREATE INDEX IF NOT EXISTS idx_ai_emails_content_bands ON public.ai_emails USING GIN (content_bands);
+
+-- Drafts of a user sharing at least one band key with p_bands
+-- (called over RPC so large band lists travel in the request body)
+CREATE OR REPLACE FUNCTION public.find_email_duplicate_candidates(
+  p_user_id UUID,
+  p_bands TEXT[],
+  p_limit INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+  id UUID,
+  content_minhash BIGINT[]
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT e.id, e.content_minhash
+  FROM public.ai_emails e
+  WHERE e.user_id = p_user_id
+    AND e.content_bands && p_bands
+  ORDER BY e.created_at DESC
+  LIMIT p_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_user_id is not checked against the caller, so only the backend (service role) may call this
+REVOKE EXECUTE ON FUNCTION public.find_email_duplicate_candidates(UUID, TEXT[], INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.find_email_duplicate_candidates(UUID, TEXT[], INTEGER) TO service_role;
+
+-- Drafts created before this migration are fingerprinted on the fly by the
+-- cluster endpoint; they are flagged against new drafts once edited or regenerated
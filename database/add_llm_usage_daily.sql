@@ -0,0 +1,69 @@
+-- Add per-user daily LLM usage totals
+-- One row per user, day, operation and model; the backend buffers calls in memory
+-- and flushes increments through record_llm_usage() instead of writing a row per call
+
+CREATE TABLE IF NOT EXISTS public.llm_usage_daily (
+  user_id UUID NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
+  usage_date DATE NOT NULL,
+  operation TEXT NOT NULL,
+  model TEXT NOT NULL,
+  calls INTEGER NOT NULL DEFAULT 0,
+  failed_calls INTEGER NOT NULL DEFAULT 0,
+  retries INTEGER NOT NULL DEFAULT 0,
+  prompt_tokens BIGINT NOT NULL DEFAULT 0,
+  completion_tokens BIGINT NOT NULL DEFAULT 0,
+  cached_tokens BIGINT NOT NULL DEFAULT 0,
+  cost_usd NUMERIC(12, 6) NOT NULL DEFAULT 0,
+  latency_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (user_id, usage_date, operation, model)
+);
+
+ALTER TABLE public.llm_usage_daily ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own LLM usage"
+  ON public.llm_usage_daily FOR SELECT
+  USING (auth.uid() = user_id);
+
+COMMENT ON TABLE public.llm_usage_daily IS 'Daily LLM call, token and cost totals per user, operation and model';
+
+CREATE INDEX IF NOT EXISTS idx_llm_usage_daily_date ON public.llm_usage_daily(usage_date);
+
+-- Add a batch of increments; p_rows is a JSON array of objects keyed like the table columns
+CREATE OR REPLACE FUNCTION public.record_llm_usage(p_rows JSONB)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO public.llm_usage_daily AS u (
+    user_id, usage_date, operation, model, calls, failed_calls, retries,
+    prompt_tokens, completion_tokens, cached_tokens, cost_usd, latency_seconds
+  )
+  SELECT
+    (r->>'user_id')::UUID,
+    (r->>'usage_date')::DATE,
+    r->>'operation',
+    r->>'model',
+    (r->>'calls')::INTEGER,
+    (r->>'failed_calls')::INTEGER,
+    (r->>'retries')::INTEGER,
+    (r->>'prompt_tokens')::BIGINT,
+    (r->>'completion_tokens')::BIGINT,
+    (r->>'cached_tokens')::BIGINT,
+    (r->>'cost_usd')::NUMERIC,
+    (r->>'latency_seconds')::DOUBLE PRECISION
+  FROM jsonb_array_elements(p_rows) AS r
+  ON CONFLICT (user_id, usage_date, operation, model) DO UPDATE SET
+    calls = u.calls + EXCLUDED.calls,
+    failed_calls = u.failed_calls + EXCLUDED.failed_calls,
+    retries = u.retries + EXCLUDED.retries,
+    prompt_tokens = u.prompt_tokens + EXCLUDED.prompt_tokens,
+    completion_tokens = u.completion_tokens + EXCLUDED.completion_tokens,
+    cached_tokens = u.cached_tokens + EXCLUDED.cached_tokens,
+    cost_usd = u.cost_usd + EXCLUDED.cost_usd,
+    latency_seconds = u.latency_seconds + EXCLUDED.latency_seconds,
+    updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Only the backend (service role) records usage; clients must not be able to write it
+REVOKE EXECUTE ON FUNCTION public.record_llm_usage(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.record_llm_usage(JSONB) TO service_role;
@@ -0,0 +1,8 @@
+-- Store context suggestions on the resume they were generated from
+-- Filled by the parse (one fused LLM call, or right after a file parse), so
+-- GET /context/suggestions only reads them
+
+ALTER TABLE public.resumes
+ADD COLUMN IF NOT EXISTS context_suggestions JSONB;
+
+COMMENT ON COLUMN public.resumes.context_suggestions IS 'Suggested roles, industries, keywords and geography for this resume; NULL until generated';
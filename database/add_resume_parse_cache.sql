@@ -0,0 +1,19 @@
+-- Add content-addressed cache for resume parsing results
+-- Keyed by sha256(prompt_version, model, extracted_text) so repeat parses skip the LLM
+
+CREATE TABLE IF NOT EXISTS public.resume_parse_cache (
+  cache_key TEXT PRIMARY KEY,
+  model TEXT NOT NULL,
+  prompt_version TEXT NOT NULL,
+  parsed_data JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Backend-only table (accessed with the service role key)
+ALTER TABLE public.resume_parse_cache ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.resume_parse_cache IS 'Cached AI resume parses keyed by hash of text, model and prompt version';
+
+-- Used to purge entries written by older prompt versions:
+-- DELETE FROM public.resume_parse_cache WHERE prompt_version <> '<current>';
+CREATE INDEX IF NOT EXISTS idx_resume_parse_cache_prompt_version ON public.resume_parse_cache(prompt_version);